@@ -0,0 +1,662 @@
+# benchmark.py - Mediciones de rendimiento del backend
+# Uso: python benchmark.py [nombre ...]   (sin argumentos ejecuta todos)
+import sys
+import time
+import warnings
+import joblib
+import pandas as pd
+
+warnings.filterwarnings('ignore')
+
+STROKE_SAMPLE = {
+    'gender': 'Female',
+    'age': 67,
+    'hypertension': 1,
+    'heart_disease': 0,
+    'ever_married': 'Yes',
+    'work_type': 'Private',
+    'Residence_type': 'Urban',
+    'avg_glucose_level': 228.69,
+    'bmi': 36.6,
+    'smoking_status': 'formerly smoked'
+}
+
+HEART_SAMPLE = {
+    'Age': 40,
+    'Sex': 'M',
+    'ChestPainType': 'ATA',
+    'RestingBP': 140,
+    'Cholesterol': 289,
+    'FastingBS': 0,
+    'RestingECG': 'Normal',
+    'MaxHR': 172,
+    'ExerciseAngina': 'N',
+    'Oldpeak': 0.0,
+    'ST_Slope': 'Up',
+    'HeartDisease': 0
+}
+
+def timeit(func, repeat=200, warmup=10):
+    """Tiempo medio por llamada en microsegundos"""
+    for _ in range(warmup):
+        func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def report(name, before_us, after_us):
+    """Imprimir una fila antes/después con la aceleración"""
+    speedup = before_us / after_us if after_us else float('inf')
+    print(f"  {name:38} {before_us:10.1f} µs -> {after_us:10.1f} µs  (x{speedup:.2f})")
+
+# ============================
+# INFERENCIA: predict + predict_proba vs. una sola pasada
+# ============================
+
+def bench_inference():
+    from inference import get_decision_threshold, predict_with_threshold
+
+    print("\n📊 Inferencia tabular (por petición)")
+    for model_file, sample, model_type in [('stroke_model.pkl', STROKE_SAMPLE, 'stroke'),
+                                           ('heart_model.pkl', HEART_SAMPLE, 'heart')]:
+        model = joblib.load(model_file)
+        threshold = get_decision_threshold(model, model_type)
+
+        for rows in (1, 1000):
+            df_input = pd.DataFrame([sample] * rows)
+
+            def two_passes():
+                model.predict(df_input)
+                model.predict_proba(df_input)
+
+            def single_pass():
+                predict_with_threshold(model, df_input, threshold)
+
+            # Ambas rutas deben dar la misma clase
+            predictions, _ = predict_with_threshold(model, df_input, threshold)
+            assert (predictions == model.predict(df_input)).all()
+
+            repeat = 200 if rows == 1 else 20
+            report(f"{model_type} ({rows} filas)", timeit(two_passes, repeat), timeit(single_pass, repeat))
+
+# ============================
+# AJUSTE CLÍNICO: escalar vs. vectorizado
+# ============================
+
+def bench_clinical():
+    import numpy as np
+    from check_parity import LegacyClinicalRiskAdjuster
+    from clinical_risk import BatchClinicalRiskAdjuster
+
+    print("\n📊 Ajuste clínico (lote de 10.000 pacientes): código original vs. tabla compilada")
+    rows = 10000
+    rng = np.random.default_rng(0)
+    predictions = rng.integers(0, 2, rows)
+    probabilities = rng.random(rows)
+
+    for records, legacy, model_type in [
+            ([STROKE_SAMPLE] * rows, LegacyClinicalRiskAdjuster.adjust_stroke_risk, 'stroke'),
+            ([HEART_SAMPLE] * rows, LegacyClinicalRiskAdjuster.adjust_heart_risk, 'heart')]:
+
+        def one_by_one():
+            for i, data in enumerate(records):
+                legacy(data, predictions[i], probabilities[i])
+
+        def whole_batch():
+            BatchClinicalRiskAdjuster.adjust(model_type, records, predictions, probabilities)
+
+        report(f"{model_type} ({rows} filas)", timeit(one_by_one, 5, 1), timeit(whole_batch, 5, 1))
+
+# ============================
+# PREPROCESAMIENTO: DataFrame + apply vs. arreglo estructurado
+# ============================
+
+def legacy_preprocess_stroke_data(data):
+    """Versión original: DataFrame de una fila y cinco .apply()"""
+    df = pd.DataFrame([{
+        'gender': data.get('gender', 'Male'),
+        'age': float(data.get('age', 0)),
+        'hypertension': int(data.get('hypertension', 0)),
+        'heart_disease': int(data.get('heart_disease', 0)),
+        'ever_married': data.get('ever_married', 'No'),
+        'work_type': data.get('work_type', 'Private'),
+        'Residence_type': data.get('Residence_type', 'Urban'),
+        'avg_glucose_level': float(data.get('avg_glucose_level', 100.0)),
+        'bmi': float(data.get('bmi', 25.0)),
+        'smoking_status': data.get('smoking_status', 'never smoked')
+    }])
+
+    valid_genders = ['Male', 'Female']
+    valid_married = ['Yes', 'No']
+    valid_work = ['Private', 'Self-employed', 'Govt_job', 'Children', 'Never_worked']
+    valid_residence = ['Urban', 'Rural']
+    valid_smoking = ['formerly smoked', 'never smoked', 'smokes', 'Unknown']
+
+    df['gender'] = df['gender'].apply(lambda x: x if x in valid_genders else 'Male')
+    df['ever_married'] = df['ever_married'].apply(lambda x: x if x in valid_married else 'No')
+    df['work_type'] = df['work_type'].apply(lambda x: x if x in valid_work else 'Private')
+    df['Residence_type'] = df['Residence_type'].apply(lambda x: x if x in valid_residence else 'Urban')
+    df['smoking_status'] = df['smoking_status'].apply(lambda x: x if x in valid_smoking else 'never smoked')
+
+    return df
+
+def bench_preprocess():
+    from preprocessing import STROKE_LAYOUT, preprocess_batch, to_model_input
+
+    print("\n📊 Preprocesamiento stroke (por petición)")
+    model = joblib.load('stroke_model.pkl')
+
+    # Misma predicción con ambas rutas
+    rows, _, _ = preprocess_batch([STROKE_SAMPLE], STROKE_LAYOUT)
+    assert model.predict_proba(legacy_preprocess_stroke_data(STROKE_SAMPLE))[0][1] == \
+           model.predict_proba(to_model_input(model, rows))[0][1]
+
+    legacy = timeit(lambda: legacy_preprocess_stroke_data(STROKE_SAMPLE), 500)
+    report("validación (sin pandas)", legacy,
+           timeit(lambda: preprocess_batch([STROKE_SAMPLE], STROKE_LAYOUT), 500))
+    report("validación + DataFrame para el pipeline", legacy,
+           timeit(lambda: to_model_input(model, preprocess_batch([STROKE_SAMPLE], STROKE_LAYOUT)[0]), 500))
+
+    records = [STROKE_SAMPLE] * 1000
+    report("lote de 1.000 (fila a fila -> lote)",
+           timeit(lambda: [legacy_preprocess_stroke_data(data) for data in records], 2, 0),
+           timeit(lambda: preprocess_batch(records, STROKE_LAYOUT), 5, 1))
+
+# ============================
+# MODELO COMPILADO vs. PIPELINE SKLEARN
+# ============================
+
+def bench_compiled():
+    from model_compiler import compile_pipeline
+    from preprocessing import STROKE_LAYOUT, HEART_LAYOUT, preprocess_batch, to_model_input
+
+    print("\n📊 Inferencia: pipeline sklearn (DataFrame) vs. modelo compilado (NumPy)")
+    for model_file, sample, layout, model_type in [('stroke_model.pkl', STROKE_SAMPLE, STROKE_LAYOUT, 'stroke'),
+                                                   ('heart_model.pkl', HEART_SAMPLE, HEART_LAYOUT, 'heart')]:
+        pipeline = joblib.load(model_file)
+        compiled = compile_pipeline(pipeline, layout, model_type)
+
+        for rows in (1, 100, 1000):
+            records, _, _ = preprocess_batch([sample] * rows, layout)
+            report(f"{model_type} ({rows} filas)",
+                   timeit(lambda: pipeline.predict_proba(to_model_input(pipeline, records)), 200 if rows == 1 else 20),
+                   timeit(lambda: compiled.predict_proba(to_model_input(compiled, records)), 200 if rows == 1 else 20))
+    print("  (el modelo compilado recorre los lotes de LIFESCAN_COMPILED_MAX_ROWS en LIFESCAN_COMPILED_MAX_ROWS filas)")
+
+# ============================
+# DECODIFICACIÓN DE IMÁGENES (FOTOS DE TELÉFONO)
+# ============================
+
+def phone_photo_corpus(count=6, seed=0):
+    """Fotos sintéticas del tamaño de una cámara de teléfono (JPEG 12 MP y un PNG)"""
+    import io
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(count):
+        width, height = (4032, 3024) if i % 2 == 0 else (3024, 4032)
+        # Gradiente + ruido: comprime como una foto real (no como un color plano)
+        x = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None, None]
+        pixels = (x * 0.5 + y * 0.3 + rng.normal(0, 20, (height, width, 3))).clip(0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        image_format = 'PNG' if i == count - 1 else 'JPEG'
+        Image.fromarray(pixels).save(buffer, format=image_format, **({'quality': 90} if image_format == 'JPEG' else {}))
+        corpus.append((image_format, buffer.getvalue()))
+    return corpus
+
+def legacy_preprocess_image(img_data):
+    """Ruta original: decodificación completa, resize, RGB, img_to_array, expand_dims, preprocess_input"""
+    import io
+    import numpy as np
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(img_data))
+    img = img.resize((224, 224))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img_array = np.asarray(img, dtype=np.float32)        # image.img_to_array
+    img_array = np.expand_dims(img_array, axis=0)
+    return img_array / 127.5 - 1.0                       # mobilenet_v2.preprocess_input
+
+def bench_image():
+    import numpy as np
+    from image_preprocessing import IMAGE_SIZE, preprocess_image
+
+    print("\n📊 Decodificación + preprocesamiento de imagen (por imagen)")
+    corpus = phone_photo_corpus()
+    buffer = np.empty(IMAGE_SIZE[::-1] + (3,), dtype=np.float32)
+    for image_format in ('JPEG', 'PNG'):
+        images = [data for fmt, data in corpus if fmt == image_format]
+        legacy = timeit(lambda: [legacy_preprocess_image(data) for data in images], 3, 1) / len(images)
+        fast = timeit(lambda: [preprocess_image(data, buffer) for data in images], 3, 1) / len(images)
+        difference = np.mean([np.abs(legacy_preprocess_image(data)[0] - preprocess_image(data)).mean()
+                              for data in images])
+        size_mb = np.mean([len(data) for data in images]) / 1e6
+        report(f"{image_format} 12 MP ({size_mb:.1f} MB, x{len(images)})", legacy, fast)
+        print(f"  {'':38} diferencia media por píxel: {difference:.4f} (escala -1..1)")
+
+# ============================
+# MEMORIA POR SUBIDA CONCURRENTE
+# ============================
+
+def _memory_kb(field):
+    """Campo de /proc/self/status en kB (VmRSS = actual, VmHWM = pico)"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise OSError(f"{field} no disponible")
+
+def _upload_peak_memory(mode, concurrency, image_data, results):
+    """
+    (Proceso nuevo) Pico de memoria residente al atender `concurrency` subidas simultáneas.
+    mode 'bytes' = ruta original (read() + BytesIO), 'stream' = decodificar desde el stream
+    """
+    import io
+    import threading
+    from flask import Flask, request
+    from image_preprocessing import preprocess_image
+
+    app = Flask(__name__)
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        image_file = request.files['image']
+        if mode == 'bytes':
+            legacy_preprocess_image(image_file.read())
+        else:
+            preprocess_image(image_file.stream)
+        return 'ok'
+
+    client = app.test_client()
+    barrier = threading.Barrier(concurrency)
+    statuses = []
+
+    def send():
+        barrier.wait()
+        statuses.append(client.post('/upload', data={'image': (io.BytesIO(image_data), 'foto.jpg')}).status_code)
+
+    # Reiniciar el pico (VmHWM) del proceso: solo cuenta lo que ocurre durante las peticiones
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    baseline = _memory_kb('VmRSS')
+    threads = [threading.Thread(target=send) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * concurrency, statuses
+    results.put((_memory_kb('VmHWM') - baseline) * 1024)
+
+def bench_upload(concurrency=8):
+    import os
+    import multiprocessing
+
+    print(f"\n📊 Memoria pico por petición con {concurrency} subidas simultáneas (JPEG 12 MP)")
+    image_data = [data for fmt, data in phone_photo_corpus(2) if fmt == 'JPEG'][0]
+    if not os.path.exists('/proc/self/clear_refs'):
+        print("  ⚠️ No disponible en este sistema (requiere /proc de Linux)")
+        return
+
+    # Cada ruta en un proceso nuevo: la memoria liberada por una no enmascara el pico de la otra
+    context = multiprocessing.get_context('spawn')
+    peaks = {}
+    for mode in ('bytes', 'stream'):
+        results = context.Queue()
+        process = context.Process(target=_upload_peak_memory, args=(mode, concurrency, image_data, results))
+        process.start()
+        peaks[mode] = results.get()
+        process.join()
+    for mode, label in (('bytes', 'read() + BytesIO + decodificación completa'), ('stream', 'stream + draft')):
+        print(f"  {label:45} {peaks[mode] / concurrency / 1e6:8.1f} MB/petición")
+    print(f"  (archivo de {len(image_data) / 1e6:.1f} MB; Werkzeug guarda en disco las subidas de más de 500 KB)")
+
+# ============================
+# INFORMES HTML
+# ============================
+
+# Revisión anterior a las plantillas precompiladas: informes con f-strings en cada petición
+REPORTS_BASELINE = 'a594abf'
+
+def baseline_function(module_file, name, revision=REPORTS_BASELINE):
+    """
+    Función `name` de `module_file` tal como estaba en `revision` (git show), sin importar
+    el resto del módulo. None si no hay historial de git disponible
+    """
+    import os
+    import ast
+    import subprocess
+    try:
+        source = subprocess.run(['git', 'show', f'{revision}:./{module_file}'], capture_output=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    tree = ast.parse(source)
+    definition = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == name]
+    namespace = {}
+    exec(compile(ast.Module(body=definition, type_ignores=[]), f'{revision}:{module_file}', 'exec'), namespace)
+    return namespace[name]
+
+def report_cases():
+    """Resultados de predicción que cubren todos los niveles de riesgo y ramas del informe"""
+    tabular = []
+    factor_sets = [[], ['Edad avanzada (67 años)'], ['Hipertensión arterial', 'Glucosa elevada (228 mg/dL)', 'Obesidad (IMC 36.6)']]
+    for model_type in ('stroke', 'heart'):
+        for probability in (0.12, 0.45, 0.83):
+            for base_probability in (probability, probability / 2.5):
+                for prediction in (0, 1):
+                    for factors in factor_sets:
+                        multiplier = probability / base_probability
+                        adjustment = {'prediction': prediction, 'probability': probability,
+                                      'base_probability': base_probability, 'risk_multiplier': multiplier,
+                                      'clinical_factors': factors}
+                        tabular.append((adjustment, model_type, {}, prediction if base_probability == probability else 1 - prediction))
+    skin = []
+    classes = ['Melanoma', 'Basal_cell_carcinoma', 'Nevus', 'Dermatofibroma', 'Eczema']
+    for predicted in classes:
+        for confidence in (0.42, 0.75, 0.93):
+            rest = [name for name in classes if name != predicted]
+            probabilities = {predicted: confidence}
+            probabilities.update({name: (1 - confidence) / len(rest) for name in rest})
+            skin.append({'predicted_class': predicted, 'confidence': confidence, 'all_probabilities': probabilities})
+    return tabular, skin
+
+def bench_reports():
+    import json
+    from tabular_api import generate_analysis, build_prediction_response
+    from skin_api import generate_skin_analysis
+
+    print("\n📊 Informes de análisis (por predicción) y tamaño de la respuesta")
+    tabular, skin = report_cases()
+
+    legacy_generate_analysis = baseline_function('tabular_api.py', 'generate_analysis')
+    legacy_generate_skin_analysis = baseline_function('skin_api.py', 'generate_skin_analysis')
+    if legacy_generate_analysis is None or legacy_generate_skin_analysis is None:
+        print(f"  ⚠️ Sin historial de git: no se puede comparar con la revisión {REPORTS_BASELINE}")
+        return
+
+    # Paridad: la plantilla precompilada genera exactamente el mismo HTML que la revisión de referencia
+    mismatches = sum(legacy_generate_analysis(*case)['analysis_html'] != generate_analysis(*case)['analysis_html']
+                     for case in tabular)
+    mismatches += sum(legacy_generate_skin_analysis(case)['analysis_html'] != generate_skin_analysis(case)['analysis_html']
+                      for case in skin)
+    print(f"  HTML distinto al original ({REPORTS_BASELINE}): {mismatches} de {len(tabular) + len(skin)} casos")
+
+    legacy = timeit(lambda: [legacy_generate_analysis(*case) for case in tabular], 50, 5) / len(tabular)
+    compiled = timeit(lambda: [generate_analysis(*case) for case in tabular], 50, 5) / len(tabular)
+    structured = timeit(lambda: [generate_analysis(*case, include_html=False) for case in tabular], 50, 5) / len(tabular)
+    report("generate_analysis (plantilla)", legacy, compiled)
+    report("generate_analysis (?format=json)", legacy, structured)
+
+    legacy = timeit(lambda: [legacy_generate_skin_analysis(case) for case in skin], 50, 5) / len(skin)
+    compiled = timeit(lambda: [generate_skin_analysis(case) for case in skin], 50, 5) / len(skin)
+    structured = timeit(lambda: [generate_skin_analysis(case, include_html=False) for case in skin], 50, 5) / len(skin)
+    report("generate_skin_analysis (plantilla)", legacy, compiled)
+    report("generate_skin_analysis (?format=json)", legacy, structured)
+
+    # Serialización de la respuesta de /api/predict/<modelo> con y sin HTML
+    responses = {
+        include_html: [build_prediction_response(generate_analysis(*case, include_html=include_html),
+                                                 case[3], case[0]['base_probability'], include_html)
+                       for case in tabular]
+        for include_html in (True, False)
+    }
+    serialize = {include_html: timeit(lambda: [json.dumps(response) for response in responses[include_html]], 50, 5) / len(tabular)
+                 for include_html in (True, False)}
+    size = {include_html: sum(len(json.dumps(response).encode()) for response in responses[include_html]) / len(tabular)
+            for include_html in (True, False)}
+    report("json.dumps respuesta tabular", serialize[True], serialize[False])
+    print(f"  {'':38} {size[True]:8.0f} B -> {size[False]:8.0f} B por respuesta ({1 - size[False] / size[True]:.0%} menos)")
+
+# ============================
+# SERIALIZACIÓN Y COMPRESIÓN DE RESPUESTAS
+# ============================
+
+def bench_encoding(batch_size=500):
+    import gzip
+    import json
+    import numpy as np
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from response_encoding import OrjsonProvider, orjson, brotli, BROTLI_QUALITY, GZIP_LEVEL
+    from tabular_api import generate_analysis, build_prediction_response
+    from skin_api import generate_skin_analysis
+
+    print("\n📊 Serialización y compresión de respuestas")
+    tabular, _ = report_cases()
+    batch = {'success': True, 'model': 'stroke', 'total': batch_size, 'processed': batch_size, 'failed': 0, 'errors': [],
+             'results': [build_prediction_response(generate_analysis(*case), case[3], case[0]['base_probability'])
+                         for case in (tabular * (batch_size // len(tabular) + 1))[:batch_size]]}
+
+    with open('clases.json', 'r') as f:
+        class_names = json.load(f)
+    probabilities = np.random.default_rng(0).dirichlet(np.ones(len(class_names)))
+    prediction = {'predicted_class': class_names[int(probabilities.argmax())], 'confidence': float(probabilities.max()),
+                  'all_probabilities': dict(sorted(zip(class_names, probabilities.tolist()), key=lambda x: x[1], reverse=True))}
+    analysis = generate_skin_analysis(prediction)
+    skin = {'success': True, 'analysis_html': analysis['analysis_html'], 'probabilities': analysis['all_probabilities'],
+            'prediction': {'class': analysis['predicted_class'], 'confidence': analysis['confidence'],
+                           'risk_level': analysis['risk_level'], 'urgency': analysis['urgency']}}
+
+    app = Flask(__name__)
+    providers = {'json (Flask)': DefaultJSONProvider(app)}
+    if orjson is not None:
+        providers['orjson'] = OrjsonProvider(app)
+    with app.app_context():
+        for label, payload, repeat in ((f'lote de {batch_size}', batch, 20), ('piel', skin, 2000)):
+            times = {name: timeit(lambda: provider.response(payload).get_data(), repeat, 2) for name, provider in providers.items()}
+            if len(times) > 1:
+                report(f"jsonify {label} (json -> orjson)", *times.values())
+            else:
+                print(f"  jsonify {label:30} {times['json (Flask)']:10.1f} µs  (orjson no instalado)")
+
+            data = list(providers.values())[-1].response(payload).get_data()
+            sizes = [('sin comprimir', len(data), 0.0)]
+            sizes.append((f'gzip {GZIP_LEVEL}', len(gzip.compress(data, GZIP_LEVEL)),
+                          timeit(lambda: gzip.compress(data, GZIP_LEVEL), repeat, 2)))
+            if brotli is not None:
+                sizes.append((f'br {BROTLI_QUALITY}', len(brotli.compress(data, quality=BROTLI_QUALITY)),
+                              timeit(lambda: brotli.compress(data, quality=BROTLI_QUALITY), repeat, 2)))
+            for name, size, elapsed in sizes:
+                print(f"  {'':4}{name:34} {size / 1024:10.1f} KB" + (f"  ({elapsed:.0f} µs)" if elapsed else ""))
+
+    # Probabilidades como arreglo alineado con clases.json en lugar de {clase: probabilidad}
+    as_dict = len(json.dumps(skin['probabilities']).encode())
+    as_array = len(json.dumps(probabilities.tolist()).encode())
+    print(f"  probabilidades piel ({len(class_names)} clases): {as_dict} B -> {as_array} B con ?probabilities=array")
+
+# ============================
+# COSTO DE LA INSTRUMENTACIÓN (/metrics)
+# ============================
+
+def bench_metrics():
+    import metrics
+    from flask import Flask
+
+    print("\n📊 Costo de la instrumentación por petición")
+    stages = ('parse', 'preprocess', 'cache', 'model', 'clinical', 'html', 'compress')
+
+    def instrumented():
+        metrics.start_request()
+        for stage in stages:
+            metrics.mark(stage)
+        metrics.finish_request('/api/predict/stroke', 200)
+
+    def noop(*args):
+        pass
+
+    def baseline():
+        noop()
+        for stage in stages:
+            noop(stage)
+        noop('/api/predict/stroke', 200)
+
+    hooks = timeit(instrumented, 20000, 1000)
+    calls = timeit(baseline, 20000, 1000)
+    print(f"  {'inicio + 7 marcas + registro':38} {hooks:10.2f} µs  ({hooks - calls:.2f} µs más que 9 llamadas vacías)")
+    bare = timeit(lambda: (metrics.start_request(), metrics.finish_request('/api/predict/stroke', 200)), 20000, 1000)
+    print(f"  {'inicio + registro (hooks, sin marcas)':38} {bare:10.2f} µs")
+    scrape_us = timeit(lambda: metrics.render_metrics(), 200, 10)
+    print(f"  {'GET /metrics (suma de los hilos)':38} {scrape_us:10.2f} µs  (fuera de las peticiones)")
+    mark_us = timeit(lambda: metrics.mark('model'), 20000, 1000)
+    metrics.start_request()
+    print(f"  {'mark() sin petición en curso':38} {mark_us:10.2f} µs")
+    metrics.finish_request('/api/predict/stroke', 200)
+
+    # Petición completa (test client de Flask) con y sin los hooks
+    apps = {}
+    for enabled in (False, True):
+        app = Flask(__name__)
+        app.add_url_rule('/api/ping', 'ping', lambda: 'ok')
+        if enabled:
+            metrics.configure_metrics(app, None)
+        apps[enabled] = app.test_client()
+    plain = timeit(lambda: apps[False].get('/api/ping'), 2000, 100)
+    measured = timeit(lambda: apps[True].get('/api/ping'), 2000, 100)
+    report("petición completa (sin -> con métricas)", plain, measured)
+
+# ============================
+# REGISTRO: print síncrono vs. registro estructurado en cola
+# ============================
+
+def bench_logging():
+    import os
+    import tempfile
+    import threading
+    import contextlib
+    import structured_logging
+
+    print("\n📝 Registro por predicción (stdout a un archivo con búfer de línea)")
+    log = structured_logging.get_logger('benchmark')
+    data = {'age': 67, 'gender': 'Male', 'hypertension': 1, 'heart_disease': 0, 'ever_married': 'Yes',
+            'work_type': 'Private', 'Residence_type': 'Urban', 'avg_glucose_level': 228.69, 'bmi': 36.6,
+            'smoking_status': 'formerly smoked'}
+
+    def legacy():
+        # Las 9 líneas que escribía /api/predict/stroke en cada petición
+        print("\n" + "=" * 40)
+        print("🧠 PREDICCIÓN STROKE")
+        print("=" * 40)
+        print(f"📥 Datos recibidos: {data}")
+        print(f"🤖 Modelo original: Pred={1}, Prob={0.7034:.2%}")
+        print(f"⚖️  Ajuste clínico: Multiplicador={4.75}x")
+        print(f"📈 Probabilidad ajustada: {0.8:.2%}")
+        print("✅ Respuesta generada")
+        print("=" * 40)
+
+    def structured():
+        log.debug("📥 Datos recibidos", model='stroke', data=data)
+        log.info("✅ Predicción completada", model='stroke', original_prediction=1, original_probability=0.7034,
+                 risk_multiplier=4.75, probability=0.8, risk_level='ALTO')
+
+    def threaded(func, threads=4, calls=2000):
+        """Tiempo por llamada con varios hilos registrando a la vez (como un worker con hilos)"""
+        def work():
+            for _ in range(calls):
+                func()
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return (time.perf_counter() - start) / (threads * calls) * 1e6
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'stdout.log'), 'w', buffering=1, encoding='utf-8') as output:
+            with contextlib.redirect_stdout(output):
+                legacy_us = timeit(legacy, 5000, 100)
+                structured_us = timeit(structured, 5000, 100)
+                structured_logging._current.level = structured_logging.OFF
+                muted_us = timeit(structured, 5000, 100)
+                structured_logging.end_request()
+                legacy_threads = threaded(legacy)
+                structured_threads = threaded(structured)
+                structured_logging.stop_logging()  # Esperar a que el hilo escritor vacíe la cola
+                structured_logging.start_logging()
+
+    report("print (9 líneas) -> log.info", legacy_us, structured_us)
+    report("print -> endpoint silenciado/no muestreado", legacy_us, muted_us)
+    report("4 hilos a la vez, por llamada", legacy_threads, structured_threads)
+    print(f"  Descartados por cola llena: {structured_logging.logging_status()['dropped']}")
+
+# ============================
+# ARRANQUE POR MÓDULOS ACTIVOS
+# ============================
+
+# Se ejecuta con `python -c` en un intérprete limpio (sin lo que importa este script)
+_STARTUP_CHILD = """
+import io, sys, json, time, contextlib
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    imported = time.perf_counter() - start
+    app.registry.wait_all()
+ready = time.perf_counter() - start
+memory = {}
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith(('VmRSS:', 'VmHWM:')):
+            memory[line.split(':')[0]] = int(line.split()[1])
+print(json.dumps({
+    'import_seconds': imported,
+    'ready_seconds': ready,
+    'rss_kb': memory['VmRSS'],
+    'peak_kb': memory['VmHWM'],
+    'models': {name: status['state'] for name, status in app.registry.status().items()},
+    'heavy_imports': [name for name in ('tensorflow', 'PIL', 'pandas', 'sklearn', 'xgboost') if name in sys.modules]
+}))
+"""
+
+def bench_startup(module_sets=('tabular', 'skin', 'tabular,skin'), repeat=3):
+    import os
+    import json
+    import subprocess
+
+    print("\n📊 Arranque del servidor por módulos activos (importar app.py + cargar modelos)")
+    if not os.path.exists('/proc/self/status'):
+        print("  ⚠️ No disponible en este sistema (requiere /proc de Linux)")
+        return
+    env = dict(os.environ)
+    env.setdefault('LIFESCAN_BACKEND_PATH', os.getcwd())
+    print(f"  {'módulos':15} {'import (s)':>10} {'listo (s)':>10} {'RSS (MB)':>9} {'pico (MB)':>10}  importa")
+    for modules in module_sets:
+        env['LIFESCAN_MODULES'] = modules
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', _STARTUP_CHILD], env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        best = min(runs, key=lambda run: run['ready_seconds'])
+        print(f"  {modules:15} {best['import_seconds']:10.2f} {best['ready_seconds']:10.2f} "
+              f"{best['rss_kb'] / 1024:9.1f} {best['peak_kb'] / 1024:10.1f}  "
+              f"{', '.join(best['heavy_imports']) or '-'}")
+        failed = [name for name, state in best['models'].items() if state != 'ready']
+        if failed:
+            print(f"  {'':15} ⚠️ modelos no disponibles: {', '.join(failed)}")
+
+BENCHMARKS = {
+    'inference': bench_inference,
+    'clinical': bench_clinical,
+    'preprocess': bench_preprocess,
+    'compiled': bench_compiled,
+    'image': bench_image,
+    'upload': bench_upload,
+    'reports': bench_reports,
+    'encoding': bench_encoding,
+    'metrics': bench_metrics,
+    'logging': bench_logging,
+    'startup': bench_startup
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Benchmark desconocido: {name} (disponibles: {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
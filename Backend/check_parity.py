@@ -0,0 +1,386 @@
+# check_parity.py - Verificar que la tabla de reglas reproduce el ajuste clínico original
+# Uso: python check_parity.py [número de pacientes] [semilla]
+import sys
+import random
+import numpy as np
+from clinical_risk import ClinicalRiskAdjuster, BatchClinicalRiskAdjuster
+
+# ============================
+# REFERENCIA: AJUSTE ORIGINAL
+# ============================
+
+class LegacyClinicalRiskAdjuster:
+    """Versión original con las reglas escritas en código (referencia congelada)"""
+    
+    @staticmethod
+    def adjust_stroke_risk(input_data, model_prediction, model_probability):
+        """
+        Ajustar riesgo de stroke basado en factores clínicos - MENOS SENSIBLE
+        """
+        risk_multiplier = 1.0
+        clinical_factors = []
+        warning_flags = []
+        
+        # 1. EDAD - REDUCIDO
+        age = float(input_data.get('age', 0))
+        if age >= 75:
+            risk_multiplier *= 1.8
+            clinical_factors.append("Edad muy avanzada (≥75 años)")
+        elif age >= 65:
+            risk_multiplier *= 1.5
+            clinical_factors.append("Edad avanzada (65-74 años)")
+        elif age >= 55:
+            risk_multiplier *= 1.3
+        elif age >= 45:
+            risk_multiplier *= 1.1
+        
+        # 2. HIPERTENSIÓN - REDUCIDO
+        if int(input_data.get('hypertension', 0)) == 1:
+            risk_multiplier *= 1.5
+            clinical_factors.append("Hipertensión arterial")
+        
+        # 3. ENFERMEDAD CARDÍACA - REDUCIDO
+        if int(input_data.get('heart_disease', 0)) == 1:
+            risk_multiplier *= 1.4
+            clinical_factors.append("Enfermedad cardíaca")
+        
+        # 4. GLUCOSA - MENOS SENSIBLE
+        glucose = float(input_data.get('avg_glucose_level', 100))
+        if glucose >= 200:
+            risk_multiplier *= 1.6
+            clinical_factors.append("Glucosa muy elevada (≥200 mg/dL)")
+        elif glucose >= 160:
+            risk_multiplier *= 1.4
+            clinical_factors.append("Glucosa elevada (160-199 mg/dL)")
+        elif glucose >= 126:
+            risk_multiplier *= 1.2
+            clinical_factors.append("Glucosa en límite alto (126-159 mg/dL)")
+        
+        # 5. OBESIDAD - REDUCIDO
+        bmi = float(input_data.get('bmi', 25))
+        if bmi >= 40:
+            risk_multiplier *= 1.5
+            clinical_factors.append("Obesidad grado III (IMC ≥40)")
+        elif bmi >= 35:
+            risk_multiplier *= 1.3
+            clinical_factors.append("Obesidad grado II (IMC 35-39.9)")
+        elif bmi >= 30:
+            risk_multiplier *= 1.2
+            clinical_factors.append("Sobrepeso/Obesidad (IMC ≥30)")
+        elif bmi >= 27:
+            risk_multiplier *= 1.1
+            clinical_factors.append("Sobrepeso (IMC 27-29.9)")
+        
+        # 6. TABAQUISMO - REDUCIDO
+        smoking = input_data.get('smoking_status', 'never smoked')
+        if smoking == 'smokes':
+            risk_multiplier *= 1.4
+            clinical_factors.append("Tabaquismo actual")
+        elif smoking == 'formerly smoked':
+            risk_multiplier *= 1.1
+            clinical_factors.append("Historial de tabaquismo")
+        
+        # 7. SEXO FEMENINO - REDUCIDO
+        if input_data.get('gender') == 'Female':
+            risk_multiplier *= 1.1
+        
+        # ============================================
+        # AJUSTE DE PROBABILIDAD - UMBRALES MÁS REALISTAS
+        # ============================================
+        base_probability = model_probability
+        adjusted_probability = min(0.85, base_probability * risk_multiplier)
+        
+        # FACTORES DE ALTO RIESGO REALES
+        high_risk_factors = ['Hipertensión arterial', 'Enfermedad cardíaca', 
+                           'Glucosa muy elevada', 'Obesidad grado III']
+        high_risk_count = sum(1 for factor in clinical_factors if factor in high_risk_factors)
+        
+        # UMBRALES MÁS ALTOS PARA MARCAR RIESGO
+        if high_risk_count >= 3:
+            adjusted_probability = max(adjusted_probability, 0.65)
+        elif high_risk_count >= 2:
+            adjusted_probability = max(adjusted_probability, 0.4) 
+        
+        # DECISIÓN FINAL MÁS CONSERVADORA
+        if adjusted_probability < 0.2:
+            final_prediction = 0  # Riesgo muy bajo
+        elif adjusted_probability < 0.4:
+            # Solo predecir riesgo si hay al menos 2 factores
+            final_prediction = 1 if (high_risk_count >= 2 or len(clinical_factors) >= 3) else 0
+        else:
+            final_prediction = 1  # Riesgo claro
+        
+        # Si modelo dice 0 pero hay factores, ajustar suavemente
+        if model_prediction == 0 and len(clinical_factors) >= 2:
+            if adjusted_probability < 0.15:
+                adjusted_probability = 0.15
+            if adjusted_probability < 0.25 and high_risk_count >= 1:
+                adjusted_probability = 0.25
+        
+        # LIMITAR PROBABILIDAD MÁXIMA (no tan alarmista)
+        adjusted_probability = min(0.8, adjusted_probability)
+        
+        return {
+            'prediction': int(final_prediction),
+            'probability': float(adjusted_probability),
+            'base_probability': float(base_probability),
+            'risk_multiplier': float(risk_multiplier),
+            'clinical_factors': clinical_factors,
+            'high_risk_count': int(high_risk_count),
+            'total_factors': len(clinical_factors)
+        }
+    
+    @staticmethod
+    def adjust_heart_risk(input_data, model_prediction, model_probability):
+        """Ajustar riesgo cardíaco - MENOS SENSIBLE"""
+        risk_multiplier = 1.0
+        clinical_factors = []
+        
+        # 1. ENFERMEDAD CARDÍACA PREVIA - REDUCIDO
+        if int(input_data.get('HeartDisease', 0)) == 1:
+            risk_multiplier *= 1.8
+            clinical_factors.append("Enfermedad cardíaca diagnosticada")
+        
+        # 2. ANGINA CON EJERCICIO - REDUCIDO
+        if input_data.get('ExerciseAngina') == 'Y':
+            risk_multiplier *= 1.6
+            clinical_factors.append("Angina con ejercicio")
+        
+        # 3. PRESIÓN ARTERIAL - REDUCIDO
+        resting_bp = float(input_data.get('RestingBP', 120))
+        if resting_bp >= 180:
+            risk_multiplier *= 1.8
+            clinical_factors.append("Presión arterial muy elevada (≥180)")
+        elif resting_bp >= 160:
+            risk_multiplier *= 1.5
+            clinical_factors.append("Hipertensión grado 2 (160-179)")
+        elif resting_bp >= 140:
+            risk_multiplier *= 1.3
+            clinical_factors.append("Hipertensión grado 1 (140-159)")
+        elif resting_bp >= 130:
+            risk_multiplier *= 1.1
+            clinical_factors.append("Pre-hipertensión (130-139)")
+        
+        # 4. COLESTEROL - REDUCIDO
+        cholesterol = float(input_data.get('Cholesterol', 200))
+        if cholesterol >= 300:
+            risk_multiplier *= 1.6
+            clinical_factors.append("Colesterol muy elevado (≥300)")
+        elif cholesterol >= 240:
+            risk_multiplier *= 1.3
+            clinical_factors.append("Colesterol elevado (240-299)")
+        elif cholesterol >= 200:
+            risk_multiplier *= 1.1
+            clinical_factors.append("Colesterol en límite alto (200-239)")
+        
+        # 5. DEPRESIÓN ST - REDUCIDO
+        oldpeak = float(input_data.get('Oldpeak', 0))
+        if oldpeak >= 3:
+            risk_multiplier *= 1.8
+            clinical_factors.append("Depresión ST significativa (≥3)")
+        elif oldpeak >= 2:
+            risk_multiplier *= 1.5
+            clinical_factors.append("Depresión ST moderada (2-2.9)")
+        elif oldpeak >= 1:
+            risk_multiplier *= 1.2
+            clinical_factors.append("Depresión ST leve (1-1.9)")
+        
+        # 6. DIABETES - REDUCIDO
+        if int(input_data.get('FastingBS', 0)) == 1:
+            risk_multiplier *= 1.4
+            clinical_factors.append("Glucosa en ayunas elevada (≥120)")
+        
+        # 7. EDAD - REDUCIDO
+        age = float(input_data.get('Age', 0))
+        if age >= 70:
+            risk_multiplier *= 1.4
+            clinical_factors.append("Edad avanzada (≥70 años)")
+        elif age >= 60:
+            risk_multiplier *= 1.2
+        elif age >= 50:
+            risk_multiplier *= 1.1
+        
+        # 8. SEXO MASCULINO - REDUCIDO
+        if input_data.get('Sex') == 'M':
+            risk_multiplier *= 1.1
+        
+        # 9. TIPO DE DOLOR DE PECHO - NUEVO FACTOR
+        chest_pain = input_data.get('ChestPainType', 'ASY')
+        if chest_pain == 'ASY':
+            risk_multiplier *= 1.2
+            clinical_factors.append("Dolor torácico asintomático")
+        elif chest_pain == 'ATA':
+            risk_multiplier *= 1.1
+            clinical_factors.append("Angina atípica")
+        
+        # ============================================
+        # AJUSTE DE PROBABILIDAD - UMBRALES REALISTAS
+        # ============================================
+        base_probability = model_probability
+        adjusted_probability = min(0.85, base_probability * risk_multiplier)
+        
+        # FACTORES CRÍTICOS REALES
+        critical_factors = ['Enfermedad cardíaca diagnosticada', 'Presión arterial muy elevada',
+                          'Angina con ejercicio', 'Depresión ST significativa']
+        critical_count = sum(1 for factor in clinical_factors if factor in critical_factors)
+        
+        moderate_factors = ['Glucosa en ayunas elevada', 'Colesterol muy elevado',
+                          'Hipertensión grado 2', 'Edad avanzada']
+        moderate_count = sum(1 for factor in clinical_factors if factor in moderate_factors)
+        
+        # UMBRALES MÁS CONSERVADORES
+        if critical_count >= 2:
+            adjusted_probability = max(adjusted_probability, 0.6)
+        elif critical_count >= 1 or moderate_count >= 2:
+            adjusted_probability = max(adjusted_probability, 0.4)
+        
+        # DECISIÓN FINAL MÁS CONSERVADORA
+        total_factors = len(clinical_factors)
+        
+        if adjusted_probability < 0.25:
+            final_prediction = 0  # Riesgo bajo
+        elif adjusted_probability < 0.45:
+            # Solo riesgo si hay múltiples factores
+            final_prediction = 1 if (critical_count >= 1 or total_factors >= 3) else 0
+        else:
+            final_prediction = 1  # Riesgo claro
+        
+        # EVITAR ALARMISMO INNECESARIO
+        if model_prediction == 0 and total_factors <= 1:
+            # Si solo hay 1 factor y modelo dice 0, mantener bajo
+            if adjusted_probability > 0.3:
+                adjusted_probability = 0.3
+        
+        # LIMITAR MÁXIMO
+        adjusted_probability = min(0.75, adjusted_probability)
+        
+        return {
+            'prediction': int(final_prediction),
+            'probability': float(adjusted_probability),
+            'base_probability': float(base_probability),
+            'risk_multiplier': float(risk_multiplier),
+            'clinical_factors': clinical_factors,
+            'critical_count': int(critical_count),
+            'moderate_count': int(moderate_count),
+            'total_factors': int(total_factors)
+        }
+
+# ============================
+# PACIENTES ALEATORIOS
+# ============================
+
+# Valores justo en los límites de cada regla (y alrededor) para forzar los bordes
+STROKE_EDGES = {
+    'age': [0, 44.9, 45, 54.9, 55, 64.9, 65, 74.9, 75, 90, '67', float('nan')],
+    'avg_glucose_level': [55, 125.9, 126, 159.9, 160, 199.9, 200, 280, '228.69'],
+    'bmi': [15, 26.9, 27, 29.9, 30, 34.9, 35, 39.9, 40, 55, '36.6']
+}
+
+HEART_EDGES = {
+    'Age': [20, 49.9, 50, 59.9, 60, 69.9, 70, 85, '40'],
+    'RestingBP': [0, 129, 130, 139, 140, 159, 160, 179, 180, 200, '140'],
+    'Cholesterol': [0, 199, 200, 239, 240, 299, 300, 600, '289'],
+    'Oldpeak': [-2, 0, 0.9, 1, 1.9, 2, 2.9, 3, 6.2, '0.0']
+}
+
+def random_value(rng, edges, low, high):
+    """Valor en un límite o uniforme en el rango"""
+    if rng.random() < 0.5:
+        return rng.choice(edges)
+    return rng.uniform(low, high)
+
+def random_stroke_patient(rng):
+    """Cuestionario de stroke aleatorio (con campos faltantes y valores inválidos)"""
+    data = {
+        'gender': rng.choice(['Male', 'Female', 'Other', None]),
+        'age': random_value(rng, STROKE_EDGES['age'], 0, 100),
+        'hypertension': rng.choice([0, 1, '1', 2]),
+        'heart_disease': rng.choice([0, 1, '0', True]),
+        'ever_married': rng.choice(['Yes', 'No']),
+        'work_type': rng.choice(['Private', 'Self-employed', 'Govt_job', 'Children', 'Never_worked']),
+        'Residence_type': rng.choice(['Urban', 'Rural']),
+        'avg_glucose_level': random_value(rng, STROKE_EDGES['avg_glucose_level'], 50, 300),
+        'bmi': random_value(rng, STROKE_EDGES['bmi'], 10, 60),
+        'smoking_status': rng.choice(['formerly smoked', 'never smoked', 'smokes', 'Unknown', 'x'])
+    }
+    for key in list(data):
+        if rng.random() < 0.1:
+            del data[key]
+    return data
+
+def random_heart_patient(rng):
+    """Cuestionario cardíaco aleatorio (con campos faltantes y valores inválidos)"""
+    data = {
+        'Age': random_value(rng, HEART_EDGES['Age'], 18, 95),
+        'Sex': rng.choice(['M', 'F', 'X']),
+        'ChestPainType': rng.choice(['TA', 'ATA', 'NAP', 'ASY', '?']),
+        'RestingBP': random_value(rng, HEART_EDGES['RestingBP'], 0, 220),
+        'Cholesterol': random_value(rng, HEART_EDGES['Cholesterol'], 0, 600),
+        'FastingBS': rng.choice([0, 1, '1']),
+        'RestingECG': rng.choice(['Normal', 'ST', 'LVH']),
+        'MaxHR': rng.uniform(60, 202),
+        'ExerciseAngina': rng.choice(['Y', 'N', 'y']),
+        'Oldpeak': random_value(rng, HEART_EDGES['Oldpeak'], -2.6, 6.2),
+        'ST_Slope': rng.choice(['Up', 'Flat', 'Down']),
+        'HeartDisease': rng.choice([0, 1])
+    }
+    for key in list(data):
+        if rng.random() < 0.1:
+            del data[key]
+    return data
+
+def same_value(expected, actual):
+    """Igualdad exacta (NaN == NaN)"""
+    if isinstance(expected, float) and isinstance(actual, float):
+        return expected == actual or (np.isnan(expected) and np.isnan(actual))
+    return expected == actual and type(expected) == type(actual)
+
+def check(name, records, legacy_adjust, batch_adjust, scalar_adjust, rng):
+    """Comparar campo por campo cada paciente; devuelve el número de diferencias"""
+    probabilities = [rng.choice([0.0, 0.05, 0.15, 0.2, 0.25, 0.3, 0.4, 0.45, 0.5, 0.7, 1.0])
+                     if rng.random() < 0.3 else rng.random() for _ in records]
+    predictions = [rng.choice([0, 1]) for _ in records]
+
+    batch = batch_adjust(records, np.array(predictions), np.array(probabilities))
+    mismatches = 0
+
+    for i, data in enumerate(records):
+        expected = legacy_adjust(data, predictions[i], probabilities[i])
+        candidates = [BatchClinicalRiskAdjuster.to_adjustment(batch, i)]
+        # La ruta de un solo paciente se verifica en una muestra (es más lenta)
+        if i % 20 == 0:
+            candidates.append(scalar_adjust(data, predictions[i], probabilities[i]))
+
+        for actual in candidates:
+            if expected.keys() != actual.keys() or \
+               not all(same_value(expected[key], actual[key]) for key in expected):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  ❌ Paciente {i}: {data}")
+                    print(f"     original: {expected}")
+                    print(f"     tabla:    {actual}")
+                break
+
+    status = "✅" if mismatches == 0 else "❌"
+    print(f"{status} {name}: {len(records) - mismatches}/{len(records)} pacientes idénticos")
+    return mismatches
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 42
+    rng = random.Random(seed)
+
+    print("=" * 50)
+    print(f"PARIDAD DEL AJUSTE CLÍNICO ({n} pacientes, semilla {seed})")
+    print("=" * 50)
+
+    failures = check('Stroke', [random_stroke_patient(rng) for _ in range(n)],
+                     LegacyClinicalRiskAdjuster.adjust_stroke_risk,
+                     BatchClinicalRiskAdjuster.adjust_stroke_risk,
+                     ClinicalRiskAdjuster.adjust_stroke_risk, rng)
+    failures += check('Heart', [random_heart_patient(rng) for _ in range(n)],
+                      LegacyClinicalRiskAdjuster.adjust_heart_risk,
+                      BatchClinicalRiskAdjuster.adjust_heart_risk,
+                      ClinicalRiskAdjuster.adjust_heart_risk, rng)
+
+    sys.exit(1 if failures else 0)
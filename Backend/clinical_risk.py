@@ -0,0 +1,67 @@
+# clinical_risk.py - Corrección clínica de las predicciones (desequilibrio de clases)
+# Los umbrales y multiplicadores viven en clinical_rules.json (ver clinical_rules.py)
+from clinical_rules import get_rules
+
+# ============================
+# CORRECCIÓN DE DESEQUILIBRIO
+# ============================
+
+class BatchClinicalRiskAdjuster:
+    """Ajusta predicciones de N pacientes a la vez con la tabla de reglas compilada"""
+
+    @staticmethod
+    def adjust(model_type, records, model_predictions, model_probabilities):
+        """
+        Ajustar riesgo de una lista de cuestionarios. Devuelve un dict de arreglos
+        (probabilidades, multiplicadores, máscara de factores y conteos)
+        """
+        # Una sola referencia a las reglas: una recarga no puede mezclar versiones
+        rules = get_rules(model_type)
+        return rules.adjust(rules.extract(records), model_predictions, model_probabilities)
+
+    @staticmethod
+    def adjust_stroke_risk(records, model_predictions, model_probabilities):
+        """Ajustar riesgo de stroke para una lista de cuestionarios"""
+        return BatchClinicalRiskAdjuster.adjust('stroke', records, model_predictions, model_probabilities)
+
+    @staticmethod
+    def adjust_heart_risk(records, model_predictions, model_probabilities):
+        """Ajustar riesgo cardíaco para una lista de cuestionarios"""
+        return BatchClinicalRiskAdjuster.adjust('heart', records, model_predictions, model_probabilities)
+
+    @staticmethod
+    def factors_from_mask(mask, labels):
+        """Lista de factores clínicos (en orden) a partir de la máscara de bits"""
+        mask = int(mask)
+        return [label for i, label in enumerate(labels) if mask >> i & 1]
+
+    @staticmethod
+    def to_adjustment(batch_result, i):
+        """Resultado de la fila i como dict (formato de ClinicalRiskAdjuster)"""
+        adjustment = {
+            'prediction': int(batch_result['prediction'][i]),
+            'probability': float(batch_result['probability'][i]),
+            'base_probability': float(batch_result['base_probability'][i]),
+            'risk_multiplier': float(batch_result['risk_multiplier'][i]),
+            'clinical_factors': BatchClinicalRiskAdjuster.factors_from_mask(
+                batch_result['factor_mask'][i], batch_result['factor_labels'])
+        }
+        for key in batch_result:
+            if key.endswith('_count') or key == 'total_factors':
+                adjustment[key] = int(batch_result[key][i])
+        return adjustment
+
+class ClinicalRiskAdjuster:
+    """Ajusta la predicción de un solo paciente (lote de tamaño uno)"""
+
+    @staticmethod
+    def adjust_stroke_risk(input_data, model_prediction, model_probability):
+        """Ajustar riesgo de stroke basado en factores clínicos"""
+        result = BatchClinicalRiskAdjuster.adjust_stroke_risk([input_data], [model_prediction], [model_probability])
+        return BatchClinicalRiskAdjuster.to_adjustment(result, 0)
+
+    @staticmethod
+    def adjust_heart_risk(input_data, model_prediction, model_probability):
+        """Ajustar riesgo cardíaco basado en factores clínicos"""
+        result = BatchClinicalRiskAdjuster.adjust_heart_risk([input_data], [model_prediction], [model_probability])
+        return BatchClinicalRiskAdjuster.to_adjustment(result, 0)
@@ -0,0 +1,248 @@
+# clinical_rules.py - Motor de reglas clínicas definido en clinical_rules.json
+import os
+import json
+import time
+import threading
+import numpy as np
+
+RULES_PATH = os.environ.get(
+    'LIFESCAN_RULES_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clinical_rules.json')
+)
+# Segundos entre revisiones del archivo de reglas (0 = sin recarga automática)
+RULES_RELOAD_INTERVAL = float(os.environ.get('LIFESCAN_RULES_RELOAD_INTERVAL', 30))
+
+# ============================
+# COMPILACIÓN DE LA TABLA
+# ============================
+
+class CompiledFeature:
+    """
+    Una regla de la tabla ya compilada: cada valor se traduce a un índice de bin
+    y con él se leen el multiplicador y la columna de factor (-1 = sin factor)
+    """
+
+    def __init__(self, spec, factor_labels, factor_tags):
+        self.field = spec['field']
+        self.kind = spec['type']
+        self.default = spec.get('default')
+        entries = [{}]  # Índice 0: ninguna regla aplica
+
+        if self.kind == 'numeric':
+            bins = spec['bins']
+            self.edges = np.array([entry['min'] for entry in bins], dtype=np.float64)
+            if len(self.edges) == 0 or np.any(np.diff(self.edges) <= 0):
+                raise ValueError(f"'{self.field}': los bins deben estar en orden creciente")
+            entries += bins
+        elif self.kind == 'flag':
+            entries.append(spec)
+        elif self.kind == 'category':
+            # Código 0 = valor sin regla; los demás en el orden de la tabla
+            self.codes = {value: code for code, value in enumerate(spec['values'], start=1)}
+            entries += list(spec['values'].values())
+        else:
+            raise ValueError(f"'{self.field}': tipo de regla desconocido '{self.kind}'")
+
+        self.multipliers = np.array([float(entry.get('multiplier', 1.0)) for entry in entries])
+        if np.any(self.multipliers <= 0):
+            raise ValueError(f"'{self.field}': los multiplicadores deben ser positivos")
+
+        self.factor_columns = np.full(len(entries), -1, dtype=np.intp)
+        for i, entry in enumerate(entries):
+            if 'factor' in entry:
+                self.factor_columns[i] = len(factor_labels)
+                factor_labels.append(entry['factor'])
+                factor_tags.append(set(entry.get('tags', [])))
+
+    def extract(self, records):
+        """Columna de la regla con la misma conversión que el cuestionario"""
+        values = (data.get(self.field, self.default) for data in records)
+        if self.kind == 'numeric':
+            return np.fromiter((float(value) for value in values), dtype=np.float64, count=len(records))
+        if self.kind == 'flag':
+            return np.fromiter((int(value) == 1 for value in values), dtype=np.intp, count=len(records))
+        codes = self.codes
+        return np.fromiter((codes.get(value, 0) if isinstance(value, str) else 0 for value in values),
+                           dtype=np.intp, count=len(records))
+
+    def bin_index(self, column):
+        """Índice de bin por paciente (búsqueda binaria sobre los límites precalculados)"""
+        if self.kind != 'numeric':
+            return column
+        index = np.searchsorted(self.edges, column, side='right')
+        # NaN no cumple ningún umbral
+        return np.where(np.isnan(column), 0, index)
+
+class CompiledModelRules:
+    """Reglas compiladas de un modelo ('stroke' o 'heart')"""
+
+    def __init__(self, model_type, spec):
+        self.model_type = model_type
+        self.factor_labels = []
+        factor_tags = []
+        self.features = [CompiledFeature(feature, self.factor_labels, factor_tags)
+                         for feature in spec['features']]
+
+        self.counts = list(spec.get('counts', []))
+        self.count_columns = {
+            name: np.array([i for i, tags in enumerate(factor_tags) if name in tags], dtype=np.intp)
+            for name in self.counts
+        }
+        unknown = set().union(*factor_tags) - set(self.counts) if factor_tags else set()
+        if unknown:
+            raise ValueError(f"{model_type}: etiquetas sin declarar en 'counts': {sorted(unknown)}")
+
+        self.decision = spec['decision']
+        self.bits = np.left_shift(np.int64(1), np.arange(len(self.factor_labels), dtype=np.int64))
+
+    def extract(self, records):
+        """Columnas de todas las reglas para una lista de cuestionarios"""
+        return [feature.extract(records) for feature in self.features]
+
+    def _any_count(self, when, counts):
+        """Condición {"conteo": mínimo, ...}: se cumple si alguno llega a su mínimo"""
+        result = np.zeros(len(counts['total']), dtype=bool) if when else np.ones(len(counts['total']), dtype=bool)
+        for name, minimum in (when or {}).items():
+            result |= counts[name] >= minimum
+        return result
+
+    def adjust(self, columns, model_predictions, model_probabilities):
+        """Aplicar la tabla a N pacientes. Devuelve un dict de arreglos de longitud N"""
+        base_probability = np.asarray(model_probabilities, dtype=np.float64)
+        model_predictions = np.asarray(model_predictions)
+        n = len(base_probability)
+        factors = np.zeros((n, len(self.factor_labels)), dtype=bool)
+        risk_multiplier = np.ones(n)
+        rows = np.arange(n)
+
+        # Se multiplica en el orden de la tabla (un multiplicador por regla)
+        for feature, column in zip(self.features, columns):
+            index = feature.bin_index(column)
+            risk_multiplier *= feature.multipliers[index]
+            factor_column = feature.factor_columns[index]
+            has_factor = factor_column >= 0
+            factors[rows[has_factor], factor_column[has_factor]] = True
+
+        counts = {name: factors[:, cols].sum(axis=1) for name, cols in self.count_columns.items()}
+        counts['total'] = factors.sum(axis=1)
+
+        decision = self.decision
+        adjusted_probability = np.minimum(decision['initial_cap'], base_probability * risk_multiplier)
+
+        # Pisos de probabilidad: se aplica solo el primero que se cumpla
+        floors = decision.get('floors', [])
+        if floors:
+            adjusted_probability = np.select(
+                [self._any_count(floor.get('when'), counts) for floor in floors],
+                [np.maximum(adjusted_probability, floor['probability']) for floor in floors],
+                adjusted_probability
+            )
+
+        prediction = decision['prediction']
+        final_prediction = np.where(adjusted_probability < prediction['low'], 0,
+                           np.where(adjusted_probability < prediction['high'],
+                                    self._any_count(prediction['positive_if'], counts), 1)).astype(np.int64)
+
+        # Corrección cuando el modelo original dice 0
+        negative = decision.get('model_negative')
+        if negative:
+            applies = (model_predictions == 0) & \
+                      (counts['total'] >= negative.get('total_min', 0)) & \
+                      (counts['total'] <= negative.get('total_max', len(self.factor_labels)))
+            for floor in negative.get('floors', []):
+                raise_to = applies & (adjusted_probability < floor['probability']) & \
+                           self._any_count(floor.get('when'), counts)
+                adjusted_probability = np.where(raise_to, floor['probability'], adjusted_probability)
+            if 'cap' in negative:
+                adjusted_probability = np.where(applies & (adjusted_probability > negative['cap']),
+                                                negative['cap'], adjusted_probability)
+
+        adjusted_probability = np.minimum(decision['max_probability'], adjusted_probability)
+
+        result = {
+            'prediction': final_prediction,
+            'probability': adjusted_probability,
+            'base_probability': base_probability,
+            'risk_multiplier': risk_multiplier,
+            'factor_mask': factors.astype(np.int64) @ self.bits,
+            'factor_labels': self.factor_labels
+        }
+        for name in self.counts:
+            result[f'{name}_count'] = counts[name]
+        result['total_factors'] = counts['total']
+        return result
+
+class CompiledRules:
+    """Tabla completa compilada (todos los modelos)"""
+
+    def __init__(self, spec, path=None, mtime=None):
+        self.version = spec.get('version', 'sin versión')
+        self.path = path
+        self.mtime = mtime
+        self.loaded_at = time.time()
+        self.models = {model_type: CompiledModelRules(model_type, spec[model_type])
+                       for model_type in ('stroke', 'heart')}
+
+def compile_rules(path=RULES_PATH):
+    """Leer y compilar la tabla de reglas (lanza ValueError/KeyError si es inválida)"""
+    mtime = os.path.getmtime(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    return CompiledRules(spec, path, mtime)
+
+# ============================
+# REGLAS ACTIVAS Y RECARGA
+# ============================
+
+# Se compila una sola vez al iniciar; las recargas reemplazan la referencia completa
+_current_rules = compile_rules()
+_reload_lock = threading.Lock()
+
+def get_rules(model_type):
+    """Reglas compiladas activas para un modelo"""
+    return _current_rules.models[model_type]
+
+def rules_status():
+    """Información de la tabla activa"""
+    rules = _current_rules
+    return {
+        'version': rules.version,
+        'path': rules.path,
+        'loaded_at': rules.loaded_at,
+        'factors': {model_type: len(model.factor_labels) for model_type, model in rules.models.items()}
+    }
+
+def reload_rules(force=False):
+    """
+    Recompilar la tabla si el archivo cambió. La compilación ocurre fuera del camino
+    de las peticiones; si la tabla nueva es inválida se conservan las reglas actuales.
+    Devuelve True si se activaron reglas nuevas
+    """
+    global _current_rules
+
+    with _reload_lock:
+        try:
+            if not force and os.path.getmtime(RULES_PATH) == _current_rules.mtime:
+                return False
+            rules = compile_rules(RULES_PATH)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Reglas clínicas no recargadas: {e}")
+            return False
+
+        _current_rules = rules
+        print(f"🔄 Reglas clínicas recargadas (versión {rules.version})")
+        return True
+
+def start_rules_watcher(interval=RULES_RELOAD_INTERVAL):
+    """Hilo en segundo plano que recarga la tabla cuando cambia el archivo"""
+    if interval <= 0:
+        return None
+
+    def watch():
+        while True:
+            time.sleep(interval)
+            reload_rules()
+
+    thread = threading.Thread(target=watch, name='clinical-rules-watcher', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,69 @@
+# image_preprocessing.py - Decodificación y preprocesamiento de imágenes para el modelo de piel
+import io
+import os
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+# Tamaño de entrada de MobileNetV2
+IMAGE_SIZE = (224, 224)
+# Formatos aceptados (según el contenido, no la extensión) y máximo de píxeles por imagen
+ALLOWED_FORMATS = frozenset({'JPEG', 'PNG', 'GIF', 'BMP'})
+MAX_IMAGE_PIXELS = int(os.environ.get('LIFESCAN_MAX_IMAGE_PIXELS', 50_000_000))
+
+class InvalidImageError(ValueError):
+    """El archivo no es una imagen aceptada (el servidor debe responder 400)"""
+
+def open_image(source):
+    """
+    Abrir una imagen sin decodificarla: Image.open solo lee la cabecera, así un archivo
+    que no es imagen (o una imagen gigantesca) se rechaza antes de gastar memoria
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        img = Image.open(source)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise InvalidImageError("El archivo no es una imagen válida")
+    if img.format not in ALLOWED_FORMATS:
+        raise InvalidImageError(f"Formato de imagen no soportado: {img.format}")
+    if img.width * img.height > MAX_IMAGE_PIXELS:
+        raise InvalidImageError(f"Imagen demasiado grande: {img.width}x{img.height} píxeles")
+    return img
+
+def load_rgb(source, size=IMAGE_SIZE):
+    """
+    Abrir una imagen (bytes o archivo, p. ej. el stream de la subida) en RGB y del tamaño del modelo.
+    En JPEG, draft() decodifica directamente a 1/2, 1/4 u 1/8 de resolución (lo más
+    cerca posible de `size` sin bajar de él): una foto de 12 MP no se decodifica completa.
+    Con reducing_gap el resto de formatos se reducen primero por bloques y luego se remuestrean
+    """
+    img = open_image(source)
+    try:
+        if img.format == 'JPEG':
+            img.draft('RGB', size)
+        # Convertir antes de redimensionar: el remuestreo trabaja siempre sobre 3 canales
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != size:
+            img = img.resize(size, reducing_gap=3.0)
+        else:
+            img.load()
+    except (OSError, SyntaxError) as e:  # Archivo truncado o corrupto
+        raise InvalidImageError(f"La imagen no se pudo decodificar: {e}")
+    return img
+
+def to_model_array(img, out=None):
+    """
+    Escribir la imagen en `out` (float32, alto x ancho x 3) con la escala de
+    MobileNetV2 (preprocess_input: x / 127.5 - 1) sin arreglos intermedios
+    """
+    if out is None:
+        out = np.empty((img.size[1], img.size[0], 3), dtype=np.float32)
+    np.copyto(out, np.asarray(img), casting='unsafe')
+    np.divide(out, 127.5, out=out)
+    out -= 1.0
+    return out
+
+def preprocess_image(source, out=None, size=IMAGE_SIZE):
+    """Imagen lista para el modelo: arreglo float32 (alto, ancho, 3)"""
+    return to_model_array(load_rgb(source, size), out)
@@ -0,0 +1,52 @@
+# inference.py - Capa de inferencia compartida para los modelos tabulares
+import os
+import numpy as np
+
+# ============================
+# UMBRALES DE DECISIÓN
+# ============================
+
+# Umbral por defecto: el mismo que usan predict() de sklearn/xgboost en binario
+DEFAULT_THRESHOLD = 0.5
+
+# Umbral por modelo (se puede sobreescribir con variables de entorno)
+MODEL_THRESHOLDS = {
+    'stroke': os.environ.get('LIFESCAN_STROKE_THRESHOLD'),
+    'heart': os.environ.get('LIFESCAN_HEART_THRESHOLD')
+}
+
+def get_decision_threshold(model, model_type=None):
+    """
+    Umbral de decisión del modelo: configuración explícita, luego el umbral
+    guardado en el propio modelo (p. ej. TunedThresholdClassifierCV) y por último 0.5
+    """
+    configured = MODEL_THRESHOLDS.get(model_type)
+    if configured is not None:
+        return float(configured)
+
+    for attr in ('best_threshold_', 'decision_threshold_', 'threshold_'):
+        value = getattr(model, attr, None)
+        if value is not None:
+            return float(value)
+
+    return DEFAULT_THRESHOLD
+
+# ============================
+# PREDICCIÓN EN UNA SOLA PASADA
+# ============================
+
+def predict_with_threshold(model, df_input, threshold=DEFAULT_THRESHOLD):
+    """
+    Ejecutar el pipeline UNA sola vez (predict_proba) y derivar la clase
+    a partir de la probabilidad de la clase positiva.
+    Devuelve (predicciones int, probabilidades float) como arreglos NumPy
+    """
+    probabilities = np.asarray(model.predict_proba(df_input))[:, 1]
+    # Igual que predict(): clase positiva solo si supera estrictamente el umbral
+    predictions = (probabilities > threshold).astype(np.int64)
+    return predictions, probabilities
+
+def predict_one(model, df_input, threshold=DEFAULT_THRESHOLD):
+    """Predicción de una sola fila: (clase, probabilidad) como tipos de Python"""
+    predictions, probabilities = predict_with_threshold(model, df_input, threshold)
+    return int(predictions[0]), float(probabilities[0])
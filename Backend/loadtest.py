@@ -0,0 +1,208 @@
+# loadtest.py - Prueba de carga: rendimiento de stroke/heart/skin según el número de workers
+#
+# Uso:
+#   python loadtest.py                         # lanza serve.py con 1, 2 y 4 workers
+#   python loadtest.py --workers 1 2 4 8 --concurrency 16 --duration 10
+#   python loadtest.py --url http://127.0.0.1:5000   # servidor ya en marcha
+#   python loadtest.py --cache                 # con las cachés de predicciones activas
+#
+# Cada petición lleva datos distintos: sin --cache, serve.py se lanza con las cachés de
+# predicciones desactivadas para medir la inferencia y no aciertos de caché
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+
+from benchmark import STROKE_SAMPLE, HEART_SAMPLE
+
+ENDPOINTS = ('stroke', 'heart', 'skin')
+
+def sample_image(sequence=0):
+    """Imagen PNG sintética de 224x224 para el endpoint de piel (tono y franja según `sequence`)"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    image = Image.new('RGB', (224, 224), (150 + sequence % 64, 100 + sequence // 64 % 64, 96))
+    image.paste((sequence // 4096 % 256, 60, 40), (0, 0, 224, 8))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def sample_record(endpoint, sequence=0):
+    """Registro de prueba con valores numéricos que cambian con `sequence` (no se repite en 20000 peticiones)"""
+    if endpoint == 'stroke':
+        return dict(STROKE_SAMPLE, avg_glucose_level=round(60 + sequence % 200 + sequence // 200 % 100 / 100, 2),
+                    age=30 + sequence // 20000 % 60)
+    return dict(HEART_SAMPLE, Cholesterol=150 + sequence % 200, RestingBP=100 + sequence // 200 % 100,
+                Age=30 + sequence // 20000 % 50)
+
+def build_request(endpoint, sequence=0):
+    """(ruta, cuerpo, cabeceras) de la petición de prueba número `sequence`"""
+    if endpoint in ('stroke', 'heart'):
+        body = json.dumps(sample_record(endpoint, sequence)).encode('utf-8')
+        return f'/api/predict/{endpoint}', body, {'Content-Type': 'application/json'}
+
+    image_data = sample_image(sequence)
+    if image_data is None:
+        return None
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="prueba.png"\r\n'
+            f'Content-Type: image/png\r\n\r\n').encode('utf-8') + image_data + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return '/api/predict/skin', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+def run_load(base_url, endpoint, concurrency, duration):
+    """Enviar peticiones distintas desde `concurrency` hilos durante `duration` segundos"""
+    if build_request(endpoint) is None:
+        return None
+    parts = urlsplit(base_url)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        local_latencies = []
+        local_statuses = {}
+        sequence = index
+        while time.perf_counter() < deadline:
+            # La petición se arma antes de medir: su coste es del cliente, no del servidor
+            path, body, headers = build_request(endpoint, sequence)
+            sequence += concurrency
+            start = time.perf_counter()
+            try:
+                connection.request('POST', path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+                status = 'error'
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ok = statuses.get(200, 0)
+    return {
+        'requests': len(latencies),
+        'ok': ok,
+        'statuses': statuses,
+        'rps': ok / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    }
+
+def wait_until_ready(base_url, timeout=300):
+    """Esperar a que /api/health responda con los modelos tabulares listos"""
+    parts = urlsplit(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=5)
+            connection.request('GET', '/api/health')
+            health = json.loads(connection.getresponse().read())
+            connection.close()
+            states = {name: status['state'] for name, status in health.get('model_status', {}).items()}
+            if states and all(state in ('ready', 'failed') for state in states.values()):
+                return states
+        except (OSError, ValueError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("El servidor no respondió a tiempo")
+
+def start_server(workers, port, cache=False):
+    """Lanzar serve.py en un subproceso (con las cachés de predicciones desactivadas salvo cache=True)"""
+    command = [sys.executable, 'serve.py', '--workers', str(workers), '--bind', f'127.0.0.1:{port}']
+    env = dict(os.environ)
+    if not cache:
+        env.update(LIFESCAN_SKIN_CACHE_MAX_ENTRIES='0', LIFESCAN_TABULAR_CACHE_MAX_ENTRIES='0')
+    return subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def print_results(label, results):
+    print(f"\n📊 {label}")
+    print(f"  {'endpoint':8} {'peticiones':>10} {'ok':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for endpoint, result in results.items():
+        if result is None:
+            print(f"  {endpoint:8} (sin Pillow para generar la imagen de prueba)")
+            continue
+        print(f"  {endpoint:8} {result['requests']:>10} {result['ok']:>7} {result['rps']:>9.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f}")
+        failed = {status: count for status, count in result['statuses'].items() if status != 200}
+        if failed:
+            print(f"  {'':8} respuestas no 200: {failed}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga LifeScan")
+    parser.add_argument('--url', help="probar un servidor ya en marcha en lugar de lanzar serve.py")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, default=8, help="clientes simultáneos")
+    parser.add_argument('--duration', type=float, default=5, help="segundos por endpoint")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--cache', action='store_true',
+                        help="lanzar serve.py con las cachés de predicciones activas (por defecto desactivadas)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print(f"🔥 PRUEBA DE CARGA ({args.concurrency} clientes, {args.duration:.0f}s por endpoint, "
+          f"{os.cpu_count()} núcleos, cachés {'activas' if args.cache or args.url else 'desactivadas'})")
+    print("=" * 60)
+
+    if args.url:
+        wait_until_ready(args.url)
+        results = {endpoint: run_load(args.url, endpoint, args.concurrency, args.duration)
+                   for endpoint in args.endpoints}
+        print_results(args.url, results)
+        return 0
+
+    summary = {}
+    for workers in args.workers:
+        server = start_server(workers, args.port, args.cache)
+        base_url = f'http://127.0.0.1:{args.port}'
+        try:
+            states = wait_until_ready(base_url)
+            results = {endpoint: run_load(base_url, endpoint, args.concurrency, args.duration)
+                       for endpoint in args.endpoints}
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+        print_results(f"{workers} worker(s) - modelos: {states}", results)
+        summary[workers] = results
+
+    # Escalado respecto al primer número de workers
+    baseline_workers = args.workers[0]
+    print("\n📈 ESCALADO (req/s relativo a {} worker(s))".format(baseline_workers))
+    for endpoint in args.endpoints:
+        baseline = summary[baseline_workers][endpoint]
+        if baseline is None or baseline['rps'] == 0:
+            continue
+        scaling = "  ".join(f"{workers}w: x{summary[workers][endpoint]['rps'] / baseline['rps']:.2f}"
+                            for workers in args.workers)
+        print(f"  {endpoint:8} {scaling}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,339 @@
+# metrics.py - Latencia por etapa, contadores y endpoint /metrics (formato de texto de Prometheus)
+import os
+import time
+import bisect
+import threading
+from flask import Response, request
+
+# 0 = sin instrumentación (los hooks no se registran y mark() no hace nada)
+METRICS_ENABLED = os.environ.get('LIFESCAN_METRICS', '1') != '0'
+
+# Límites de los histogramas de latencia (segundos)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ============================
+# TIPOS DE MÉTRICAS
+# ============================
+
+class Counter:
+    """Contador monotónico por combinación de etiquetas"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def load(self, values):
+        """Reemplazar todos los valores (totales ya agregados)"""
+        with self._lock:
+            self._values = values
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, label_values, value) for label_values, value in self._values.items()]
+
+class Histogram:
+    """
+    Histograma con límites fijos por combinación de etiquetas. Cada observación solo
+    incrementa un casillero (bisect); los acumulados se calculan al exportar
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        self.observe_many(((label_values, value),))
+
+    def observe_many(self, observations):
+        """Varias observaciones (etiquetas, valor) con un solo bloqueo"""
+        buckets = self.buckets
+        with self._lock:
+            for label_values, value in observations:
+                series = self._series.get(label_values)
+                if series is None:
+                    series = self._series[label_values] = [[0] * (len(buckets) + 1), 0.0, 0]
+                series[0][bisect.bisect_left(buckets, value)] += 1
+                series[1] += value
+                series[2] += 1
+
+    def load(self, series):
+        """Reemplazar todas las series: {etiquetas: [casilleros, suma, número]}"""
+        with self._lock:
+            self._series = series
+
+    def samples(self):
+        with self._lock:
+            series = [(label_values, list(counts), total, count)
+                      for label_values, (counts, total, count) in self._series.items()]
+        samples = []
+        for label_values, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append((f'{self.name}_bucket', label_values + (format_bound(bound),), cumulative))
+            samples.append((f'{self.name}_sum', label_values, total))
+            samples.append((f'{self.name}_count', label_values, count))
+        return samples
+
+class Summary:
+    """Suma y número de observaciones por combinación de etiquetas (sin casilleros: más barato que un histograma)"""
+
+    kind = 'summary'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe_many(self, observations):
+        """Varias observaciones (etiquetas, valor) con un solo bloqueo"""
+        with self._lock:
+            for label_values, value in observations:
+                series = self._series.get(label_values)
+                if series is None:
+                    self._series[label_values] = [value, 1]
+                else:
+                    series[0] += value
+                    series[1] += 1
+
+    def load(self, series):
+        """Reemplazar todas las series: {etiquetas: [suma, número]}"""
+        with self._lock:
+            self._series = series
+
+    def samples(self):
+        with self._lock:
+            series = [(label_values, total, count) for label_values, (total, count) in self._series.items()]
+        samples = []
+        for label_values, total, count in series:
+            samples.append((f'{self.name}_sum', label_values, total))
+            samples.append((f'{self.name}_count', label_values, count))
+        return samples
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+# ============================
+# MÉTRICAS DEL SERVIDOR
+# ============================
+
+REQUEST_LATENCY = Histogram('lifescan_request_duration_seconds',
+                            'Latencia de cada petición (antes de escribir la respuesta)', ('endpoint',))
+STAGE_LATENCY = Summary('lifescan_stage_duration_seconds',
+                        'Tiempo por etapa: parse, preprocess, cache, model, clinical, html, serialize, compress',
+                        ('endpoint', 'stage'))
+REQUESTS = Counter('lifescan_requests_total', 'Peticiones atendidas por código de estado', ('endpoint', 'status'))
+ERRORS = Counter('lifescan_errors_total', 'Errores por tipo de excepción', ('endpoint', 'exception'))
+
+METRICS = [REQUEST_LATENCY, STAGE_LATENCY, REQUESTS, ERRORS]
+
+# ============================
+# CONTADORES POR HILO
+# ============================
+
+class ThreadMetrics:
+    """
+    Contadores sin agregar de las peticiones de un hilo. Solo ese hilo los escribe y nunca
+    se reinician, así que la petición no toma ningún lock: /metrics los suma al exportar
+    """
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.serial = 0  # Número de petición del hilo (una etapa repetida cuenta una vez por petición)
+        self.requests = {}  # (endpoint, estado) -> peticiones
+        self.latency = {}  # endpoint -> [casilleros de LATENCY_BUCKETS..., suma, número]
+        self.stages = {}  # endpoint -> {etapa: [suma, número, última petición]}
+
+    def add_to(self, requests, latency, stages):
+        """Sumar estos contadores a los totales (copias: el hilo puede seguir escribiendo)"""
+        for key, count in self.requests.copy().items():
+            requests[key] = requests.get(key, 0) + count
+        for endpoint, series in self.latency.copy().items():
+            total = latency.get(endpoint)
+            if total is None:
+                latency[endpoint] = list(series)
+            else:
+                for position, value in enumerate(list(series)):
+                    total[position] += value
+        for endpoint, endpoint_stages in self.stages.copy().items():
+            for stage, series in endpoint_stages.copy().items():
+                total = stages.get((endpoint, stage))
+                if total is None:
+                    stages[(endpoint, stage)] = series[:2]
+                else:
+                    total[0] += series[0]
+                    total[1] += series[1]
+
+# Contadores de cada hilo que ha atendido peticiones; los de hilos terminados se pasan a _retired
+_threads = []
+_retired = ThreadMetrics()
+_retired_stages = {}  # (endpoint, etapa) -> [suma, número] de los hilos terminados
+_threads_lock = threading.Lock()
+
+def _thread_metrics():
+    """Contadores del hilo actual (se registran con su primera petición)"""
+    metrics = _current.metrics = ThreadMetrics()
+    with _threads_lock:
+        _threads.append(metrics)
+    return metrics
+
+def collect_metrics():
+    """Sumar los contadores de todos los hilos en REQUESTS, REQUEST_LATENCY y STAGE_LATENCY"""
+    requests, latency, stages = {}, {}, {}
+    with _threads_lock:
+        for metrics in [metrics for metrics in _threads if not metrics.thread.is_alive()]:
+            metrics.add_to(_retired.requests, _retired.latency, _retired_stages)
+            _threads.remove(metrics)
+        for metrics in _threads + [_retired]:
+            metrics.add_to(requests, latency, stages)
+        for key, series in _retired_stages.items():
+            total = stages.setdefault(key, [0.0, 0])
+            total[0] += series[0]
+            total[1] += series[1]
+    buckets = len(LATENCY_BUCKETS) + 1
+    REQUESTS.load(requests)
+    REQUEST_LATENCY.load({(endpoint,): [series[:buckets], series[buckets], series[buckets + 1]]
+                          for endpoint, series in latency.items()})
+    STAGE_LATENCY.load(stages)
+
+# ============================
+# ETAPAS DE LA PETICIÓN ACTUAL
+# ============================
+
+# Por hilo: marcas [(etapa, instante), ...] de la petición en curso (None = ninguna) y sus
+# contadores. mark() solo agrega una tupla; las duraciones se calculan al terminar la petición
+_current = threading.local()
+_perf_counter = time.perf_counter
+_bisect_left = bisect.bisect_left
+
+def start_request():
+    """Empezar a medir la petición del hilo actual"""
+    _current.marks = [(None, _perf_counter())]
+
+def mark(stage):
+    """Cerrar una etapa: el tiempo desde la marca anterior se suma a `stage` (sin petición en curso no hace nada)"""
+    marks = getattr(_current, 'marks', None)
+    if marks is not None:
+        marks.append((stage, _perf_counter()))
+
+def finish_request(endpoint, status):
+    """
+    Registrar la petición en los contadores del hilo (sin locks): lo que queda desde la
+    última marca cuenta como 'serialize'
+    """
+    current = _current
+    marks = getattr(current, 'marks', None)
+    if marks is None:
+        return
+    marks.append(('serialize', _perf_counter()))
+    current.marks = None
+    metrics = getattr(current, 'metrics', None) or _thread_metrics()
+    metrics.serial = serial = metrics.serial + 1
+
+    stages = metrics.stages.get(endpoint)
+    if stages is None:
+        stages = metrics.stages[endpoint] = {}
+    start = previous = marks[0][1]
+    for stage, instant in marks[1:]:
+        series = stages.get(stage)
+        if series is None:
+            series = stages[stage] = [0.0, 0, 0]
+        series[0] += instant - previous
+        if series[2] != serial:
+            series[1] += 1
+            series[2] = serial
+        previous = instant
+
+    seconds = previous - start
+    series = metrics.latency.get(endpoint)
+    if series is None:
+        series = metrics.latency[endpoint] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0, 0]
+    series[_bisect_left(LATENCY_BUCKETS, seconds)] += 1
+    series[-2] += seconds
+    series[-1] += 1
+    key = (endpoint, status)
+    metrics.requests[key] = metrics.requests.get(key, 0) + 1
+
+def count_error(error, endpoint=None):
+    """Contar una excepción capturada por una ruta"""
+    if endpoint is None:
+        endpoint = current_endpoint()
+    ERRORS.inc((endpoint, type(error).__name__))
+
+def current_endpoint():
+    """Ruta de la petición actual ('/api/predict/<modelo>'...), 'unmatched' si no existe"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+# ============================
+# EXPORTACIÓN
+# ============================
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_samples(name, kind, help_text, labels, samples):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for sample_name, label_values, value in samples:
+        names = labels + ('le',) if sample_name.endswith('_bucket') else labels
+        label_text = ','.join(f'{label}="{escape_label(v)}"' for label, v in zip(names, label_values))
+        lines.append(f'{sample_name}{{{label_text}}} {value}' if label_text else f'{sample_name} {value}')
+    return lines
+
+def render_metrics(registry=None):
+    """Todas las métricas en el formato de texto de Prometheus (más el estado de carga de los modelos)"""
+    collect_metrics()
+    lines = []
+    for metric in METRICS:
+        lines += render_samples(metric.name, metric.kind, metric.help, metric.labels, metric.samples())
+
+    if registry is not None:
+        status = registry.status()
+        lines += render_samples('lifescan_model_load_seconds', 'gauge', 'Duración de la última carga de cada modelo',
+                                ('model',), [('lifescan_model_load_seconds', (name,), model['load_seconds'])
+                                             for name, model in status.items() if model['load_seconds'] is not None])
+        lines += render_samples('lifescan_model_ready', 'gauge', 'Modelo listo (1) o no (0)', ('model',),
+                                [('lifescan_model_ready', (name,), int(model['state'] == 'ready'))
+                                 for name, model in status.items()])
+    return '\n'.join(lines) + '\n'
+
+def configure_metrics(app, registry):
+    """Medir todas las peticiones de la aplicación y exponer GET /metrics"""
+    if METRICS_ENABLED:
+        @app.before_request
+        def metrics_start_request():
+            start_request()
+
+        @app.after_request
+        def metrics_finish_request(response):
+            finish_request(current_endpoint(), response.status_code)
+            return response
+
+        @app.teardown_request
+        def metrics_unhandled_error(error):
+            # Excepción sin capturar: se cuenta el error. Flask ya pasó su respuesta 500 por after_request
+            # (y finish_request no vuelve a registrar la petición), salvo que propague la excepción
+            # (PROPAGATE_EXCEPTIONS, modo debug o testing): entonces la petición se registra aquí
+            if error is not None:
+                count_error(error)
+                finish_request(current_endpoint(), 500)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        return Response(render_metrics(registry), mimetype='text/plain; version=0.0.4; charset=utf-8')
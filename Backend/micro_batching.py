@@ -0,0 +1,173 @@
+# micro_batching.py - Cola de micro-lotes: agrupa peticiones concurrentes en una sola inferencia
+import os
+import time
+import queue
+import threading
+import numpy as np
+
+# Máximo de imágenes por inferencia, espera máxima para completar un lote y profundidad de la cola
+SKIN_BATCH_MAX_SIZE = int(os.environ.get('LIFESCAN_SKIN_BATCH_MAX_SIZE', 16))
+SKIN_BATCH_MAX_WAIT_MS = float(os.environ.get('LIFESCAN_SKIN_BATCH_MAX_WAIT_MS', 5))
+SKIN_QUEUE_MAX_DEPTH = int(os.environ.get('LIFESCAN_SKIN_QUEUE_MAX_DEPTH', 256))
+# Espera máxima (s) de una petición por su resultado: si el hilo de inferencia se atasca, la
+# petición responde 503 en vez de ocupar un hilo del servidor indefinidamente
+SKIN_BATCH_TIMEOUT = float(os.environ.get('LIFESCAN_SKIN_BATCH_TIMEOUT', 30))
+
+class QueueFullError(RuntimeError):
+    """La cola de inferencia está llena (el servidor debe responder 503)"""
+
+class PendingPrediction:
+    """Resultado de una entrada encolada: se completa cuando termina su lote"""
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.enqueued_at = time.perf_counter()
+
+    def get(self, timeout=None):
+        """Esperar la fila de salida del modelo para esta entrada"""
+        if not self.done.wait(timeout):
+            raise TimeoutError("La inferencia por lotes no respondió a tiempo")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class MicroBatcher:
+    """
+    Un hilo de inferencia toma la primera entrada de la cola, espera hasta max_wait_ms
+    (o hasta max_batch_size entradas) y ejecuta predict_batch una sola vez para todas.
+    predict_batch recibe un arreglo (N, ...) y devuelve N filas de salida
+    """
+
+    def __init__(self, predict_batch, max_batch_size=SKIN_BATCH_MAX_SIZE,
+                 max_wait_ms=SKIN_BATCH_MAX_WAIT_MS, max_queue_depth=SKIN_QUEUE_MAX_DEPTH,
+                 timeout=SKIN_BATCH_TIMEOUT, name='batcher'):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.timeout = timeout
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        # Lote preasignado (max_batch_size, *forma de la entrada); solo lo usa el hilo de inferencia
+        self._buffer = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        # Métricas
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed_batches = 0
+        self.largest_batch = 0
+        self.inference_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def _ensure_worker(self):
+        """Iniciar el hilo en este proceso (tras fork() el hilo del maestro no existe)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue_depth)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-inference', daemon=True)
+            self._thread.start()
+
+    def submit(self, item):
+        """Encolar una entrada. Lanza QueueFullError si la cola está llena"""
+        self._ensure_worker()
+        pending = PendingPrediction(item)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise QueueFullError(f"Cola de inferencia llena ({self.max_queue_depth} pendientes)")
+        return pending
+
+    def predict(self, item, timeout=None):
+        """
+        Encolar y esperar la salida del modelo para una entrada (como mucho `timeout` segundos, por
+        defecto los del constructor). Lanza QueueFullError o TimeoutError (el servidor responde 503)
+        """
+        pending = self.submit(item)
+        try:
+            return pending.get(self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            with self._stats_lock:
+                self.timed_out += 1
+            raise
+
+    def _collect(self):
+        """Primera entrada (bloqueante) + las que lleguen antes del plazo o hasta llenar el lote"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _stack(self, batch):
+        """Copiar las entradas al lote preasignado (se reserva con la primera entrada)"""
+        first = np.asarray(batch[0].item)
+        if self._buffer is None or self._buffer.shape[1:] != first.shape or self._buffer.dtype != first.dtype:
+            self._buffer = np.empty((self.max_batch_size,) + first.shape, dtype=first.dtype)
+        return np.stack([pending.item for pending in batch], out=self._buffer[:len(batch)])
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                outputs = self.predict_batch(self._stack(batch))
+                if len(outputs) != len(batch):
+                    raise RuntimeError(f"El modelo devolvió {len(outputs)} filas para {len(batch)} entradas")
+                for pending, output in zip(batch, outputs):
+                    pending.result = output
+                failed = False
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+                failed = True
+            elapsed = time.perf_counter() - start
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.failed_batches += int(failed)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                self.inference_seconds += elapsed
+                self.wait_seconds += sum(start - pending.enqueued_at for pending in batch)
+            for pending in batch:
+                pending.done.set()
+
+    def stats(self):
+        """Configuración y métricas de la cola"""
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'max_queue_depth': self.max_queue_depth,
+                'timeout_s': self.timeout,
+                'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'items': self.items,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'failed_batches': self.failed_batches,
+                'largest_batch': self.largest_batch,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'avg_inference_ms': round(self.inference_seconds / self.batches * 1000.0, 2) if self.batches else 0.0,
+                'avg_queue_wait_ms': round(self.wait_seconds / self.items * 1000.0, 2) if self.items else 0.0
+            }
@@ -0,0 +1,495 @@
+# model_compiler.py - Compilar los pipelines sklearn/xgboost a arreglos NumPy planos
+import os
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+from inference import get_decision_threshold, predict_with_threshold
+
+# Compilar los modelos al cargarlos (0 = usar siempre el pipeline original)
+COMPILE_MODELS = os.environ.get('LIFESCAN_COMPILE_MODELS', '1') != '0'
+# Diferencia máxima permitida contra predict_proba en la verificación de carga
+EQUIVALENCE_TOLERANCE = 1e-5
+EQUIVALENCE_SAMPLES = 512
+# Filas de muestra cuyas probabilidades (del pipeline original) se guardan con la caché y se
+# vuelven a calcular en cada carga: una caché corrupta o desactualizada no llega a servir
+SPOT_CHECK_ROWS = 16
+# Filas por pasada de los árboles compilados: un lote más grande se recorre en tramos (la memoria
+# intermedia crece con filas x árboles) sin cargar el pipeline original en el hilo de la petición
+COMPILED_MAX_ROWS = int(os.environ.get('LIFESCAN_COMPILED_MAX_ROWS', 256))
+# Caché en disco de los modelos compilados (por defecto junto a cada .pkl)
+CACHE_DIR = os.environ.get('LIFESCAN_CACHE_DIR')
+CACHE_FORMAT = 3
+# Abrir los arreglos de la caché con mmap (solo lectura): todos los procesos que sirven
+# el mismo modelo comparten las mismas páginas físicas (0 = copiarlos a memoria)
+MMAP_MODELS = os.environ.get('LIFESCAN_MMAP_MODELS', '1') != '0'
+
+# ============================
+# TRANSFORMACIÓN DE COLUMNAS
+# ============================
+
+class CompiledColumns:
+    """
+    ColumnTransformer compilado: imputación + escalado de las numéricas y
+    one-hot de las categóricas escriben directamente en una matriz float64
+    """
+
+    def __init__(self, column_transformer):
+        self.numeric = []      # (columna, valor de imputación, media, escala, índice de salida)
+        self.categorical = []  # (columna, {categoría: índice de salida})
+        self.n_outputs = 0
+
+        for name, transformer, columns in column_transformer.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if isinstance(transformer, str):
+                raise NotImplementedError(f"Transformador '{name}' no soportado: {transformer}")
+
+            steps = [step for _, step in transformer.steps] if hasattr(transformer, 'steps') else [transformer]
+            kinds = [type(step).__name__ for step in steps]
+            output = column_transformer.output_indices_[name]
+
+            if 'OneHotEncoder' in kinds:
+                self._compile_categorical(steps, kinds, columns, output.start)
+            else:
+                self._compile_numeric(steps, kinds, columns, output.start)
+
+            self.n_outputs = max(self.n_outputs, output.stop)
+
+    def _compile_numeric(self, steps, kinds, columns, start):
+        fill = np.full(len(columns), np.nan)
+        mean = np.zeros(len(columns))
+        scale = np.ones(len(columns))
+
+        for step, kind in zip(steps, kinds):
+            if kind == 'SimpleImputer':
+                fill = np.asarray(step.statistics_, dtype=np.float64)
+            elif kind == 'StandardScaler':
+                if step.mean_ is not None:
+                    mean = np.asarray(step.mean_, dtype=np.float64)
+                if step.scale_ is not None:
+                    scale = np.asarray(step.scale_, dtype=np.float64)
+            else:
+                raise NotImplementedError(f"Paso numérico no soportado: {kind}")
+
+        for i, column in enumerate(columns):
+            self.numeric.append((column, fill[i], mean[i], scale[i], start + i))
+
+    def _compile_categorical(self, steps, kinds, columns, start):
+        encoder = steps[kinds.index('OneHotEncoder')]
+        if getattr(encoder, 'drop_idx_', None) is not None or getattr(encoder, '_infrequent_enabled', False):
+            raise NotImplementedError("OneHotEncoder con drop/infrequent no soportado")
+        if any(kind not in ('SimpleImputer', 'OneHotEncoder') for kind in kinds):
+            raise NotImplementedError(f"Pasos categóricos no soportados: {kinds}")
+
+        # El imputador solo reemplaza NaN; las categorías ya llegan validadas
+        position = start
+        for column, categories in zip(columns, encoder.categories_):
+            lookup = {value: position + i for i, value in enumerate(categories)}
+            self.categorical.append((column, lookup))
+            position += len(categories)
+
+    def to_state(self):
+        """Descripción serializable en JSON (caché en disco)"""
+        return {
+            'numeric': [list(entry) for entry in self.numeric],
+            'categorical': [[column, list(lookup.items())] for column, lookup in self.categorical],
+            'n_outputs': self.n_outputs
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Reconstruir desde to_state() sin sklearn"""
+        columns = cls.__new__(cls)
+        columns.numeric = [tuple(entry) for entry in state['numeric']]
+        columns.categorical = [(column, {value: out for value, out in pairs})
+                               for column, pairs in state['categorical']]
+        columns.n_outputs = state['n_outputs']
+        return columns
+
+    def transform(self, rows):
+        """Matriz de características (N x salidas) desde un arreglo estructurado o DataFrame"""
+        n = len(rows)
+        X = np.zeros((n, self.n_outputs), dtype=np.float64)
+
+        for column, fill, mean, scale, out in self.numeric:
+            values = np.asarray(rows[column], dtype=np.float64)
+            values = np.where(np.isnan(values), fill, values)
+            X[:, out] = (values - mean) / scale
+
+        row_numbers = np.arange(n)
+        for column, lookup in self.categorical:
+            out = np.fromiter((lookup.get(value, -1) for value in rows[column]), dtype=np.intp, count=n)
+            known = out >= 0  # handle_unknown='ignore': categoría desconocida -> todo ceros
+            X[row_numbers[known], out[known]] = 1.0
+
+        return X
+
+# ============================
+# ENSAMBLE DE ÁRBOLES (XGBOOST)
+# ============================
+
+def _tree_depth(left_children, right_children):
+    """Profundidad de un árbol (pasos necesarios para llegar a la hoja más profunda)"""
+    depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, level = stack.pop()
+        if left_children[node] == -1:
+            depth = max(depth, level)
+        else:
+            stack.append((left_children[node], level + 1))
+            stack.append((right_children[node], level + 1))
+    return depth
+
+class CompiledTrees:
+    """
+    Árboles de XGBoost como arreglos planos (T árboles x nodos):
+    índice de característica, umbral, hijos izquierdo/derecho, dirección por defecto y hojas
+    """
+
+    # Arreglos planos (1D) que se guardan en la caché y se recorren con take()
+    ARRAYS = ('flat_feature', 'flat_threshold', 'flat_left', 'flat_right', 'flat_default_left', 'flat_value')
+
+    def __init__(self, classifier):
+        booster = classifier.get_booster()
+        model = json.loads(booster.save_raw('json'))
+        learner = model['learner']
+
+        objective = learner['objective']['name']
+        if objective != 'binary:logistic':
+            raise NotImplementedError(f"Objetivo no soportado: {objective}")
+        if learner['gradient_booster']['name'] != 'gbtree':
+            raise NotImplementedError("Solo se soportan boosters gbtree")
+
+        trees = learner['gradient_booster']['model']['trees']
+        best_iteration = getattr(classifier, 'best_iteration', None)
+        if best_iteration is not None:
+            trees = trees[:best_iteration + 1]
+        if any(any(tree['split_type']) for tree in trees):
+            raise NotImplementedError("Divisiones categóricas nativas no soportadas")
+
+        base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+        self.base_margin = np.log(base_score / (1.0 - base_score))
+
+        self.n_trees = len(trees)
+        self.n_nodes = max(len(tree['left_children']) for tree in trees)
+        shape = (self.n_trees, self.n_nodes)
+        feature = np.zeros(shape, dtype=np.intp)
+        threshold = np.zeros(shape, dtype=np.float32)
+        left = np.zeros(shape, dtype=np.intp)
+        right = np.zeros(shape, dtype=np.intp)
+        default_left = np.zeros(shape, dtype=bool)
+        value = np.zeros(shape, dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            children = np.array(tree['left_children'], dtype=np.intp)
+            is_leaf = children == -1
+            nodes = np.arange(len(children))
+            k = len(children)
+            feature[t, :k] = tree['split_indices']
+            threshold[t, :k] = tree['split_conditions']
+            # Las hojas apuntan a sí mismas: el recorrido puede avanzar siempre max_depth pasos
+            left[t, :k] = np.where(is_leaf, nodes, children)
+            right[t, :k] = np.where(is_leaf, nodes, tree['right_children'])
+            default_left[t, :k] = np.array(tree['default_left'], dtype=bool)
+            # En el formato JSON el valor de la hoja está en split_conditions
+            value[t, :k] = np.where(is_leaf, tree['split_conditions'], 0.0)
+
+        self.max_depth = max(_tree_depth(tree['left_children'], tree['right_children']) for tree in trees)
+        self.tree_offsets = np.arange(self.n_trees, dtype=np.intp) * self.n_nodes
+
+        # Índices globales (árbol * nodos_por_árbol + nodo): se guardan tal cual en la caché,
+        # así un arreglo abierto con mmap se usa sin crear copias privadas
+        self.flat_feature = feature.ravel()
+        self.flat_threshold = threshold.ravel()
+        self.flat_left = (left + self.tree_offsets[:, None]).ravel()
+        self.flat_right = (right + self.tree_offsets[:, None]).ravel()
+        self.flat_default_left = default_left.ravel()
+        self.flat_value = value.ravel()
+
+    def to_state(self):
+        """(metadatos JSON, arreglos NumPy) para la caché en disco"""
+        meta = {
+            'base_margin': float(self.base_margin),
+            'max_depth': int(self.max_depth),
+            'n_trees': int(self.n_trees),
+            'n_nodes': int(self.n_nodes)
+        }
+        return meta, {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_state(cls, meta, arrays):
+        """Reconstruir desde to_state() sin xgboost (los arreglos pueden ser mmap)"""
+        trees = cls.__new__(cls)
+        trees.base_margin = meta['base_margin']
+        trees.max_depth = meta['max_depth']
+        trees.n_trees = meta['n_trees']
+        trees.n_nodes = meta['n_nodes']
+        trees.tree_offsets = np.arange(trees.n_trees, dtype=np.intp) * trees.n_nodes
+        for name in cls.ARRAYS:
+            if arrays[name].shape != (trees.n_trees * trees.n_nodes,):
+                raise ValueError(f"'{name}': tamaño inesperado {arrays[name].shape}")
+            setattr(trees, name, arrays[name])
+        return trees
+
+    def margin(self, X):
+        """Margen (log-odds) para cada fila: recorrido vectorizado de todos los árboles"""
+        X = np.ascontiguousarray(X, dtype=np.float32)  # XGBoost compara en float32
+        n, n_features = X.shape
+        flat_X = X.ravel()
+        row_base = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        has_missing = np.isnan(flat_X).any()
+
+        # Índices planos: nodo global = árbol * nodos_por_árbol + nodo
+        node = np.repeat(self.tree_offsets[None, :], n, axis=0)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_base + self.flat_feature.take(node))
+            go_left = x < self.flat_threshold.take(node)
+            if has_missing:
+                go_left |= np.isnan(x) & self.flat_default_left.take(node)
+            node = np.where(go_left, self.flat_left.take(node), self.flat_right.take(node))
+
+        return self.flat_value.take(node).sum(axis=1, dtype=np.float64) + self.base_margin
+
+# ============================
+# PIPELINE COMPLETO
+# ============================
+
+class CompiledPipeline:
+    """Pipeline compilado con la misma interfaz predict_proba/predict que sklearn"""
+
+    def __init__(self, columns, trees, classes, feature_names, decision_threshold=None):
+        self.columns = columns
+        self.trees = trees
+        self.classes_ = np.asarray(classes)
+        self.source_feature_names = list(feature_names)
+        if decision_threshold is not None:
+            self.decision_threshold_ = decision_threshold
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Compilar un pipeline ColumnTransformer (+ remuestreo) + XGBClassifier"""
+        # Los pasos de remuestreo (SMOTE) solo actúan al entrenar
+        steps = [step for _, step in pipeline.steps if not hasattr(step, 'fit_resample')]
+        if len(steps) != 2 or type(steps[0]).__name__ != 'ColumnTransformer' \
+                or type(steps[1]).__name__ != 'XGBClassifier':
+            raise NotImplementedError(f"Pipeline no soportado: {[type(step).__name__ for step in steps]}")
+
+        threshold = None
+        for attr in ('best_threshold_', 'decision_threshold_', 'threshold_'):
+            if getattr(pipeline, attr, None) is not None:
+                threshold = float(getattr(pipeline, attr))
+                break
+
+        return cls(CompiledColumns(steps[0]), CompiledTrees(steps[1]), steps[1].classes_,
+                   pipeline.feature_names_in_, threshold)
+
+    def predict_proba(self, rows):
+        """Probabilidades [clase 0, clase 1] por fila (de COMPILED_MAX_ROWS en COMPILED_MAX_ROWS)"""
+        X = self.columns.transform(rows)
+        if len(X) > COMPILED_MAX_ROWS:
+            margin = np.concatenate([self.trees.margin(X[start:start + COMPILED_MAX_ROWS])
+                                     for start in range(0, len(X), COMPILED_MAX_ROWS)])
+        else:
+            margin = self.trees.margin(X)
+        positive = 1.0 / (1.0 + np.exp(-margin))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, rows, threshold=None):
+        """Clase predicha con el umbral de decisión del modelo (o `threshold`), en una sola pasada"""
+        if threshold is None:
+            threshold = get_decision_threshold(self)
+        predictions, _ = predict_with_threshold(self, rows, threshold)
+        return self.classes_[predictions]
+
+    def verify(self, layout):
+        """Comprobación rápida al cargar: las filas de muestra dan las probabilidades guardadas al compilar"""
+        expected = getattr(self, 'spot_check', None)
+        if not expected:
+            raise ValueError("la caché no tiene probabilidades de verificación")
+        rows = sample_rows(layout)[:len(expected)]
+        difference = float(np.max(np.abs(self.predict_proba(rows)[:, 1] - np.asarray(expected))))
+        if difference > EQUIVALENCE_TOLERANCE:
+            raise ValueError(f"difiere de las probabilidades guardadas al compilar ({difference:.2e})")
+
+    def save(self, directory):
+        """Guardar como meta.json + un .npy por arreglo"""
+        trees_meta, arrays = self.trees.to_state()
+        meta = {
+            'format': CACHE_FORMAT,
+            'columns': self.columns.to_state(),
+            'trees': trees_meta,
+            'classes': self.classes_.tolist(),
+            'feature_names': self.source_feature_names,
+            'decision_threshold': getattr(self, 'decision_threshold_', None),
+            'spot_check': getattr(self, 'spot_check', None)
+        }
+        os.makedirs(directory, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f'{name}.npy'), array)
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Cargar desde save() (sin sklearn ni xgboost)"""
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != CACHE_FORMAT:
+            raise ValueError(f"formato de caché {meta.get('format')} != {CACHE_FORMAT}")
+        mmap_mode = 'r' if MMAP_MODELS else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in CompiledTrees.ARRAYS}
+        compiled = cls(CompiledColumns.from_state(meta['columns']),
+                       CompiledTrees.from_state(meta['trees'], arrays),
+                       meta['classes'], meta['feature_names'], meta['decision_threshold'])
+        compiled.cache_directory = directory
+        compiled.spot_check = meta.get('spot_check')
+        return compiled
+
+    def memory_usage(self):
+        """
+        Memoria de los arreglos del modelo. Con mmap, resident/shared salen de
+        /proc/self/smaps (páginas del archivo en RAM y cuántas comparten otros procesos)
+        """
+        arrays = [getattr(self.trees, name) for name in CompiledTrees.ARRAYS]
+        total = sum(array.nbytes for array in arrays)
+        paths = {array.filename for array in arrays if isinstance(array, np.memmap) and array.filename}
+        if not paths:
+            return {'mapped': False, 'bytes': total, 'resident_bytes': total, 'shared_bytes': 0}
+        usage = mapped_memory(paths)
+        usage.update({'mapped': True, 'bytes': total})
+        return usage
+
+def mapped_memory(paths):
+    """
+    Bytes residentes y compartidos de los archivos mapeados (Linux, /proc/self/smaps).
+    Devuelve None en los campos si el sistema no expone esa información
+    """
+    paths = {os.path.realpath(path) for path in paths}
+    resident = shared = 0
+    try:
+        with open('/proc/self/smaps', 'r') as f:
+            current = False
+            for line in f:
+                fields = line.split()
+                if not fields[0].endswith(':'):
+                    # Cabecera de un mapeo: dirección, permisos, offset, dispositivo, inodo, ruta
+                    current = len(fields) >= 6 and fields[5] in paths
+                elif current and fields[0] == 'Rss:':
+                    resident += int(fields[1]) * 1024
+                elif current and fields[0] in ('Shared_Clean:', 'Shared_Dirty:'):
+                    shared += int(fields[1]) * 1024
+    except OSError:
+        return {'resident_bytes': None, 'shared_bytes': None}
+    return {'resident_bytes': resident, 'shared_bytes': shared}
+
+def sample_rows(layout, n=EQUIVALENCE_SAMPLES, seed=0):
+    """Pacientes sintéticos que recorren todas las categorías y rangos amplios"""
+    rng = np.random.default_rng(seed)
+    rows = np.empty(n, dtype=layout.dtype)
+    for name, cast, default, valid in layout.fields:
+        if valid is not None:
+            rows[name] = rng.choice(sorted(valid), n)
+        elif cast is int:
+            rows[name] = rng.integers(0, 2, n)
+        else:
+            rows[name] = rng.uniform(-1, 3, n) * max(abs(float(default)), 1.0) * 2
+    return rows
+
+def compile_pipeline(model, layout, model_name="Modelo"):
+    """
+    Compilar un pipeline y verificar que da las mismas probabilidades que predict_proba.
+    Si no se puede compilar o la verificación falla, devuelve el pipeline original
+    """
+    if model is None or not COMPILE_MODELS:
+        return model
+
+    try:
+        compiled = CompiledPipeline.from_pipeline(model)
+    except (NotImplementedError, AttributeError, KeyError, ValueError) as e:
+        print(f"   ⚠️ {model_name}: se usa el pipeline original ({e})")
+        return model
+
+    import pandas as pd
+    rows = sample_rows(layout)
+    frame = pd.DataFrame({name: rows[name] for name in model.feature_names_in_})
+    expected = model.predict_proba(frame)[:, 1]
+    actual = compiled.predict_proba(rows)[:, 1]
+    difference = float(np.max(np.abs(actual - expected)))
+
+    if difference > EQUIVALENCE_TOLERANCE:
+        print(f"   ⚠️ {model_name}: compilado difiere de predict_proba ({difference:.2e}), se usa el original")
+        return model
+
+    # Las primeras filas de muestra quedan como verificación rápida de la caché en disco
+    compiled.spot_check = expected[:SPOT_CHECK_ROWS].tolist()
+    print(f"   ⚡ {model_name} compilado: {compiled.trees.n_trees} árboles, "
+          f"profundidad {compiled.trees.max_depth}, diferencia máx. {difference:.1e}")
+    return compiled
+
+# ============================
+# CACHÉ EN DISCO
+# ============================
+
+def cache_path(model_path, suffix):
+    """
+    Ruta en la caché para un artefacto derivado de model_path. Depende del contenido
+    del archivo: un modelo nuevo nunca reutiliza artefactos del anterior
+    """
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    base = CACHE_DIR or os.path.join(os.path.dirname(os.path.abspath(model_path)), '.lifescan_cache')
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(base, f'{name}-{digest.hexdigest()[:16]}-{suffix}')
+
+def cache_directory(model_path):
+    """Carpeta de caché del modelo compilado"""
+    return cache_path(model_path, f'v{CACHE_FORMAT}')
+
+def load_compiled_model(model_path, layout, model_name, load_source):
+    """
+    Modelo listo para servir: primero la caché compilada (no importa sklearn/xgboost);
+    si no existe se carga el pipeline con load_source(), se compila y se guarda
+    """
+    if not COMPILE_MODELS or not os.path.exists(model_path):
+        return load_source()
+
+    directory = cache_directory(model_path)
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        try:
+            compiled = CompiledPipeline.load(directory)
+            compiled.verify(layout)
+            print(f"✅ {model_name} cargado desde caché compilada (verificada)")
+            return compiled
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Caché de {model_name} inválida ({e}), se recompila")
+
+    model = compile_pipeline(load_source(), layout, model_name)
+    if isinstance(model, CompiledPipeline):
+        # Escritura atómica: otro proceso nunca ve una caché a medio escribir
+        suffix = f"{os.getpid()}-{threading.get_ident()}"
+        temporary = f"{directory}.tmp-{suffix}"
+        stale = f"{directory}.old-{suffix}"
+        try:
+            model.save(temporary)
+            try:
+                os.replace(temporary, directory)
+            except OSError:
+                # Ya hay una carpeta (caché inválida que se recompila): se aparta y se reemplaza.
+                # Los procesos que aún la tengan mapeada conservan sus archivos hasta cerrarlos
+                os.replace(directory, stale)
+                os.replace(temporary, directory)
+            # Servir desde la caché recién escrita: los arreglos quedan mapeados (compartidos) y el
+            # pipeline original se libera
+            model = CompiledPipeline.load(directory)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la caché de {model_name}: {e}")
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+            shutil.rmtree(stale, ignore_errors=True)
+    return model
@@ -0,0 +1,166 @@
+# model_registry.py - Carga de modelos en segundo plano con estado por modelo
+import os
+import time
+import threading
+from flask import jsonify
+
+# 0 = no precargar: cada modelo se carga con la primera petición que lo necesite
+PRELOAD_MODELS = os.environ.get('LIFESCAN_PRELOAD_MODELS', '1') != '0'
+
+# Estados posibles de un modelo
+PENDING, LOADING, READY, FAILED = 'pending', 'loading', 'ready', 'failed'
+
+class ModelSlot:
+    """Un modelo registrado: función de carga, estado y resultado"""
+
+    def __init__(self, name, loader, fork_safe=True):
+        self.name = name
+        self.loader = loader
+        self.fork_safe = fork_safe
+        self.state = PENDING
+        self.model = None
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.ready = threading.Event()
+
+class ModelRegistry:
+    """
+    Carga cada modelo en su propio hilo. Un endpoint solo depende de su modelo:
+    los tabulares quedan disponibles aunque TensorFlow siga cargando
+    """
+
+    def __init__(self):
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._defer_fork_unsafe = False
+        self.started_at = time.time()
+
+    def register(self, name, loader, fork_safe=True):
+        """
+        Registrar un modelo; loader() devuelve el modelo (None o excepción = fallo).
+        fork_safe=False: el modelo no sobrevive a fork() (TensorFlow: hilos y estado del runtime)
+        y con serve.py se carga en cada worker en lugar de en el proceso maestro
+        """
+        self._slots[name] = ModelSlot(name, loader, fork_safe)
+
+    def defer_fork_unsafe(self):
+        """Llamar antes de precargar en un proceso que hará fork(): start() omite los modelos no seguros"""
+        self._defer_fork_unsafe = True
+
+    def _start_loading(self, names):
+        for name in names:
+            threading.Thread(target=self.load, args=(name,), name=f'load-{name}', daemon=True).start()
+
+    def start(self):
+        """Cargar todos los modelos en paralelo en hilos de fondo"""
+        if not PRELOAD_MODELS:
+            return
+        self._start_loading(name for name, slot in self._slots.items()
+                            if slot.fork_safe or not self._defer_fork_unsafe)
+
+    def start_deferred(self):
+        """En cada worker, después de fork(): cargar los modelos que el maestro no precargó"""
+        self._defer_fork_unsafe = False
+        if not PRELOAD_MODELS:
+            return
+        self._start_loading(name for name, slot in self._slots.items()
+                            if not slot.fork_safe and slot.state == PENDING)
+
+    def load(self, name):
+        """Cargar (o reintentar) un modelo en el hilo actual. Devuelve el modelo o None"""
+        slot = self._slots[name]
+        with self._lock:
+            if slot.state in (LOADING, READY):
+                busy = True
+            else:
+                busy = False
+                slot.state = LOADING
+                slot.error = None
+                slot.ready.clear()
+        if busy:
+            slot.ready.wait()
+            return slot.model
+
+        start = time.perf_counter()
+        try:
+            model = slot.loader()
+            error = None if model is not None else 'Modelo no encontrado'
+        except Exception as e:
+            model, error = None, str(e)
+
+        with self._lock:
+            slot.model = model
+            slot.error = error
+            slot.state = READY if model is not None else FAILED
+            slot.load_seconds = time.perf_counter() - start
+            slot.loaded_at = time.time() if model is not None else None
+        slot.ready.set()
+
+        icon = "✅" if model is not None else "❌"
+        print(f"{icon} Modelo '{name}' {slot.state} en {slot.load_seconds:.2f}s" + (f" ({error})" if error else ""))
+        return model
+
+    def get(self, name):
+        """Modelo listo o None (si no se precarga, lo carga en la primera llamada)"""
+        slot = self._slots[name]
+        if slot.state == READY:
+            return slot.model
+        if slot.state == PENDING and not PRELOAD_MODELS:
+            return self.load(name)
+        return None
+
+    def state(self, name):
+        """Estado actual del modelo: pending, loading, ready o failed"""
+        return self._slots[name].state
+
+    def loaded_at(self, name):
+        """Instante en que se cargó el modelo en memoria (cambia con cada recarga; None si no está listo)"""
+        return self._slots[name].loaded_at
+
+    def wait(self, name, timeout=None):
+        """Esperar a que el modelo termine de cargar (listo o fallido)"""
+        return self._slots[name].ready.wait(timeout)
+
+    def wait_all(self, timeout=None):
+        """Esperar a todos los modelos (antes de crear workers con fork). True si ninguno sigue cargando"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for slot in self._slots.values():
+            if slot.state == PENDING:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not slot.ready.wait(remaining):
+                return False
+        return True
+
+    def status(self):
+        """Estado de todos los modelos (para /api/health)"""
+        return {
+            name: {
+                'state': slot.state,
+                'error': slot.error,
+                'load_seconds': round(slot.load_seconds, 3) if slot.load_seconds is not None else None
+            }
+            for name, slot in self._slots.items()
+        }
+
+    def memory_usage(self):
+        """
+        Memoria por modelo listo: residente y compartida con otros procesos
+        (solo los modelos con memory_usage(), p. ej. los compilados con mmap)
+        """
+        usage = {}
+        for name, slot in self._slots.items():
+            measure = getattr(slot.model, 'memory_usage', None)
+            usage[name] = measure() if slot.state == READY and callable(measure) else None
+        return usage
+
+# Registro único del proceso: cada módulo activo del servidor registra aquí sus modelos
+registry = ModelRegistry()
+
+def model_unavailable(name):
+    """Respuesta cuando un modelo no está listo: 503 mientras carga, 500 si falló"""
+    state = registry.state(name)
+    if state in (LOADING, PENDING):
+        return jsonify({'error': 'Modelo cargando, intenta de nuevo en unos segundos', 'state': state}), 503
+    return jsonify({'error': 'Modelo no disponible', 'state': state}), 500
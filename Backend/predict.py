@@ -1,5 +1,6 @@
 import joblib
 import pandas as pd
+from inference import get_decision_threshold, predict_one
 
 # Función de ejemplo para probar el modelo
 def test_stroke_prediction():
@@ -21,8 +22,7 @@ def test_stroke_prediction():
             'smoking_status': 'formerly smoked'
         }])
         
-        prediction = model.predict(test_data)[0]
-        probability = model.predict_proba(test_data)[0][1]
+        prediction, probability = predict_one(model, test_data, get_decision_threshold(model, 'stroke'))
         
         print(f"Predicción: {prediction}")
         print(f"Probabilidad: {probability:.2%}")
@@ -54,8 +54,7 @@ def test_heart_prediction():
             'HeartDisease': 0
         }])
         
-        prediction = model.predict(test_data)[0]
-        probability = model.predict_proba(test_data)[0][1]
+        prediction, probability = predict_one(model, test_data, get_decision_threshold(model, 'heart'))
         
         print(f"Predicción: {prediction}")
         print(f"Probabilidad: {probability:.2%}")
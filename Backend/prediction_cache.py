@@ -0,0 +1,385 @@
+# prediction_cache.py - Cachés de predicciones (LRU en memoria con TTL + nivel opcional en disco)
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Caché de predicciones de piel (0 entradas = desactivada)
+SKIN_CACHE_MAX_ENTRIES = int(os.environ.get('LIFESCAN_SKIN_CACHE_MAX_ENTRIES', 2048))
+SKIN_CACHE_MAX_MB = float(os.environ.get('LIFESCAN_SKIN_CACHE_MAX_MB', 16))
+SKIN_CACHE_TTL = float(os.environ.get('LIFESCAN_SKIN_CACHE_TTL', 24 * 3600))
+# Nivel en disco (sobrevive a reinicios y se comparte entre workers); vacío = desactivado
+SKIN_CACHE_DIR = os.environ.get('LIFESCAN_SKIN_CACHE_DIR')
+SKIN_CACHE_DISK_MAX_ENTRIES = int(os.environ.get('LIFESCAN_SKIN_CACHE_DISK_MAX_ENTRIES', 20000))
+# Hash perceptual para casi-duplicados (recompresiones, reescalados): distancia de Hamming
+# máxima entre hashes de 64 bits (-1 = desactivado, 0 = solo hash perceptual idéntico)
+SKIN_CACHE_PHASH_DISTANCE = int(os.environ.get('LIFESCAN_SKIN_CACHE_PHASH_DISTANCE', -1))
+# Caché de predicciones tabulares por modelo (0 entradas = desactivada)
+TABULAR_CACHE_MAX_ENTRIES = int(os.environ.get('LIFESCAN_TABULAR_CACHE_MAX_ENTRIES', 4096))
+TABULAR_CACHE_MAX_MB = float(os.environ.get('LIFESCAN_TABULAR_CACHE_MAX_MB', 32))
+# Bytes estimados de un resultado tabular sin contar el texto del análisis (campos, tupla y clave)
+TABULAR_ENTRY_SIZE = 1024
+
+# ============================
+# LRU EN MEMORIA
+# ============================
+
+# Coste fijo estimado por entrada y por elemento de un dict/lista (objetos y punteros de Python)
+ENTRY_OVERHEAD = 256
+ITEM_OVERHEAD = 16
+
+def approximate_size(value):
+    """
+    Bytes aproximados de un resultado: longitud de los textos más un coste fijo por elemento.
+    Sin serializar (el HTML del análisis solo cuenta su longitud)
+    """
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(ITEM_OVERHEAD + len(key) + approximate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(ITEM_OVERHEAD + approximate_size(item) for item in value)
+    return ITEM_OVERHEAD
+
+class LRUCache:
+    """
+    LRU con límite de entradas, presupuesto de memoria aproximado (approximate_size)
+    y caducidad por TTL. Seguro entre hilos
+    """
+
+    def __init__(self, max_entries, max_bytes=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._entries = OrderedDict()  # clave -> (valor, tamaño, instante de creación)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Valor guardado o None (cuenta acierto/fallo)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.time() - entry[2] > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key):
+        """Valor guardado (o None) sin contar acierto/fallo ni caducar"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key, value, size=None, created=None):
+        """Guardar un valor; expulsa los menos usados si se superan los límites"""
+        if self.max_entries <= 0:
+            return
+        if size is None:
+            size = ENTRY_OVERHEAD + approximate_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, created if created is not None else time.time())
+            self._bytes += size
+            while len(self._entries) > self.max_entries or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Métricas del nivel en memoria"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+# ============================
+# HASHES DE IMAGEN
+# ============================
+
+def content_hash(source, namespace=''):
+    """SHA-256 de los bytes de la imagen (bytes o stream; el stream vuelve a su posición)"""
+    digest = hashlib.sha256(namespace.encode('utf-8'))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        position = source.tell()
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+        source.seek(position)
+    return digest.hexdigest()
+
+def perceptual_hash(img):
+    """
+    dHash de 64 bits: gris 9x8 y comparación de cada píxel con su vecino derecho.
+    Es estable ante recompresión JPEG, reescalado y pequeños cambios de brillo
+    """
+    if img.format == 'JPEG':
+        img.draft('L', (64, 64))
+    pixels = np.asarray(img.convert('L').resize((9, 8)), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+# ============================
+# CACHÉ DE PREDICCIONES DE PIEL
+# ============================
+
+class SkinPredictionCache:
+    """
+    Resultados de predict_skin_cancer por contenido de la imagen (SHA-256 + versión del modelo).
+    Niveles: memoria (LRU/TTL) -> disco (opcional) -> hash perceptual (opcional)
+    """
+
+    def __init__(self, max_entries=SKIN_CACHE_MAX_ENTRIES, max_mb=SKIN_CACHE_MAX_MB, ttl=SKIN_CACHE_TTL,
+                 directory=SKIN_CACHE_DIR, disk_max_entries=SKIN_CACHE_DISK_MAX_ENTRIES,
+                 phash_distance=SKIN_CACHE_PHASH_DISTANCE):
+        self.memory = LRUCache(max_entries, int(max_mb * 1024 * 1024), ttl)
+        self.directory = directory
+        self.disk_max_entries = disk_max_entries
+        self.phash_distance = phash_distance
+        self._phashes = OrderedDict()  # clave -> hash perceptual (mismo límite que la memoria)
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_writes = 0
+        self.phash_hits = 0
+        self.lookups = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.memory.max_entries > 0
+
+    def lookup(self, key, compute_phash=None):
+        """
+        Buscar por clave exacta (memoria y luego disco) y, si está activado, por hash
+        perceptual (compute_phash() solo se llama tras un fallo exacto).
+        Devuelve (resultado o None, hash perceptual calculado o None)
+        """
+        with self._lock:
+            self.lookups += 1
+
+        result = self.memory.get(key)
+        if result is None and self.directory:
+            result = self._read_disk(key)
+            if result is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self.memory.put(key, result)
+        if result is not None:
+            return result, None
+
+        phash = None
+        if self.phash_distance >= 0 and compute_phash is not None:
+            phash = compute_phash()
+            result = self._similar(phash)
+            if result is not None:
+                with self._lock:
+                    self.phash_hits += 1
+                self.memory.put(key, result)
+                return result, phash
+
+        with self._lock:
+            self.misses += 1
+        return None, phash
+
+    def _similar(self, phash):
+        """Resultado de la imagen guardada más parecida, si está a distancia <= phash_distance"""
+        with self._lock:
+            keys = list(self._phashes)
+            hashes = np.fromiter(self._phashes.values(), dtype=np.uint64, count=len(keys))
+        if not keys:
+            return None
+        distances = np.unpackbits((hashes ^ np.uint64(phash)).view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > self.phash_distance:
+            return None
+        return self.memory.peek(keys[best])
+
+    def put(self, key, result, phash=None):
+        """Guardar un resultado en memoria (y en disco si está configurado)"""
+        if not self.enabled:
+            return
+        self.memory.put(key, result)
+        if phash is not None and self.phash_distance >= 0:
+            with self._lock:
+                self._phashes[key] = phash
+                self._phashes.move_to_end(key)
+                while len(self._phashes) > self.memory.max_entries:
+                    self._phashes.popitem(last=False)
+        if self.directory:
+            self._write_disk(key, result)
+
+    # ---- Nivel en disco ----
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.memory.ttl is not None and time.time() - entry.get('created', 0) > self.memory.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get('result')
+
+    def _write_disk(self, key, result):
+        # Escritura atómica: otro worker nunca lee un archivo a medio escribir
+        temporary = f"{self._path(key)}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump({'created': time.time(), 'result': result}, f)
+            os.replace(temporary, self._path(key))
+        except OSError as e:
+            print(f"⚠️ Caché de piel en disco no disponible: {e}")
+            return
+        with self._lock:
+            self.disk_writes += 1
+            prune = self.disk_writes % 256 == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Borrar los archivos más antiguos si el disco supera disk_max_entries"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+            if len(entries) <= self.disk_max_entries:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.disk_max_entries]:
+                os.remove(entry.path)
+        except OSError as e:
+            print(f"⚠️ No se pudo podar la caché de piel en disco: {e}")
+
+    def stats(self):
+        """Métricas de la caché (para /api/skin/status)"""
+        hits = self.lookups - self.misses
+        return {
+            'enabled': self.enabled,
+            'lookups': self.lookups,
+            'hits': hits,
+            'misses': self.misses,
+            'hit_ratio': round(hits / self.lookups, 4) if self.lookups else 0.0,
+            'memory': self.memory.stats(),
+            'disk': {
+                'enabled': bool(self.directory),
+                'directory': self.directory,
+                'hits': self.disk_hits,
+                'writes': self.disk_writes
+            },
+            'perceptual': {
+                'enabled': self.phash_distance >= 0,
+                'max_distance': self.phash_distance,
+                'hits': self.phash_hits
+            }
+        }
+
+# ============================
+# CACHÉ DE PREDICCIONES TABULARES
+# ============================
+
+def tabular_entry_size(result):
+    """Tamaño estimado de un resultado tabular: coste fijo más la longitud del análisis (texto y HTML)"""
+    texts = {}
+    for field in ('analysis', 'analysis_html'):
+        text = result.get(field)
+        if text is not None:
+            texts[id(text)] = len(text)
+    return TABULAR_ENTRY_SIZE + sum(texts.values())
+
+class TabularPredictionCache:
+    """
+    Resultado completo (modelo + ajuste clínico + análisis) por cuestionario normalizado,
+    un LRU por modelo. Cada LRU se vacía cuando cambia su versión (carga del modelo,
+    reglas clínicas o umbral)
+    """
+
+    def __init__(self, max_entries=TABULAR_CACHE_MAX_ENTRIES, max_mb=TABULAR_CACHE_MAX_MB):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._caches = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _cache(self, model_type, version):
+        """LRU del modelo para esta versión (uno nuevo si la versión cambió)"""
+        with self._lock:
+            cache = self._caches.get(model_type)
+            if cache is None or self._versions[model_type] != version:
+                if cache is not None:
+                    self.invalidations += 1
+                    print(f"🔄 Caché tabular '{model_type}' invalidada (modelo o reglas cambiaron)")
+                cache = self._caches[model_type] = LRUCache(self.max_entries, self.max_bytes)
+                self._versions[model_type] = version
+            return cache
+
+    def lookup(self, model_type, version, keys):
+        """Resultados guardados alineados con keys (None = hay que calcularlo)"""
+        cache = self._cache(model_type, version)
+        return [cache.get(key) for key in keys]
+
+    def store(self, model_type, version, keys, outcomes):
+        """Guardar resultados recién calculados"""
+        cache = self._cache(model_type, version)
+        for key, outcome in zip(keys, outcomes):
+            cache.put(key, outcome, size=tabular_entry_size(outcome[0]))
+
+    def stats(self):
+        """Métricas por modelo"""
+        with self._lock:
+            caches = dict(self._caches)
+        return {
+            'enabled': self.enabled,
+            'invalidations': self.invalidations,
+            'models': {model_type: cache.stats() for model_type, cache in caches.items()}
+        }
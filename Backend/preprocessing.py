@@ -0,0 +1,132 @@
+# preprocessing.py - Conversión de cuestionarios al formato de los modelos tabulares
+import numpy as np
+
+# ============================
+# COLUMNAS DE CADA MODELO
+# ============================
+
+# (nombre, conversión, valor por defecto, valores válidos)
+STROKE_COLUMNS = [
+    ('gender', None, 'Male', ['Male', 'Female']),
+    ('age', float, 0, None),
+    ('hypertension', int, 0, None),
+    ('heart_disease', int, 0, None),
+    ('ever_married', None, 'No', ['Yes', 'No']),
+    ('work_type', None, 'Private', ['Private', 'Self-employed', 'Govt_job', 'Children', 'Never_worked']),
+    ('Residence_type', None, 'Urban', ['Urban', 'Rural']),
+    ('avg_glucose_level', float, 100.0, None),
+    ('bmi', float, 25.0, None),
+    ('smoking_status', None, 'never smoked', ['formerly smoked', 'never smoked', 'smokes', 'Unknown'])
+]
+
+HEART_COLUMNS = [
+    ('Age', float, 0, None),
+    ('Sex', None, 'M', ['M', 'F']),
+    ('ChestPainType', None, 'ASY', ['TA', 'ATA', 'NAP', 'ASY']),
+    ('RestingBP', float, 120, None),
+    ('Cholesterol', float, 200, None),
+    ('FastingBS', int, 0, None),
+    ('RestingECG', None, 'Normal', ['Normal', 'ST', 'LVH']),
+    ('MaxHR', float, 150, None),
+    ('ExerciseAngina', None, 'N', ['Y', 'N']),
+    ('Oldpeak', float, 0.0, None),
+    ('ST_Slope', None, 'Flat', ['Up', 'Flat', 'Down']),
+    ('HeartDisease', int, 0, None)
+]
+
+class RecordLayout:
+    """
+    Columnas precompiladas: conjuntos de valores válidos (frozenset) y el dtype
+    del arreglo estructurado que se llena sin pasar por pandas
+    """
+
+    def __init__(self, columns):
+        self.fields = [(name, cast, default, frozenset(valid) if valid is not None else None)
+                       for name, cast, default, valid in columns]
+        self.names = [name for name, _, _, _ in columns]
+        self.dtype = np.dtype([
+            (name, np.float64 if cast is float else np.int64 if cast is int else object)
+            for name, cast, _, _ in columns
+        ])
+
+STROKE_LAYOUT = RecordLayout(STROKE_COLUMNS)
+HEART_LAYOUT = RecordLayout(HEART_COLUMNS)
+
+# ============================
+# PREPROCESAMIENTO
+# ============================
+
+def _validate(data, fields):
+    """Fila convertida y validada (lanza ValueError si un campo numérico es inválido)"""
+    row = []
+    for name, cast, default, valid in fields:
+        value = data.get(name, default)
+        if cast is not None:
+            try:
+                value = cast(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Campo '{name}' inválido: {value!r}")
+        else:
+            try:
+                if value not in valid:
+                    value = default
+            except TypeError:  # Valor no hashable (lista, objeto)
+                value = default
+        row.append(value)
+    return tuple(row)
+
+def preprocess_batch(records, layout):
+    """
+    Convertir una lista de cuestionarios en un arreglo estructurado preasignado.
+    Devuelve (filas válidas, índice original de cada fila, errores por fila)
+    """
+    rows = np.empty(len(records), dtype=layout.dtype)
+    row_index = []
+    errors = []
+    fields = layout.fields
+
+    for i, data in enumerate(records):
+        if not isinstance(data, dict):
+            errors.append({'index': i, 'error': 'Registro inválido: se esperaba un objeto JSON'})
+            continue
+        try:
+            rows[len(row_index)] = _validate(data, fields)
+        except ValueError as e:
+            errors.append({'index': i, 'error': str(e)})
+            continue
+        except OverflowError:
+            errors.append({'index': i, 'error': 'Valor numérico fuera de rango'})
+            continue
+        row_index.append(i)
+
+    return rows[:len(row_index)], row_index, errors
+
+def to_model_input(model, rows):
+    """
+    Entrada para el modelo. Solo los pipelines de sklearn (que seleccionan columnas
+    por nombre) necesitan un DataFrame, y solo con las columnas que vieron al entrenar
+    """
+    names = getattr(model, 'feature_names_in_', None)
+    if names is None:
+        return rows
+    import pandas as pd  # Solo con el pipeline original: el modelo compilado no necesita pandas
+    return pd.DataFrame({name: rows[name] for name in names})
+
+def to_dataframe(rows):
+    """DataFrame con todas las columnas del cuestionario"""
+    import pandas as pd
+    return pd.DataFrame({name: rows[name] for name in rows.dtype.names})
+
+def preprocess_stroke_data(data):
+    """Convertir datos del cuestionario a formato del modelo stroke"""
+    rows, _, errors = preprocess_batch([data], STROKE_LAYOUT)
+    if errors:
+        raise ValueError(errors[0]['error'])
+    return to_dataframe(rows)
+
+def preprocess_heart_data(data):
+    """Convertir datos del cuestionario a formato del modelo heart"""
+    rows, _, errors = preprocess_batch([data], HEART_LAYOUT)
+    if errors:
+        raise ValueError(errors[0]['error'])
+    return to_dataframe(rows)
@@ -0,0 +1,252 @@
+# report_templates.py - Plantillas precompiladas de los informes HTML (tabular y piel)
+from functools import lru_cache
+from string import Formatter
+from flask import request
+
+# ============================
+# PLANTILLA PRECOMPILADA
+# ============================
+
+class CompiledTemplate:
+    """
+    Plantilla con la sintaxis de str.format analizada una sola vez en fragmentos
+    (texto, campo, formato). bind() escribe los campos fijos dentro del texto vecino:
+    render() solo formatea los campos de cada petición y une los fragmentos, sin volver
+    a analizar la plantilla ni reconstruir las partes fijas del nivel de riesgo
+    """
+
+    def __init__(self, parts):
+        self.parts = tuple(parts)
+        self.fields = tuple(dict.fromkeys(field for _, field, _ in self.parts if field is not None))
+        # Fragmentos de texto con un hueco por campo: (posición del hueco, campo, formato)
+        pieces, self._slots = [], []
+        for literal, field, spec in self.parts:
+            pieces.append(literal)
+            if field is not None:
+                self._slots.append((len(pieces), field, spec))
+                pieces.append(None)
+        self._pieces = tuple(pieces)
+
+    def render(self, **values):
+        """Texto con los valores de los campos que quedan (se ignoran los que sobran)"""
+        pieces = list(self._pieces)
+        for position, field, spec in self._slots:
+            value = values[field]
+            pieces[position] = format(value, spec) if spec else str(value)
+        return ''.join(pieces)
+
+    @classmethod
+    def compile(cls, source):
+        return cls((literal, field, spec) for literal, field, spec, _ in Formatter().parse(source))
+
+    def bind(self, **values):
+        """Nueva plantilla con estos campos ya escritos en el texto"""
+        parts, text = [], ''
+        for literal, field, spec in self.parts:
+            text += literal
+            if field is None:
+                continue
+            if field in values:
+                text += format(values[field], spec)
+            else:
+                parts.append((text, field, spec))
+                text = ''
+        parts.append((text, None, None))
+        return CompiledTemplate(parts)
+
+def wants_html():
+    """False con ?format=json: el cliente solo quiere el resultado estructurado (sin generar HTML)"""
+    return request.args.get('format', 'html').lower() != 'json'
+
+# ============================
+# INFORME TABULAR (STROKE / HEART)
+# ============================
+
+# Cabecera y lista de factores según la predicción (1 = riesgo, 0 = sin riesgo significativo)
+_TABULAR_HEAD = {
+    1: """
+        <div style="background: white; border-radius: 16px; padding: 25px; margin-bottom: 25px; border: 1px solid #e5e7eb;">
+            <h3 style="color: #1f2937; margin-bottom: 15px; font-size: 18px; display: flex; align-items: center; gap: 10px;">
+            </h3>
+            <div style="background: #f8fafc; padding: 20px; border-radius: 12px; line-height: 1.6; color: #1f2937;">
+                <div style="font-weight: bold; font-size: 16px; margin-bottom: 10px; color: {title_color};">
+                    {emoji} <strong>ANÁLISIS DE RIESGO - {risk_level}</strong>
+                </div>
+                <p style="margin-bottom: 15px;">
+                    Se ha identificado riesgo de {condition} con una probabilidad estimada del <strong>{probability:.1%}</strong>.
+                </p>
+                <p style="margin-bottom: 15px; color: #4b5563;">
+                    {adjustment_info}
+                </p>
+        """,
+    0: """
+        <div style="background: white; border-radius: 16px; padding: 25px; margin-bottom: 25px; border: 1px solid #e5e7eb;">
+            <h3 style="color: #1f2937; margin-bottom: 15px; font-size: 18px; display: flex; align-items: center; gap: 10px;">
+            </h3>
+            <div style="background: #f8fafc; padding: 20px; border-radius: 12px; line-height: 1.6; color: #1f2937;">
+                <div style="font-weight: bold; font-size: 16px; margin-bottom: 10px; color: {title_color};">
+                    {emoji} <strong>ANÁLISIS DE RIESGO - {risk_level}</strong>
+                </div>
+                <p style="margin-bottom: 15px;">
+                    No se identifica riesgo significativo de {condition} (probabilidad: <strong>{probability:.1%}</strong>).
+                </p>
+                <p style="margin-bottom: 15px; color: #4b5563;">
+                    {adjustment_info}
+                </p>
+        """
+}
+_TABULAR_FACTORS = {
+    1: """
+                <div style="margin-top: 15px;">
+                    <div style="font-weight: bold; margin-bottom: 8px; color: #374151;">Factores de riesgo identificados:</div>
+                    <ul style="margin: 0; padding-left: 20px; color: #4b5563;">
+                        {factor_items}
+                    </ul>
+                </div>
+            """,
+    0: """
+                <div style="margin-top: 15px;">
+                    <div style="font-weight: bold; margin-bottom: 8px; color: #374151;">Factores considerados:</div>
+                    <ul style="margin: 0; padding-left: 20px; color: #4b5563;">
+                        {factor_items}
+                    </ul>
+                </div>
+                <p style="margin-top: 10px; color: #4b5563;">
+                    Aunque se identificaron algunos factores, el análisis general no indica riesgo significativo.
+                </p>
+            """
+}
+_TABULAR_TAIL = """
+                <div style="margin-top: 20px; padding-top: 15px; border-top: 1px solid #e5e7eb;">
+                    <div style="font-weight: bold; color: #1e40af;">📊 Recomendación:</div>
+                    <div style="color: #374151; margin-top: 5px;">{risk_desc}</div>
+                </div>
+            </div>
+        </div>
+        """
+
+# Color del título según risk_color
+_TITLE_COLORS = {'high': 'red', 'medium': 'orange'}
+
+def adjustment_summary(was_adjusted, risk_multiplier, base_probability, probability):
+    """Texto sobre el ajuste clínico de la probabilidad del modelo"""
+    if was_adjusted:
+        if risk_multiplier > 1.5:
+            return f"La probabilidad fue ajustada de {base_probability:.1%} a {probability:.1%} debido a factores de riesgo clínicos."
+        return "El análisis considera tanto la predicción del modelo como factores clínicos."
+    return "La predicción del modelo coincide con la evaluación clínica."
+
+@lru_cache(maxsize=None)
+def tabular_template(prediction, has_factors, risk_color, emoji, risk_level, condition, risk_desc):
+    """Informe con las partes fijas del nivel de riesgo ya escritas (una vez por combinación)"""
+    key = 1 if prediction == 1 else 0
+    source = _TABULAR_HEAD[key] + (_TABULAR_FACTORS[key] if has_factors else '') + _TABULAR_TAIL
+    return CompiledTemplate.compile(source).bind(
+        title_color=_TITLE_COLORS.get(risk_color, 'green'),
+        emoji=emoji,
+        risk_level=risk_level,
+        condition=condition,
+        risk_desc=risk_desc
+    )
+
+def render_tabular_report(result):
+    """HTML del análisis a partir del resultado estructurado de generate_analysis"""
+    template = tabular_template(result['prediction'], bool(result['factors']), result['risk_color'],
+                                result['emoji'], result['risk_level'], result['condition'],
+                                result['risk_description'])
+    return template.render(
+        probability=result['probability'],
+        adjustment_info=adjustment_summary(result['was_adjusted'], result['risk_multiplier'],
+                                           result['base_probability'], result['probability']),
+        factor_items=''.join([f'<li style="margin-bottom: 5px;">{factor}</li>' for factor in result['factors']])
+    )
+
+# ============================
+# INFORME DE PIEL
+# ============================
+
+_SKIN_REPORT = """
+    <div style="background:white;border-radius:12px;padding:20px;border:2px solid {color}">
+        <div style="display:flex;align-items:center;gap:12px;margin-bottom:15px">
+            <div style="font-size:32px">{emoji}</div>
+            <div style="background:{color};color:white;padding:6px 14px;border-radius:8px;font-weight:700">
+                {risk_level} RIESGO
+            </div>
+            <div style="font-size:14px;color:#666;background:#f8fafc;padding:4px 12px;border-radius:6px;">
+                {predicted_class}
+            </div>
+        </div>
+        
+        <div style="margin-top:10px;font-size:15px;color:var(--text-primary)">
+            <strong>📊 Confianza del modelo:</strong> {confidence_percent:.1f}%
+            <div style="display:inline-block;width:100px;height:6px;background:#e5e7eb;border-radius:3px;margin-left:10px;vertical-align:middle;overflow:hidden;">
+                <div style="height:100%;width:{confidence_width}%;background:{color};border-radius:3px;"></div>
+            </div>
+        </div>
+        
+        <div style="margin-top:15px;">
+            <strong>🔍 Diagnósticos posibles:</strong>
+            <div style="margin-top:8px;background:#f8fafc;padding:12px;border-radius:8px;font-size:14px;">
+                {class_rows}
+            </div>
+        </div>
+        
+        <div style="margin-top:20px;padding:15px;background:{box_background};border-radius:10px;border-left:4px solid {color};">
+            <div style="font-weight:700;color:{title_color};margin-bottom:8px;display:flex;align-items:center;gap:8px;">
+                <span>{icon}</span> {urgency} - {predicted_class_upper}
+            </div>
+            <div style="color:{text_color};font-size:14px;line-height:1.5;">
+                <strong>{recommendation}</strong><br>
+                {explanation}
+            </div>
+        </div>
+        
+        <div style="margin-top:15px;padding:10px;background:#f8fafc;border-radius:8px;font-size:13px;color:#666">
+            <strong>💡 Guía de riesgo:</strong><br>
+            <span style="color:#ef4444">🔴 ALTO:</span> Lesiones sospechosas de cáncer (melanoma, carcinoma)<br>
+            <span style="color:#f59e0b">🟡 MODERADO:</span> Lesiones atípicas que requieren evaluación<br>
+            <span style="color:#10b981">🟢 BAJO:</span> Lesiones benignas con seguimiento rutinario
+        </div>
+    </div>
+    """
+
+# (fondo del recuadro, color del título, icono, color del texto) por categoría de riesgo
+_SKIN_STYLES = {
+    'ALTO': ('#fee2e2', '#dc2626', '🚨', '#7f1d1d'),
+    'MODERADO': ('#fef3c7', '#92400e', '⚠️', '#92400e'),
+    'BAJO': ('#f0fdf4', '#047857', '✅', '#065f46')
+}
+
+@lru_cache(maxsize=None)
+def skin_template(risk_level, color, emoji, urgency, recommendation):
+    """Informe con las partes fijas del nivel de riesgo ya escritas (una vez por combinación)"""
+    category = 'ALTO' if 'ALTO' in risk_level else 'MODERADO' if 'MODERADO' in risk_level else 'BAJO'
+    box_background, title_color, icon, text_color = _SKIN_STYLES[category]
+    return CompiledTemplate.compile(_SKIN_REPORT).bind(
+        risk_level=risk_level,
+        color=color,
+        emoji=emoji,
+        urgency=urgency,
+        recommendation=recommendation,
+        box_background=box_background,
+        title_color=title_color,
+        icon=icon,
+        text_color=text_color
+    )
+
+def render_skin_report(result, explanation):
+    """HTML del análisis a partir del resultado estructurado de generate_skin_analysis"""
+    template = skin_template(result['risk_level'], result['color'], result['emoji'],
+                             result['urgency'], result['recommendation'])
+    predicted_class = result['predicted_class']
+    confidence = result['confidence']
+    top_classes = list(result['all_probabilities'].items())[:3]
+    return template.render(
+        predicted_class=predicted_class,
+        predicted_class_upper=predicted_class.upper(),
+        confidence_percent=confidence * 100,
+        confidence_width=confidence * 100,
+        class_rows=''.join([f'<div style="margin-bottom:5px;display:flex;justify-content:space-between;"><span>{cls}:</span> '
+                            f'<span style="font-weight:bold">{prob * 100:.1f}%</span></div>' for cls, prob in top_classes]),
+        explanation=explanation
+    )
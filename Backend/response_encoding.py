@@ -0,0 +1,110 @@
+# response_encoding.py - Serialización JSON rápida y compresión de las respuestas de la API
+import os
+import gzip
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from metrics import mark
+
+# Dependencias opcionales: sin ellas se usa json estándar y solo gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 'orjson' (si está instalado) o 'json' (el de Flask)
+JSON_ENCODER = os.environ.get('LIFESCAN_JSON_ENCODER', 'orjson' if orjson else 'json')
+# Compresión según Accept-Encoding del cliente (br si brotli está instalado, si no gzip)
+COMPRESSION = os.environ.get('LIFESCAN_COMPRESSION', '1') != '0'
+COMPRESS_MIN_BYTES = int(os.environ.get('LIFESCAN_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('LIFESCAN_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('LIFESCAN_BROTLI_QUALITY', 5))
+COMPRESS_ROUTES = ('/api/predict/', '/api/skin/')
+COMPRESS_MIMETYPES = frozenset({'application/json', 'application/x-ndjson', 'text/html', 'text/plain'})
+
+# ============================
+# JSON
+# ============================
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    jsonify y request.get_json con orjson: serializa directo a bytes (sin pasar por str),
+    acepta escalares y arreglos de NumPy y no ordena las claves
+    """
+
+    options = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:  # Opciones de json estándar (indent, sort_keys...)
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(obj)  # Modo debug: JSON indentado
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=self.options),
+                                        mimetype=self.mimetype)
+
+# ============================
+# COMPRESIÓN
+# ============================
+
+def choose_encoding(accept_encodings):
+    """Codificación aceptada por el cliente: 'br', 'gzip' o None (sin comprimir)"""
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+def compress(data, encoding):
+    """Comprimir el cuerpo con la codificación elegida"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+def compress_response(response):
+    """
+    Comprimir las respuestas de predicción cuando el cliente lo pide (Accept-Encoding).
+    Las respuestas pequeñas, en streaming o ya comprimidas se envían tal cual
+    """
+    if (not COMPRESSION or response.direct_passthrough or response.is_streamed
+            or not request.path.startswith(COMPRESS_ROUTES)
+            or response.mimetype not in COMPRESS_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    # La respuesta depende de Accept-Encoding aunque esta vez no se comprima
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    mark('serialize')
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    mark('compress')
+    return response
+
+def configure_responses(app):
+    """Activar el codificador JSON configurado y la compresión en la aplicación"""
+    if JSON_ENCODER == 'orjson':
+        if orjson is None:
+            print("⚠️ LIFESCAN_JSON_ENCODER=orjson pero orjson no está instalado: se usa json estándar")
+        else:
+            app.json = OrjsonProvider(app)
+    if COMPRESSION:
+        app.after_request(compress_response)
+    print(f"📨 JSON: {type(app.json).__name__}, compresión: "
+          f"{('br, gzip' if brotli else 'gzip') if COMPRESSION else 'desactivada'}")
@@ -0,0 +1,139 @@
+# serve.py - Servidor de producción: precarga los modelos y luego crea N workers (gunicorn)
+#
+# Uso:
+#   python serve.py                       # un worker por núcleo
+#   python serve.py --workers 4 --bind 0.0.0.0:5000
+#
+# Señales (al proceso maestro):
+#   HUP   recarga elegante: workers nuevos, los viejos terminan sus peticiones
+#   TERM  apagado elegante (espera hasta --graceful-timeout segundos)
+#   USR2  lanza un maestro nuevo con el código actualizado (cambio sin caída)
+import os
+import sys
+import argparse
+import multiprocessing
+
+# Configuración (variables de entorno; la línea de comandos tiene prioridad)
+BIND = os.environ.get('LIFESCAN_BIND', '127.0.0.1:5000')
+# 'auto' = un worker por núcleo
+WORKERS = os.environ.get('LIFESCAN_WORKERS', 'auto')
+# Hilos por worker (gthread). Con más de uno, las peticiones de piel simultáneas de un mismo
+# worker llegan juntas al micro-batcher; con 1 (workers sync) nunca se agrupan
+THREADS = int(os.environ.get('LIFESCAN_THREADS', 4))
+# Segundos máximos por petición antes de reiniciar el worker
+TIMEOUT = int(os.environ.get('LIFESCAN_TIMEOUT', 60))
+GRACEFUL_TIMEOUT = int(os.environ.get('LIFESCAN_GRACEFUL_TIMEOUT', 30))
+# Reiniciar cada worker tras N peticiones (0 = nunca)
+MAX_REQUESTS = int(os.environ.get('LIFESCAN_MAX_REQUESTS', 0))
+# Segundos máximos esperando a que carguen los modelos antes de crear los workers
+PRELOAD_TIMEOUT = float(os.environ.get('LIFESCAN_PRELOAD_TIMEOUT', 300))
+
+def worker_count(value):
+    """Número de workers: entero o 'auto' (uno por núcleo)"""
+    if str(value).lower() == 'auto':
+        return multiprocessing.cpu_count()
+    count = int(value)
+    if count < 1:
+        raise ValueError("Se necesita al menos un worker")
+    return count
+
+def preload_app():
+    """
+    Importar app.py en el proceso maestro y esperar a que terminen de cargar los modelos.
+    Los hilos de carga no sobreviven a fork(): los workers heredan los modelos ya listos
+    (y las páginas de los arreglos mapeados se comparten entre todos). Los modelos no seguros
+    ante fork() (TensorFlow) no se cargan aquí: el maestro ni siquiera importa TensorFlow
+    """
+    from model_registry import registry
+    registry.defer_fork_unsafe()
+    import app as lifescan
+
+    print(f"\n⏳ Esperando modelos (máx. {PRELOAD_TIMEOUT:.0f}s) antes de crear los workers...")
+    if not lifescan.registry.wait_all(PRELOAD_TIMEOUT):
+        print("⚠️ Algunos modelos siguen cargando: los workers responderán 503 para esos modelos")
+    for name, status in lifescan.registry.status().items():
+        print(f"   {name:8} {status['state']}")
+    return lifescan.app
+
+def post_fork(server, worker):
+    """
+    Los hilos del maestro no existen en el worker: reiniciar el hilo escritor del registro y la
+    recarga de reglas clínicas, y cargar los modelos que el maestro no precargó (piel/TensorFlow)
+    """
+    from structured_logging import start_logging
+    start_logging()
+    from model_registry import registry
+    registry.start_deferred()
+    from settings import enabled_modules
+    if 'tabular' in enabled_modules():
+        from clinical_rules import start_rules_watcher
+        start_rules_watcher()
+
+def build_options(args):
+    """Opciones de gunicorn a partir de los argumentos"""
+    return {
+        'bind': args.bind,
+        'workers': worker_count(args.workers),
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': True,
+        'post_fork': post_fork,
+        'accesslog': '-' if args.access_log else None
+    }
+
+def run_gunicorn(options):
+    """Servir con gunicorn (Linux/macOS)"""
+    from gunicorn.app.base import BaseApplication
+
+    class LifeScanServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return preload_app()
+
+    LifeScanServer().run()
+
+def run_waitress(options):
+    """Windows no tiene fork(): un solo proceso con varios hilos (waitress)"""
+    from waitress import serve
+
+    application = preload_app()
+    host, _, port = options['bind'].rpartition(':')
+    threads = max(options['workers'] * options['threads'], 4)
+    print(f"🪟 waitress en {options['bind']} con {threads} hilos (sin fork en Windows)")
+    serve(application, host=host or '127.0.0.1', port=int(port), threads=threads,
+          channel_timeout=options['timeout'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de producción LifeScan")
+    parser.add_argument('--bind', default=BIND, help="host:puerto")
+    parser.add_argument('--workers', default=WORKERS, help="número de procesos o 'auto' (uno por núcleo)")
+    parser.add_argument('--threads', type=int, default=THREADS, help="hilos por worker")
+    parser.add_argument('--timeout', type=int, default=TIMEOUT, help="segundos máximos por petición")
+    parser.add_argument('--graceful-timeout', type=int, default=GRACEFUL_TIMEOUT,
+                        help="segundos para terminar peticiones al recargar/apagar")
+    parser.add_argument('--max-requests', type=int, default=MAX_REQUESTS,
+                        help="reiniciar cada worker tras N peticiones (0 = nunca)")
+    parser.add_argument('--access-log', action='store_true', help="registro de accesos en stdout")
+    args = parser.parse_args(argv)
+
+    options = build_options(args)
+    print("=" * 60)
+    print(f"🏭 LIFESCAN PRODUCCIÓN: {options['workers']} workers x {options['threads']} hilos en {options['bind']}")
+    print(f"   Timeout por petición: {options['timeout']}s | Recarga elegante: kill -HUP <pid maestro>")
+    print("=" * 60)
+
+    if os.name == 'nt':
+        run_waitress(options)
+    else:
+        run_gunicorn(options)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+# settings.py - Configuración compartida por los módulos del servidor
+import os
+
+# ============================
+# RUTAS DE LOS MODELOS
+# ============================
+BACKEND_PATH = os.environ.get('LIFESCAN_BACKEND_PATH', r"C:\Documentos\LifeScan\Backend")
+STROKE_MODEL_PATH = os.path.join(BACKEND_PATH, "stroke_model.pkl")
+HEART_MODEL_PATH = os.path.join(BACKEND_PATH, "heart_model.pkl")
+IMAGES_MODEL_PATH = os.path.join(BACKEND_PATH, "modelo_imagenes.h5")
+IMAGES_CLASSES_PATH = os.path.join(BACKEND_PATH, "clases.json")
+
+# Tamaño máximo de las subidas de imágenes (se rechaza antes de leer el cuerpo)
+MAX_UPLOAD_MB = float(os.environ.get('LIFESCAN_MAX_UPLOAD_MB', 10))
+
+# ============================
+# MÓDULOS DEL SERVIDOR
+# ============================
+
+# Cada módulo registra sus rutas y sus modelos; sus dependencias pesadas solo se importan
+# si está activo. LIFESCAN_MODULES=tabular sirve stroke/heart sin importar nunca
+# TensorFlow ni Pillow (el chat vive en el backend de Hackaton SIC 2025)
+AVAILABLE_MODULES = {
+    'tabular': 'tabular_api',
+    'skin': 'skin_api'
+}
+DEFAULT_MODULES = 'tabular,skin'
+
+def enabled_modules(value=None):
+    """Módulos activos (LIFESCAN_MODULES, separados por comas) en el orden de AVAILABLE_MODULES"""
+    if value is None:
+        value = os.environ.get('LIFESCAN_MODULES', DEFAULT_MODULES)
+    requested = {name.strip().lower() for name in value.split(',') if name.strip()}
+    for name in sorted(requested - set(AVAILABLE_MODULES)):
+        print(f"⚠️ Módulo desconocido '{name}' ignorado (disponibles: {', '.join(AVAILABLE_MODULES)})")
+    return [name for name in AVAILABLE_MODULES if name in requested]
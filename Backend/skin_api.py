@@ -0,0 +1,473 @@
+# skin_api.py - Módulo de piel del servidor: análisis de imágenes (cáncer de piel)
+import os
+import json
+import threading
+import numpy as np
+from flask import Blueprint, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+from model_registry import registry, model_unavailable, LOADING, FAILED
+from micro_batching import MicroBatcher, QueueFullError
+from skin_backend import SKIN_BACKEND, load_skin_backend
+from prediction_cache import SkinPredictionCache, content_hash, perceptual_hash
+from report_templates import render_skin_report, wants_html
+from metrics import count_error, mark
+from structured_logging import get_logger
+from settings import IMAGES_MODEL_PATH, IMAGES_CLASSES_PATH, MAX_UPLOAD_MB
+
+blueprint = Blueprint('skin', __name__)
+log = get_logger('skin')
+
+# ============================
+# ANÁLISIS DE IMÁGENES (CÁNCER DE PIEL)
+# ============================
+
+# TensorFlow se importa dentro de load_images_model (en su hilo de carga),
+# así importar este módulo no espera a TensorFlow. El preprocesamiento solo usa Pillow + NumPy
+try:
+    from image_preprocessing import IMAGE_SIZE, InvalidImageError, open_image, preprocess_image as decode_image
+except ImportError as e:
+    print(f"⚠️ Advertencia: {e}")
+    print("   Instala con: pip install pillow")
+
+# Variables globales para el modelo de imágenes
+images_model = None
+class_names = []
+
+def load_images_model():
+    """Cargar modelo de imágenes de cáncer de piel"""
+    global images_model, class_names
+    
+    try:
+        if os.path.exists(IMAGES_MODEL_PATH) and os.path.exists(IMAGES_CLASSES_PATH):
+            # Cargar modelo con el backend configurado (LIFESCAN_SKIN_BACKEND);
+            # TensorFlow se importa aquí, en el hilo de carga
+            print(f"📸 Cargando modelo de imágenes desde: {IMAGES_MODEL_PATH} (backend: {SKIN_BACKEND})")
+            images_model = load_skin_backend(IMAGES_MODEL_PATH, SKIN_BACKEND)
+            print("✅ Modelo de imágenes cargado correctamente")
+            
+            # Cargar nombres de clases
+            with open(IMAGES_CLASSES_PATH, 'r') as f:
+                class_names = json.load(f)
+            print(f"✅ {len(class_names)} clases cargadas: {class_names}")
+            
+            return True
+        else:
+            print(f"❌ No se encontraron archivos del modelo de imágenes:")
+            print(f"   Modelo: {IMAGES_MODEL_PATH} {'EXISTE' if os.path.exists(IMAGES_MODEL_PATH) else 'NO EXISTE'}")
+            print(f"   Clases: {IMAGES_CLASSES_PATH} {'EXISTE' if os.path.exists(IMAGES_CLASSES_PATH) else 'NO EXISTE'}")
+            return False
+            
+    except Exception as e:
+        log.exception(f"❌ Error cargando modelo de imágenes: {e}")
+        return False
+
+def load_skin_model():
+    """Cargador para el registro: el modelo de imágenes o excepción si no se pudo cargar"""
+    if not load_images_model():
+        raise RuntimeError('No se pudo cargar el modelo de imágenes')
+    return images_model
+
+def ensure_images_model():
+    """
+    Modelo de imágenes listo o respuesta de error: 503 mientras carga en segundo plano;
+    si la carga falló se reintenta una vez en esta petición
+    """
+    if registry.get('skin') is not None:
+        return None
+    if registry.state('skin') == LOADING:
+        return model_unavailable('skin')
+    if registry.state('skin') == FAILED:
+        log.warning("🔄 Reintentando carga del modelo de imágenes")
+        registry.load('skin')
+    if registry.get('skin') is None:
+        return model_unavailable('skin')
+    return None
+
+# Las peticiones concurrentes de piel se agrupan en una sola llamada a predict(); cada petición
+# espera su resultado como mucho SKIN_BATCH_TIMEOUT segundos (TimeoutError -> 503)
+skin_batcher = MicroBatcher(lambda batch: images_model.predict(batch, verbose=0), name='skin')
+
+# Búfer float32 por hilo: la imagen se escribe directamente en él (sin copias intermedias).
+# Es seguro reutilizarlo porque el hilo espera el resultado de su lote antes de la siguiente imagen
+_image_buffers = threading.local()
+
+# Caché de resultados por contenido de la imagen (reintentos, doble clic, imágenes compartidas)
+skin_cache = SkinPredictionCache()
+
+def skin_model_version():
+    """
+    Identidad del modelo de piel en las claves de la caché: un modelo (o backend)
+    nuevo no reutiliza resultados
+    """
+    parts = [SKIN_BACKEND]
+    for path in (IMAGES_MODEL_PATH, IMAGES_CLASSES_PATH):
+        try:
+            stat = os.stat(path)
+            parts.append(f"{stat.st_size}-{stat.st_mtime_ns}")
+        except OSError:
+            parts.append("sin-archivo")
+    return ":".join(parts)
+
+def image_phash(source):
+    """Hash perceptual de la imagen (el stream vuelve a su posición para la predicción)"""
+    position = source.tell() if hasattr(source, 'tell') else None
+    try:
+        return perceptual_hash(open_image(source))
+    finally:
+        if position is not None:
+            source.seek(position)
+
+def preprocess_image(source):
+    """Preprocesar imagen (bytes o stream) para el modelo: arreglo float32 (224, 224, 3)"""
+    try:
+        buffer = getattr(_image_buffers, 'array', None)
+        if buffer is None:
+            buffer = _image_buffers.array = np.empty(IMAGE_SIZE[::-1] + (3,), dtype=np.float32)
+        
+        # Decodificación reducida (JPEG draft), RGB y redimensión a 224x224 (MobileNetV2)
+        return decode_image(source, out=buffer)
+        
+    except Exception as e:
+        log.debug(f"❌ Error procesando imagen: {e}")
+        raise
+
+def predict_skin_cancer(source):
+    """Realizar predicción de cáncer de piel (con caché por contenido de la imagen)"""
+    global images_model, class_names
+    
+    # Misma imagen y mismo modelo -> mismo resultado, sin decodificar ni inferir
+    cache_key = phash = None
+    if skin_cache.enabled:
+        cache_key = content_hash(source, skin_model_version())
+        cached, phash = skin_cache.lookup(cache_key, lambda: image_phash(source))
+        mark('cache')
+        if cached is not None:
+            log.debug("♻️ Resultado desde caché de imágenes")
+            return cached
+    
+    try:
+        # Preprocesar imagen
+        processed_img = preprocess_image(source)
+        mark('preprocess')
+        
+        # Realizar predicción (en lote con otras peticiones concurrentes)
+        predictions = skin_batcher.predict(processed_img)[np.newaxis]
+        mark('model')
+        
+        # Obtener clase y confianza
+        predicted_class_idx = np.argmax(predictions[0])
+        confidence = predictions[0][predicted_class_idx]
+        
+        # Obtener nombre de la clase
+        if class_names and predicted_class_idx < len(class_names):
+            predicted_class = class_names[predicted_class_idx]
+        else:
+            predicted_class = f"Clase {predicted_class_idx}"
+        
+        # Obtener todas las probabilidades
+        all_probabilities = {}
+        for i, prob in enumerate(predictions[0]):
+            class_name = class_names[i] if i < len(class_names) else f"Clase {i}"
+            all_probabilities[class_name] = float(prob)
+        
+        # Ordenar por probabilidad descendente
+        sorted_probabilities = dict(sorted(all_probabilities.items(), 
+                                          key=lambda x: x[1], 
+                                          reverse=True))
+        
+        result = {
+            'predicted_class': predicted_class,
+            'confidence': float(confidence),
+            'class_index': int(predicted_class_idx),
+            'all_probabilities': sorted_probabilities
+        }
+        if cache_key is not None:
+            skin_cache.put(cache_key, result, phash)
+        
+        return result
+        
+    except Exception as e:
+        log.debug(f"❌ Error en predicción: {e}")
+        raise
+
+def probability_array(all_probabilities):
+    """Probabilidades en el orden de clases.json (la posición es el índice de la clase)"""
+    return [all_probabilities[class_names[i] if i < len(class_names) else f"Clase {i}"]
+            for i in range(len(all_probabilities))]
+
+def generate_skin_analysis(prediction_result, include_html=True):
+    """
+    Generar análisis clínico de la predicción de cáncer de piel - VERSIÓN MEJORADA.
+    Con include_html=False no se genera 'analysis_html'
+    """
+    
+    predicted_class = prediction_result['predicted_class']
+    confidence = prediction_result['confidence']
+    all_probabilities = prediction_result['all_probabilities']
+    
+    # IMPORTANTE: Definir claramente qué clases son ALTO riesgo
+    high_risk_classes = ['melanoma', 'melanocytic', 'malignant']
+    moderate_risk_classes = ['basal_cell_carcinoma', 'squamous_cell_carcinoma', 
+                            'actinic_keratosis', 'suspicious']
+    low_risk_classes = ['nevus', 'seborrheic_keratosis', 'benign_keratosis',
+                       'dermatofibroma', 'vascular_lesion', 'benign']
+    
+    # Normalizar nombre de clase para búsqueda (minúsculas)
+    class_lower = predicted_class.lower()
+    
+    # Determinar riesgo basado en la CLASE PREDICHA y CONFIANZA
+    risk_level = 'MODERADO'  # Default
+    
+    # Verificar si es ALTO riesgo
+    for high_class in high_risk_classes:
+        if high_class in class_lower:
+            # Si la confianza es alta (>70%), es ALTO riesgo
+            if confidence > 0.7:
+                risk_level = 'ALTO'
+            else:
+                risk_level = 'MODERADO-ALTO'
+            break
+    
+    # Si no es alto riesgo, verificar MODERADO
+    if risk_level == 'MODERADO':
+        for moderate_class in moderate_risk_classes:
+            if moderate_class in class_lower:
+                # Si la confianza es alta, podría ser moderado-alto
+                if confidence > 0.8:
+                    risk_level = 'MODERADO-ALTO'
+                else:
+                    risk_level = 'MODERADO'
+                break
+    
+    # Si no es alto ni moderado, es BAJO
+    if risk_level == 'MODERADO':
+        for low_class in low_risk_classes:
+            if low_class in class_lower:
+                risk_level = 'BAJO'
+                break
+    
+    # ADICIONAL: Considerar la confianza para ajustar riesgo
+    if confidence < 0.5:
+        # Baja confianza, bajar nivel de riesgo
+        if risk_level == 'ALTO':
+            risk_level = 'MODERADO-ALTO'
+        elif risk_level == 'MODERADO-ALTO':
+            risk_level = 'MODERADO'
+    
+    # Ajustar colores y recomendaciones según riesgo
+    if 'ALTO' in risk_level:
+        color = '#ef4444'
+        emoji = '🔴'
+        urgency = 'URGENTE'
+        recommendation = 'Se recomienda VISITA INMEDIATA al dermatólogo (en menos de 48 horas).'
+        explanation = f'Se identificó {predicted_class} con alta probabilidad ({confidence*100:.1f}%). Las características son altamente sospechosas de malignidad y requieren evaluación profesional inmediata.'
+    elif 'MODERADO' in risk_level:
+        color = '#f59e0b'
+        emoji = '🟡'
+        urgency = 'PRIORITARIA'
+        recommendation = 'Se recomienda consulta dermatológica en las próximas 2 semanas.'
+        explanation = f'Se identificó {predicted_class}. Aunque no es claramente maligno, requiere evaluación profesional para descartar riesgos.'
+    else:
+        color = '#10b981'
+        emoji = '🟢'
+        urgency = 'ROUTINARIA'
+        recommendation = 'Se recomienda monitoreo anual y consulta si hay cambios.'
+        explanation = f'Se identificó {predicted_class} de tipo benigno. Mantener seguimiento regular.'
+    
+    result = {
+        'predicted_class': predicted_class,
+        'confidence': float(confidence),
+        'risk_level': risk_level,
+        'urgency': urgency,
+        'recommendation': recommendation,
+        'all_probabilities': all_probabilities,
+        'color': color,
+        'emoji': emoji
+    }
+    if include_html:
+        # Plantilla precompilada: las partes fijas de cada nivel de riesgo se generan una sola vez
+        result['analysis_html'] = render_skin_report(result, explanation)
+    return result
+
+@blueprint.route('/api/skin/debug', methods=['POST'])
+def skin_debug():
+    """Endpoint de diagnóstico para ver qué predice realmente el modelo"""
+    try:
+        if 'image' not in request.files:
+            return jsonify({'error': 'No se recibió imagen'}), 400
+        
+        image_file = request.files['image']
+        mark('parse')
+        
+        if image_file.filename == '':
+            return jsonify({'error': 'Nombre de archivo vacío'}), 400
+        
+        # Modelo listo (503 si sigue cargando)
+        unavailable = ensure_images_model()
+        if unavailable:
+            return unavailable
+        
+        # Preprocesar directamente desde el stream de la subida (sin copiarla a bytes)
+        processed_img = preprocess_image(image_file.stream)
+        mark('preprocess')
+        
+        # Realizar predicción (en lote con otras peticiones concurrentes)
+        predictions = skin_batcher.predict(processed_img)[np.newaxis]
+        mark('model')
+        
+        # TODAS las predicciones
+        all_results = []
+        for i, prob in enumerate(predictions[0]):
+            class_name = class_names[i] if i < len(class_names) else f"Clase_{i}"
+            all_results.append({
+                'class': class_name,
+                'probability': float(prob),
+                'percentage': float(prob) * 100
+            })
+        
+        # Ordenar por probabilidad
+        all_results.sort(key=lambda x: x['probability'], reverse=True)
+        
+        # Predicción principal
+        top_result = all_results[0]
+        
+        # Un solo registro con todas las probabilidades (antes una línea por clase)
+        log.info("🔍 DEBUG - Predicción", filename=image_file.filename, top_class=top_result['class'],
+                 probability=round(top_result['probability'], 4),
+                 probabilities={item['class']: round(item['probability'], 4) for item in all_results})
+        
+        # Generar análisis temporal para ver qué pasa
+        temp_prediction = {
+            'predicted_class': top_result['class'],
+            'confidence': top_result['probability'],
+            'all_probabilities': {item['class']: item['probability'] for item in all_results}
+        }
+        
+        analysis = generate_skin_analysis(temp_prediction, include_html=False)
+        mark('html')
+        
+        return jsonify({
+            'debug': True,
+            'all_predictions': all_results,
+            'top_prediction': top_result,
+            'class_names': class_names,
+            'generated_risk_level': analysis['risk_level'],
+            'why': f"Clase '{top_result['class']}' con {top_result['percentage']:.1f}% de confianza"
+        })
+        
+    except RequestEntityTooLarge as e:
+        count_error(e)
+        raise  # Lo responde el manejador de 413 de la aplicación
+    except InvalidImageError as e:
+        count_error(e)
+        return jsonify({'error': str(e)}), 400
+    except (QueueFullError, TimeoutError) as e:
+        count_error(e)
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        count_error(e)
+        log.exception(f"❌ Error en debug: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+@blueprint.route('/api/predict/skin', methods=['POST', 'OPTIONS'])
+def predict_skin():
+    """Endpoint para análisis de cáncer de piel desde imágenes"""
+    try:
+        # CORS preflight
+        if request.method == 'OPTIONS':
+            return jsonify({'status': 'ok'}), 200
+        
+        # Verificar si hay archivo
+        if 'image' not in request.files:
+            return jsonify({'error': 'No se recibió imagen'}), 400
+        
+        image_file = request.files['image']
+        mark('parse')
+        
+        if image_file.filename == '':
+            return jsonify({'error': 'Nombre de archivo vacío'}), 400
+        
+        # Verificar formato
+        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+        if '.' not in image_file.filename or \
+           image_file.filename.split('.')[-1].lower() not in allowed_extensions:
+            return jsonify({'error': 'Formato de imagen no soportado'}), 400
+        
+        # Modelo listo (503 si sigue cargando)
+        unavailable = ensure_images_model()
+        if unavailable:
+            return unavailable
+        
+        # Realizar predicción leyendo directamente del stream de la subida
+        prediction_result = predict_skin_cancer(image_file.stream)
+        
+        # Generar análisis clínico (sin HTML con ?format=json)
+        include_html = wants_html()
+        analysis_result = generate_skin_analysis(prediction_result, include_html)
+        mark('html')
+        
+        # Construir respuesta
+        response = {
+            'success': True,
+            'prediction': {
+                'class': analysis_result['predicted_class'],
+                'confidence': analysis_result['confidence'],
+                'risk_level': analysis_result['risk_level'],
+                'urgency': analysis_result['urgency']
+            },
+            'recommendation': analysis_result['recommendation'],
+            # ?probabilities=array: lista alineada con clases.json en lugar de {clase: probabilidad}
+            'probabilities': (probability_array(analysis_result['all_probabilities'])
+                              if request.args.get('probabilities') == 'array'
+                              else analysis_result['all_probabilities']),
+            'visual': {
+                'color': analysis_result['color'],
+                'emoji': analysis_result['emoji']
+            }
+        }
+        
+        if include_html:
+            response['analysis_html'] = analysis_result['analysis_html']
+        
+        log.info("✅ Predicción completada", filename=image_file.filename,
+                 predicted_class=analysis_result['predicted_class'], confidence=round(analysis_result['confidence'], 4),
+                 risk_level=analysis_result['risk_level'])
+        
+        return jsonify(response)
+        
+    except RequestEntityTooLarge as e:
+        count_error(e)
+        log.warning(f"⚠️ Subida rechazada: supera {MAX_UPLOAD_MB:g} MB")
+        raise
+    except InvalidImageError as e:
+        count_error(e)
+        log.warning(f"⚠️ Imagen rechazada: {e}")
+        return jsonify({'error': str(e)}), 400
+    except (QueueFullError, TimeoutError) as e:
+        count_error(e)
+        log.warning(f"⚠️ {e}")
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        count_error(e)
+        log.exception(f"❌ Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@blueprint.route('/api/skin/status', methods=['GET'])
+def skin_model_status():
+    """Verificar estado del modelo de piel"""
+    return jsonify({
+        'model_loaded': images_model is not None,
+        'backend': getattr(images_model, 'name', None),
+        'state': registry.state('skin'),
+        'load_seconds': registry.status()['skin']['load_seconds'],
+        'classes_loaded': len(class_names) > 0,
+        'available_classes': class_names,
+        'model_path': IMAGES_MODEL_PATH,
+        'classes_path': IMAGES_CLASSES_PATH,
+        'batching': skin_batcher.stats(),
+        'cache': skin_cache.stats()
+    })
+
+# El modelo de piel se carga en segundo plano junto con los demás (registry.start() en app.py).
+# TensorFlow no es seguro ante fork(): con serve.py cada worker carga su propia copia
+registry.register('skin', load_skin_model, fork_safe=False)
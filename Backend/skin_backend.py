@@ -0,0 +1,178 @@
+# skin_backend.py - Backends de inferencia para el modelo de piel (Keras, grafo compilado, TFLite)
+import os
+import threading
+import numpy as np
+
+from model_compiler import cache_path
+
+# keras        = model.predict() en modo eager (comportamiento original)
+# graph        = tf.function con firma fija (LIFESCAN_SKIN_XLA=1 compila además con XLA)
+# tflite       = TFLite en float32
+# tflite-fp16  = TFLite con pesos float16
+# tflite-int8  = TFLite con cuantización int8 de pesos (rango dinámico); con
+#                LIFESCAN_SKIN_CALIBRATION_DIR, int8 completo calibrado con esas imágenes
+SKIN_BACKEND = os.environ.get('LIFESCAN_SKIN_BACKEND', 'keras')
+SKIN_BACKENDS = ('keras', 'graph', 'tflite', 'tflite-fp16', 'tflite-int8')
+SKIN_XLA = os.environ.get('LIFESCAN_SKIN_XLA', '0') == '1'
+SKIN_CALIBRATION_DIR = os.environ.get('LIFESCAN_SKIN_CALIBRATION_DIR')
+SKIN_CALIBRATION_SAMPLES = int(os.environ.get('LIFESCAN_SKIN_CALIBRATION_SAMPLES', 200))
+# Hilos del intérprete TFLite (None = los que decida TFLite)
+SKIN_TFLITE_THREADS = int(os.environ['LIFESCAN_SKIN_TFLITE_THREADS']) if os.environ.get('LIFESCAN_SKIN_TFLITE_THREADS') else None
+
+# ============================
+# BACKENDS
+# ============================
+
+class KerasBackend:
+    """Modelo Keras original (model.predict)"""
+
+    name = 'keras'
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch, verbose=0):
+        return self.model.predict(batch, verbose=verbose)
+
+class GraphBackend:
+    """
+    El modelo envuelto en un tf.function con firma fija (N x 224 x 224 x 3 float32):
+    se traza una sola vez y evita el costo fijo de model.predict() en cada llamada
+    """
+
+    def __init__(self, model, jit_compile=SKIN_XLA):
+        import tensorflow as tf
+
+        self.name = 'graph-xla' if jit_compile else 'graph'
+        self.model = model
+        input_shape = [None] + [int(dim) for dim in model.input_shape[1:]]
+        self._function = tf.function(
+            lambda batch: model(batch, training=False),
+            input_signature=[tf.TensorSpec(input_shape, tf.float32)],
+            jit_compile=jit_compile
+        )
+
+    def predict(self, batch, verbose=0):
+        return self._function(np.asarray(batch, dtype=np.float32)).numpy()
+
+class TFLiteBackend:
+    """
+    Intérprete TFLite. Usa tflite_runtime si está instalado (no necesita TensorFlow
+    completo para servir); el tamaño de lote se ajusta al de cada llamada
+    """
+
+    def __init__(self, model_path, name='tflite', num_threads=SKIN_TFLITE_THREADS):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.name = name
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # El intérprete no es seguro entre hilos (el micro-batcher ya serializa las llamadas)
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            shape = [batch_size] + [int(dim) for dim in self._input['shape'][1:]]
+            self.interpreter.resize_tensor_input(self._input['index'], shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            self._resize(len(batch))
+            scale, zero_point = self._input['quantization']
+            if self._input['dtype'] != np.float32:  # Entrada cuantizada (int8 completo)
+                batch = np.clip(np.round(batch / scale + zero_point),
+                                np.iinfo(self._input['dtype']).min,
+                                np.iinfo(self._input['dtype']).max).astype(self._input['dtype'])
+            self.interpreter.set_tensor(self._input['index'], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index'])
+            scale, zero_point = self._output['quantization']
+            if self._output['dtype'] != np.float32:
+                output = (output.astype(np.float32) - zero_point) * scale
+            return output.copy()
+
+# ============================
+# CONVERSIÓN Y CARGA
+# ============================
+
+def calibration_batches(directory=SKIN_CALIBRATION_DIR, samples=SKIN_CALIBRATION_SAMPLES):
+    """Imágenes representativas para la cuantización int8 completa (una por lote)"""
+    from image_preprocessing import InvalidImageError, preprocess_image
+
+    count = 0
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if count >= samples:
+                return
+            try:
+                image = preprocess_image(os.path.join(root, filename))
+            except InvalidImageError:
+                continue
+            count += 1
+            yield [image[np.newaxis]]
+
+def convert_to_tflite(keras_model, output_path, backend):
+    """Convertir el modelo Keras a TFLite (una sola vez; el resultado se guarda en la caché)"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if backend == 'tflite-fp16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif backend == 'tflite-int8':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if SKIN_CALIBRATION_DIR:
+            converter.representative_dataset = lambda: calibration_batches()
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+    content = converter.convert()
+
+    # Escritura atómica: otro worker nunca lee un modelo a medio escribir
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temporary = f"{output_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(temporary, 'wb') as f:
+        f.write(content)
+    os.replace(temporary, output_path)
+    print(f"⚙️ Modelo de piel convertido a {backend}: {output_path} ({len(content) / 1e6:.1f} MB)")
+
+def tflite_path(model_path, backend):
+    """Archivo .tflite en la caché (depende del contenido del .h5 y de la cuantización)"""
+    suffix = backend
+    if backend == 'tflite-int8' and SKIN_CALIBRATION_DIR:
+        suffix += '-full'
+    return cache_path(model_path, f'{suffix}.tflite')
+
+def load_skin_backend(model_path, backend=SKIN_BACKEND):
+    """
+    Backend de inferencia para el modelo .h5. Todos exponen predict(batch, verbose=0).
+    Los TFLite se convierten la primera vez y después se cargan sin cargar el .h5
+    """
+    if backend not in SKIN_BACKENDS:
+        raise ValueError(f"Backend de piel desconocido '{backend}' (disponibles: {', '.join(SKIN_BACKENDS)})")
+
+    if backend.startswith('tflite'):
+        path = tflite_path(model_path, backend)
+        if not os.path.exists(path):
+            from tensorflow.keras.models import load_model
+            convert_to_tflite(load_model(model_path), path, backend)
+        return TFLiteBackend(path, backend)
+
+    from tensorflow.keras.models import load_model
+    model = load_model(model_path)
+    if backend == 'graph':
+        return GraphBackend(model)
+    return KerasBackend(model)
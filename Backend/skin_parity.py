@@ -0,0 +1,150 @@
+# skin_parity.py - Informe de paridad y rendimiento de los backends del modelo de piel
+#
+# Uso:
+#   python skin_parity.py <carpeta_de_imágenes> [--backends graph tflite tflite-fp16 tflite-int8]
+#                         [--limit 500] [--output informe_piel.md]
+#
+# La carpeta de validación usa una subcarpeta por clase con el mismo nombre que en
+# clases.json (p. ej. "2. Melanoma 15.75k/"); así además de la paridad con el modelo
+# Keras original se mide la exactitud de cada backend. Sin subcarpetas solo se mide paridad.
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from image_preprocessing import InvalidImageError, preprocess_image
+from skin_backend import SKIN_BACKENDS, load_skin_backend, tflite_path
+from settings import IMAGES_MODEL_PATH, IMAGES_CLASSES_PATH
+
+def load_images(directory, class_names, limit):
+    """(imágenes preprocesadas N x 224 x 224 x 3, etiqueta por imagen o -1 si no se conoce)"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            paths.append(os.path.join(root, filename))
+    paths.sort()
+    if limit:
+        # Muestra repartida entre todas las clases (las rutas están ordenadas por carpeta)
+        paths = paths[::max(1, len(paths) // limit)][:limit]
+
+    images, labels = [], []
+    for path in paths:
+        try:
+            images.append(preprocess_image(path))
+        except InvalidImageError:
+            continue
+        folder = os.path.basename(os.path.dirname(path))
+        labels.append(class_names.index(folder) if folder in class_names else -1)
+    return np.stack(images), np.array(labels)
+
+def predict_all(backend, images, batch_size=16):
+    """Probabilidades para todas las imágenes, en lotes"""
+    return np.concatenate([np.asarray(backend.predict(images[start:start + batch_size], verbose=0))
+                           for start in range(0, len(images), batch_size)])
+
+def measure_speed(backend, images, repeat=30):
+    """Latencia de una imagen (p50 en ms) y rendimiento con lotes de 16 (imágenes/s)"""
+    single = images[:1]
+    backend.predict(single)  # Calentamiento (trazado del grafo, asignación de tensores)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.predict(single)
+        latencies.append(time.perf_counter() - start)
+
+    batch = images[:16] if len(images) >= 16 else np.repeat(images[:1], 16, axis=0)
+    backend.predict(batch)
+    start = time.perf_counter()
+    for _ in range(max(1, repeat // 5)):
+        backend.predict(batch)
+    elapsed = time.perf_counter() - start
+    return float(np.median(latencies) * 1000), len(batch) * max(1, repeat // 5) / elapsed
+
+def backend_report(name, backend, reference, images, labels):
+    """Métricas de un backend frente a las probabilidades del modelo original"""
+    probabilities = predict_all(backend, images)
+    top1 = probabilities.argmax(axis=1)
+    reference_top1 = reference.argmax(axis=1)
+    labelled = labels >= 0
+    latency_ms, throughput = measure_speed(backend, images)
+
+    model_file = getattr(backend, 'model_path', IMAGES_MODEL_PATH)
+    return {
+        'backend': name,
+        'top1_agreement': float(np.mean(top1 == reference_top1)),
+        'max_abs_diff': float(np.max(np.abs(probabilities - reference))),
+        'mean_abs_diff': float(np.mean(np.abs(probabilities - reference))),
+        'accuracy': float(np.mean(top1[labelled] == labels[labelled])) if labelled.any() else None,
+        'latency_ms': latency_ms,
+        'throughput': throughput,
+        'size_mb': os.path.getsize(model_file) / 1e6
+    }
+
+def format_report(rows, images_count, labelled_count):
+    """Informe en Markdown"""
+    lines = [
+        "# Informe de paridad - modelo de piel",
+        "",
+        f"- Modelo: `{IMAGES_MODEL_PATH}`",
+        f"- Imágenes: {images_count} ({labelled_count} con etiqueta)",
+        f"- Fecha: {time.strftime('%Y-%m-%d %H:%M')}",
+        "",
+        "| Backend | Top-1 igual a Keras | Dif. máx. prob. | Dif. media prob. | Exactitud | Latencia 1 img (ms) | Rendimiento lote 16 (img/s) | Tamaño (MB) |",
+        "|---|---|---|---|---|---|---|---|"
+    ]
+    for row in rows:
+        accuracy = f"{row['accuracy']:.2%}" if row['accuracy'] is not None else "-"
+        lines.append(f"| {row['backend']} | {row['top1_agreement']:.2%} | {row['max_abs_diff']:.4f} | "
+                     f"{row['mean_abs_diff']:.5f} | {accuracy} | {row['latency_ms']:.1f} | "
+                     f"{row['throughput']:.1f} | {row['size_mb']:.1f} |")
+    return "\n".join(lines) + "\n"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paridad y rendimiento de los backends del modelo de piel")
+    parser.add_argument('images', help="carpeta de imágenes de validación (subcarpeta por clase)")
+    parser.add_argument('--backends', nargs='+', default=[b for b in SKIN_BACKENDS if b != 'keras'],
+                        choices=SKIN_BACKENDS)
+    parser.add_argument('--limit', type=int, default=500, help="máximo de imágenes (0 = todas)")
+    parser.add_argument('--output', help="guardar el informe en Markdown (y .json al lado)")
+    args = parser.parse_args(argv)
+
+    # Rutas de settings.py (LIFESCAN_BACKEND_PATH), las mismas que usa el servidor
+    if not os.path.exists(IMAGES_MODEL_PATH):
+        print(f"❌ Modelo de imágenes no encontrado: {IMAGES_MODEL_PATH} (define LIFESCAN_BACKEND_PATH)")
+        return 2
+
+    with open(IMAGES_CLASSES_PATH, 'r') as f:
+        class_names = json.load(f)
+    images, labels = load_images(args.images, class_names, args.limit)
+    print(f"📸 {len(images)} imágenes ({int((labels >= 0).sum())} con etiqueta)")
+
+    reference_backend = load_skin_backend(IMAGES_MODEL_PATH, 'keras')
+    reference = predict_all(reference_backend, images)
+    rows = [backend_report('keras', reference_backend, reference, images, labels)]
+
+    for name in args.backends:
+        if name == 'keras':
+            continue
+        print(f"⚙️ Evaluando {name}...")
+        backend = load_skin_backend(IMAGES_MODEL_PATH, name)
+        rows.append(backend_report(name, backend, reference, images, labels))
+        if name.startswith('tflite'):
+            print(f"   {tflite_path(IMAGES_MODEL_PATH, name)}")
+
+    report = format_report(rows, len(images), int((labels >= 0).sum()))
+    print("\n" + report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+        with open(os.path.splitext(args.output)[0] + '.json', 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+        print(f"💾 Informe guardado en {args.output}")
+
+    # Falla si algún backend cambia la clase predicha en más del 1% de las imágenes
+    worst = min(row['top1_agreement'] for row in rows)
+    return 0 if worst >= 0.99 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
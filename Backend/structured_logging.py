@@ -0,0 +1,229 @@
+# structured_logging.py - Registro estructurado y asíncrono: niveles, id de petición y muestreo por endpoint
+import os
+import re
+import sys
+import time
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueListener
+from flask import request
+
+# DEBUG, INFO, WARNING, ERROR u OFF
+LOG_LEVEL = os.environ.get('LIFESCAN_LOG_LEVEL', 'INFO')
+# 'text' (legible, una línea por registro) o 'json' (un objeto JSON por línea)
+LOG_FORMAT = os.environ.get('LIFESCAN_LOG_FORMAT', 'text')
+# Fracción de peticiones que escriben sus registros DEBUG/INFO (WARNING y superiores siempre se escriben)
+LOG_SAMPLE = float(os.environ.get('LIFESCAN_LOG_SAMPLE', 1.0))
+# Volumen por endpoint: "ruta=nivel[:muestreo],...", p. ej.
+#   LIFESCAN_LOG_ENDPOINTS="/api/predict/stroke=warning,/api/skin/debug=debug,/api/predict/skin=info:0.1"
+LOG_ENDPOINTS = os.environ.get('LIFESCAN_LOG_ENDPOINTS', '')
+# Registros en espera del hilo escritor; si la cola se llena se descartan (la petición nunca espera)
+LOG_QUEUE_SIZE = int(os.environ.get('LIFESCAN_LOG_QUEUE_SIZE', 10000))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_VALID_REQUEST_ID = re.compile(r'[A-Za-z0-9._:-]{1,64}')
+OFF = logging.CRITICAL + 10
+
+# ============================
+# NIVELES POR ENDPOINT
+# ============================
+
+def parse_level(name):
+    """Nivel de logging a partir de su nombre ('off' desactiva el registro)"""
+    name = name.strip().upper()
+    if name == 'OFF':
+        return OFF
+    level = logging.getLevelName(name)
+    if not isinstance(level, int):
+        raise ValueError(f"Nivel de registro desconocido '{name}'")
+    return level
+
+def parse_endpoint_policies(value):
+    """{ruta: (nivel, muestreo)} a partir de LIFESCAN_LOG_ENDPOINTS"""
+    policies = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        endpoint, _, policy = item.partition('=')
+        level, _, sample = policy.partition(':')
+        policies[endpoint.strip()] = (parse_level(level or LOG_LEVEL), float(sample) if sample else LOG_SAMPLE)
+    return policies
+
+DEFAULT_POLICY = (parse_level(LOG_LEVEL), LOG_SAMPLE)
+ENDPOINT_POLICIES = parse_endpoint_policies(LOG_ENDPOINTS)
+
+# ============================
+# REGISTRO
+# ============================
+
+# Por hilo: id, ruta y nivel mínimo de la petición en curso
+_current = threading.local()
+
+class StructuredLogger:
+    """
+    Registro con campos: log.info("✅ Predicción completada", model='stroke', probability=0.12).
+    En el hilo de la petición solo se comprueba el nivel y se encola una tupla; el LogRecord,
+    el formato y la escritura ocurren en el hilo escritor, así que los campos no deben
+    modificarse después de registrarlos
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def _log(self, level, message, fields, exc_info=None):
+        global _dropped
+        if level < getattr(_current, 'level', DEFAULT_POLICY[0]):
+            return
+        if _queue.qsize() >= LOG_QUEUE_SIZE:
+            _dropped += 1  # El escritor no da abasto: se descarta antes que bloquear la petición
+            return
+        _queue.put((time.time(), self.name, level, message, fields, exc_info,
+                    getattr(_current, 'request_id', None), getattr(_current, 'endpoint', None)))
+
+    def debug(self, message, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message, **fields):
+        self._log(logging.ERROR, message, fields)
+
+    def exception(self, message, **fields):
+        """ERROR con el traceback de la excepción en curso (se formatea en el hilo escritor)"""
+        self._log(logging.ERROR, message, fields, sys.exc_info())
+
+def get_logger(name):
+    return StructuredLogger(f'lifescan.{name}')
+
+# ============================
+# FORMATO (HILO ESCRITOR)
+# ============================
+
+class TextFormatter(logging.Formatter):
+    """fecha NIVEL [id de petición] mensaje campo=valor ..."""
+
+    def format(self, record):
+        text = f"{self.formatTime(record)} {record.levelname:7} [{record.request_id or '-'}] {record.getMessage()}"
+        if record.fields:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in record.fields.items())
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con los campos del registro"""
+
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': record.request_id,
+            'endpoint': record.endpoint,
+            'message': record.getMessage(),
+            **record.fields
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class StdoutHandler(logging.StreamHandler):
+    """Escribe en el sys.stdout del momento (como print), aunque se redirija después de crear el handler"""
+
+    stream = property(lambda self: sys.stdout, lambda self, value: None)
+
+class RecordListener(QueueListener):
+    """Hilo escritor: convierte cada tupla encolada en un LogRecord y lo pasa a los handlers"""
+
+    def prepare(self, entry):
+        created, name, level, message, fields, exc_info, request_id, endpoint = entry
+        record = logging.LogRecord(name, level, '(desconocido)', 0, message, (), exc_info)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        record.fields = fields
+        record.request_id = request_id
+        record.endpoint = endpoint
+        return record
+
+# Cola sin límite propio (SimpleQueue, en C): el tamaño máximo se comprueba con qsize()
+_queue = queue.SimpleQueue()
+_listener = None
+_dropped = 0
+
+def start_logging():
+    """
+    (Re)crear la cola y el hilo escritor. Se llama al importar el módulo y en cada worker
+    después de fork(), porque los hilos del proceso maestro no existen en el worker
+    """
+    global _queue, _listener
+    output = StdoutHandler()
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+    _queue = queue.SimpleQueue()
+    _listener = RecordListener(_queue, output)
+    _listener.start()
+
+def stop_logging():
+    """Escribir los registros pendientes y detener el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def logging_status():
+    """Configuración y estado de la cola (para /api/health)"""
+    return {
+        'level': logging.getLevelName(DEFAULT_POLICY[0]) if DEFAULT_POLICY[0] != OFF else 'OFF',
+        'format': LOG_FORMAT,
+        'sample': LOG_SAMPLE,
+        'endpoints': {endpoint: {'level': logging.getLevelName(level) if level != OFF else 'OFF', 'sample': sample}
+                      for endpoint, (level, sample) in ENDPOINT_POLICIES.items()},
+        'pending': _queue.qsize(),
+        'dropped': _dropped
+    }
+
+start_logging()
+atexit.register(stop_logging)
+
+# ============================
+# PETICIONES
+# ============================
+
+def begin_request():
+    """Id de la petición (X-Request-ID del cliente o uno nuevo) y nivel según su endpoint y el muestreo"""
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    level, sample = ENDPOINT_POLICIES.get(endpoint, DEFAULT_POLICY)
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')
+    if not _VALID_REQUEST_ID.fullmatch(request_id):
+        request_id = os.urandom(8).hex()
+    _current.request_id = request_id
+    _current.endpoint = endpoint
+    # El muestreo es por petición: una petición muestreada escribe todos sus registros
+    _current.level = level if sample >= 1 or random.random() < sample else max(level, logging.WARNING)
+
+def end_request():
+    _current.request_id = _current.endpoint = None
+    _current.level = DEFAULT_POLICY[0]
+
+def configure_logging(app):
+    """Asignar un id a cada petición (devuelto en X-Request-ID) y aplicar el nivel de su endpoint"""
+    @app.before_request
+    def logging_begin_request():
+        begin_request()
+
+    @app.after_request
+    def logging_request_id(response):
+        if getattr(_current, 'request_id', None):
+            response.headers[REQUEST_ID_HEADER] = _current.request_id
+        return response
+
+    @app.teardown_request
+    def logging_end_request(error):
+        end_request()
@@ -0,0 +1,512 @@
+# tabular_api.py - Módulo tabular del servidor: predicción de stroke y enfermedad cardíaca
+import os
+import json
+from flask import Blueprint, request, jsonify
+from inference import get_decision_threshold, predict_with_threshold
+from clinical_risk import BatchClinicalRiskAdjuster
+from preprocessing import STROKE_LAYOUT, HEART_LAYOUT, preprocess_batch, to_model_input
+from model_compiler import load_compiled_model
+from model_registry import registry, model_unavailable
+from prediction_cache import TabularPredictionCache
+from report_templates import render_tabular_report, wants_html
+from metrics import count_error, mark
+from structured_logging import get_logger
+from clinical_rules import get_rules, reload_rules, rules_status, start_rules_watcher
+from settings import STROKE_MODEL_PATH, HEART_MODEL_PATH
+
+blueprint = Blueprint('tabular', __name__)
+log = get_logger('tabular')
+
+# ============================
+# CARGAR MODELOS
+# ============================
+
+def load_model_with_fallback(model_path, model_name):
+    """Cargar modelo con manejo robusto de errores"""
+    try:
+        if os.path.exists(model_path):
+            import joblib  # Solo sin caché compilada (importa sklearn al deserializar)
+            model = joblib.load(model_path)
+            print(f"✅ {model_name} cargado")
+            
+            if hasattr(model, 'steps'):
+                steps = [step[0] for step in model.steps]
+                print(f"   🔧 Pasos: {steps}")
+                
+            return model
+        else:
+            print(f"❌ {model_name} no encontrado")
+            return None
+            
+    except Exception as e:
+        print(f"⚠️ Error cargando {model_name}: {str(e)[:100]}...")
+        return None
+
+# Cada modelo se carga en su propio hilo (registry.start() en app.py).
+# Los tabulares salen de la caché compilada si existe (arreglos .npy abiertos con mmap,
+# compartidos entre procesos); si no, se carga el .pkl, se compila (verificado contra
+# predict_proba) y se guarda la caché
+registry.register('stroke', lambda: load_compiled_model(
+    STROKE_MODEL_PATH, STROKE_LAYOUT, "Stroke Model",
+    lambda: load_model_with_fallback(STROKE_MODEL_PATH, "Stroke Model")))
+registry.register('heart', lambda: load_compiled_model(
+    HEART_MODEL_PATH, HEART_LAYOUT, "Heart Model",
+    lambda: load_model_with_fallback(HEART_MODEL_PATH, "Heart Model")))
+
+# Reglas clínicas (compiladas al importar clinical_rules; recarga en segundo plano)
+print(f"⚖️  Reglas clínicas: versión {rules_status()['version']}")
+start_rules_watcher()
+
+# ============================
+# GENERAR ANÁLISIS (VERSIÓN MEJORADA CON HTML)
+# ============================
+
+def generate_analysis(adjustment_result, model_type, input_data, original_prediction, include_html=True):
+    """
+    Generar análisis basado en predicción AJUSTADA - CON FORMATO HTML.
+    Con include_html=False solo el resultado estructurado (sin 'analysis' ni 'analysis_html')
+    """
+    
+    prediction = adjustment_result['prediction']
+    probability = adjustment_result['probability']
+    base_probability = adjustment_result['base_probability']
+    risk_multiplier = adjustment_result['risk_multiplier']
+    clinical_factors = adjustment_result['clinical_factors']
+    
+    # Determinar nivel de riesgo
+    if probability >= 0.7:
+        risk_level = "ALTO"
+        risk_desc = "Riesgo elevado - Se recomienda evaluación médica prioritaria"
+        color = "high"
+        color_gradient = "linear-gradient(135deg, #ef4444, #f87171)"
+        emoji = "🔴"
+    elif probability >= 0.4:
+        risk_level = "MODERADO"
+        risk_desc = "Riesgo intermedio - Se sugiere consulta médica y seguimiento"
+        color = "medium"
+        color_gradient = "linear-gradient(135deg, #f59e0b, #fbbf24)"
+        emoji = "🟡"
+    else:
+        risk_level = "BAJO"
+        risk_desc = "Riesgo bajo - Mantener hábitos saludables y chequeos regulares"
+        color = "low"
+        color_gradient = "linear-gradient(135deg, #10b981, #34d399)"
+        emoji = "🟢"
+    
+    # Información sobre ajuste
+    was_adjusted = abs(probability - base_probability) > 0.05 or prediction != original_prediction
+    
+    condition = "derrame cerebral" if model_type == 'stroke' else "enfermedad cardíaca"
+    model_name = "Derrame Cerebral" if model_type == 'stroke' else "Enfermedad Cardíaca"
+    
+    result = {
+        'prediction': int(prediction),
+        'probability': float(probability),
+        'risk_level': risk_level,
+        'risk_description': risk_desc,
+        'risk_color': color,
+        'color_gradient': color_gradient,
+        'factors': clinical_factors,
+        'was_adjusted': bool(was_adjusted),
+        'base_probability': float(base_probability),
+        'risk_multiplier': float(risk_multiplier),
+        'model_name': model_name,
+        'condition': condition,
+        'emoji': emoji
+    }
+    if include_html:
+        with_report(result)
+    return result
+
+def with_report(result):
+    """
+    Agregar el HTML del análisis (plantilla precompilada, partes fijas en caché por nivel de riesgo).
+    IMPORTANTE: incluye tanto 'analysis' como 'analysis_html' para compatibilidad
+    """
+    analysis_html = render_tabular_report(result)
+    result['analysis'] = analysis_html  # Para compatibilidad con código existente
+    result['analysis_html'] = analysis_html  # Nueva clave con HTML formateado
+    return result
+
+# ============================
+# PREDICCIÓN TABULAR (INDIVIDUAL Y POR LOTES)
+# ============================
+
+# Filas por llamada al modelo y máximo de pacientes por petición
+BATCH_CHUNK_SIZE = int(os.environ.get('LIFESCAN_BATCH_CHUNK_SIZE', 1000))
+BATCH_MAX_RECORDS = int(os.environ.get('LIFESCAN_BATCH_MAX_RECORDS', 50000))
+
+# Resultados memorizados por cuestionario normalizado (muchos cuestionarios se repiten)
+tabular_cache = TabularPredictionCache()
+
+def get_tabular_model(model_type):
+    """Modelo cargado para 'stroke' o 'heart' (None si no está disponible)"""
+    return registry.get(model_type)
+
+def tabular_cache_version(model_type, threshold):
+    """
+    Lo que invalida la caché: el modelo cargado en memoria (no el archivo, que puede cambiar
+    sin que se recargue), la recarga de reglas clínicas y el umbral
+    """
+    return (registry.loaded_at(model_type), rules_status()['loaded_at'], threshold)
+
+def tabular_cache_keys(model_type, records, rows, row_index):
+    """
+    Clave canónica por paciente: la fila normalizada más los valores que usan las reglas
+    clínicas (leen el cuestionario original, p. ej. un 'Sex' ausente no equivale a 'M')
+    """
+    clinical = get_rules(model_type).extract([records[i] for i in row_index])
+    clinical_keys = zip(*(column.tolist() for column in clinical)) if clinical else [()] * len(rows)
+    return list(zip(rows.tolist(), clinical_keys))
+
+def score_tabular_batch(model_type, records, include_html=True):
+    """
+    Predecir una lista de pacientes: preprocesa todo de una vez y llama al modelo
+    (y al ajuste clínico vectorizado) una vez por bloque de BATCH_CHUNK_SIZE filas.
+    Con include_html=False no se genera el HTML del análisis.
+    Devuelve (resultados alineados con records, errores por fila)
+    """
+    model = get_tabular_model(model_type)
+    layout = STROKE_LAYOUT if model_type == 'stroke' else HEART_LAYOUT
+    
+    threshold = get_decision_threshold(model, model_type)
+    rows, row_index, errors = preprocess_batch(records, layout)
+    outcomes = [None] * len(records)
+    mark('preprocess')
+    
+    # Pacientes ya calculados salen de la caché; solo el resto pasa por el modelo
+    if tabular_cache.enabled and len(rows):
+        version = tabular_cache_version(model_type, threshold)
+        keys = tabular_cache_keys(model_type, records, rows, row_index)
+        pending = []
+        for j, cached in enumerate(tabular_cache.lookup(model_type, version, keys)):
+            if cached is None:
+                pending.append(j)
+            elif include_html and 'analysis_html' not in cached[0]:
+                # Calculado antes para una petición ?format=json: se agrega el HTML a una copia
+                outcomes[row_index[j]] = (with_report(dict(cached[0])),) + tuple(cached[1:])
+            else:
+                outcomes[row_index[j]] = cached
+        rows = rows[pending]
+        row_index = [row_index[j] for j in pending]
+        keys = [keys[j] for j in pending]
+        mark('cache')
+    else:
+        keys = None
+    
+    for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+        chunk = to_model_input(model, rows[start:start + BATCH_CHUNK_SIZE])
+        chunk_index = row_index[start:start + BATCH_CHUNK_SIZE]
+        predictions, probabilities = predict_with_threshold(model, chunk, threshold)
+        mark('model')
+        
+        # Aplicar corrección clínica a todo el bloque
+        chunk_records = [records[i] for i in chunk_index]
+        adjustments = BatchClinicalRiskAdjuster.adjust(model_type, chunk_records, predictions, probabilities)
+        mark('clinical')
+        
+        for offset, i in enumerate(chunk_index):
+            original_prediction = int(predictions[offset])
+            adjustment = BatchClinicalRiskAdjuster.to_adjustment(adjustments, offset)
+            result = generate_analysis(adjustment, model_type, records[i], original_prediction, include_html)
+            outcomes[i] = (result, original_prediction, float(probabilities[offset]))
+        mark('html')
+        
+        if keys is not None:
+            tabular_cache.store(model_type, version, keys[start:start + BATCH_CHUNK_SIZE],
+                                [outcomes[i] for i in chunk_index])
+            mark('cache')
+    
+    return outcomes, errors
+
+def build_prediction_response(result, original_prediction, original_probability, include_html=True):
+    """Respuesta de la API para una predicción tabular (sin 'analysis' con ?format=json)"""
+    response = {
+        'success': True,
+        'prediction': result['prediction'],
+        'probability': result['probability'],
+        'risk_level': result['risk_level'],
+        'risk_description': result['risk_description'],
+        'risk_color': result['risk_color'],
+        'factors': result['factors'],
+        'debug_info': {
+            'original_prediction': original_prediction,
+            'original_probability': original_probability,
+            'was_adjusted': result['was_adjusted'],
+            'risk_multiplier': result['risk_multiplier'],
+            'clinical_factors_count': len(result['factors'])
+        }
+    }
+    if include_html:
+        response['analysis'] = result['analysis']
+    return response
+
+def parse_batch_payload():
+    """
+    Leer pacientes de la petición: arreglo JSON, objeto {"patients": [...]} o NDJSON
+    (una línea JSON por paciente). Devuelve (registros, errores de parseo por fila)
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        records, errors = [], []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                errors.append({'index': len(records), 'error': 'Línea NDJSON inválida'})
+                records.append(None)
+        return records, errors
+    
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('patients')
+    if not isinstance(payload, list):
+        return None, []
+    return payload, []
+
+def predict_tabular_batch(model_type):
+    """Lógica común de /api/predict/<modelo>/batch"""
+    records, parse_errors = parse_batch_payload()
+    mark('parse')
+    if not records:
+        return jsonify({'error': 'Se esperaba un arreglo JSON o NDJSON de pacientes'}), 400
+    
+    if len(records) > BATCH_MAX_RECORDS:
+        return jsonify({'error': f'Máximo {BATCH_MAX_RECORDS} pacientes por petición'}), 413
+    
+    if get_tabular_model(model_type) is None:
+        return model_unavailable(model_type)
+    
+    include_html = wants_html()
+    outcomes, errors = score_tabular_batch(model_type, records, include_html)
+    
+    # Los errores de parseo NDJSON reemplazan al genérico de registro inválido
+    parse_failed = {error['index'] for error in parse_errors}
+    errors = parse_errors + [error for error in errors if error['index'] not in parse_failed]
+    errors.sort(key=lambda error: error['index'])
+    
+    results = [
+        build_prediction_response(*outcome, include_html) if outcome is not None else None
+        for outcome in outcomes
+    ]
+    processed = len(records) - len(errors)
+    
+    log.info("📦 Lote procesado", model=model_type, total=len(records), processed=processed, failed=len(errors))
+    
+    return jsonify({
+        'success': True,
+        'model': model_type,
+        'total': len(records),
+        'processed': processed,
+        'failed': len(errors),
+        'results': results,
+        'errors': errors
+    })
+
+# ============================
+# RUTAS API
+# ============================
+
+@blueprint.route('/api/predict/stroke', methods=['POST', 'OPTIONS'])
+def predict_stroke():
+    try:
+        # CORS preflight
+        if request.method == 'OPTIONS':
+            return jsonify({'status': 'ok'}), 200
+        
+        data = request.get_json()
+        mark('parse')
+        if not data:
+            return jsonify({'error': 'No se recibieron datos'}), 400
+            
+        log.debug("📥 Datos recibidos", model='stroke', data=data)
+        
+        if get_tabular_model('stroke') is None:
+            return model_unavailable('stroke')
+        
+        # Predicción como lote de un solo paciente
+        include_html = wants_html()
+        outcomes, errors = score_tabular_batch('stroke', [data], include_html)
+        if errors:
+            log.warning("⚠️ Datos inválidos", model='stroke', error=errors[0]['error'])
+            return jsonify({'error': errors[0]['error']}), 400
+        
+        result, original_prediction, original_probability = outcomes[0]
+        response = build_prediction_response(result, original_prediction, original_probability, include_html)
+        
+        log.info("✅ Predicción completada", model='stroke', original_prediction=original_prediction,
+                 original_probability=round(original_probability, 4), risk_multiplier=result['risk_multiplier'],
+                 probability=round(result['probability'], 4), risk_level=result['risk_level'])
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        count_error(e)
+        log.exception(f"❌ Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@blueprint.route('/api/predict/heart', methods=['POST', 'OPTIONS'])
+def predict_heart():
+    try:
+        if request.method == 'OPTIONS':
+            return jsonify({'status': 'ok'}), 200
+        
+        data = request.get_json()
+        mark('parse')
+        if not data:
+            return jsonify({'error': 'No se recibieron datos'}), 400
+            
+        log.debug("📥 Datos recibidos", model='heart', data=data)
+        
+        if get_tabular_model('heart') is None:
+            return model_unavailable('heart')
+        
+        # Predicción como lote de un solo paciente
+        include_html = wants_html()
+        outcomes, errors = score_tabular_batch('heart', [data], include_html)
+        if errors:
+            log.warning("⚠️ Datos inválidos", model='heart', error=errors[0]['error'])
+            return jsonify({'error': errors[0]['error']}), 400
+        
+        result, original_prediction, original_probability = outcomes[0]
+        response = build_prediction_response(result, original_prediction, original_probability, include_html)
+        
+        log.info("✅ Predicción completada", model='heart', original_prediction=original_prediction,
+                 original_probability=round(original_probability, 4), risk_multiplier=result['risk_multiplier'],
+                 probability=round(result['probability'], 4), risk_level=result['risk_level'])
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        count_error(e)
+        log.exception(f"❌ Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@blueprint.route('/api/predict/stroke/batch', methods=['POST', 'OPTIONS'])
+def predict_stroke_batch():
+    """Predicción de stroke para muchos pacientes en una sola llamada"""
+    try:
+        if request.method == 'OPTIONS':
+            return jsonify({'status': 'ok'}), 200
+        
+        return predict_tabular_batch('stroke')
+        
+    except Exception as e:
+        count_error(e)
+        log.exception(f"❌ Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@blueprint.route('/api/predict/heart/batch', methods=['POST', 'OPTIONS'])
+def predict_heart_batch():
+    """Predicción cardíaca para muchos pacientes en una sola llamada"""
+    try:
+        if request.method == 'OPTIONS':
+            return jsonify({'status': 'ok'}), 200
+        
+        return predict_tabular_batch('heart')
+        
+    except Exception as e:
+        count_error(e)
+        log.exception(f"❌ Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@blueprint.route('/api/rules', methods=['GET'])
+def clinical_rules_info():
+    """Versión de la tabla de reglas clínicas activa"""
+    return jsonify(rules_status())
+
+@blueprint.route('/api/rules/reload', methods=['POST'])
+def clinical_rules_reload():
+    """Recompilar la tabla de reglas clínicas sin reiniciar el servidor"""
+    reloaded = reload_rules(force=True)
+    return jsonify({'reloaded': reloaded, **rules_status()}), (200 if reloaded else 500)
+
+@blueprint.route('/api/test/stroke', methods=['GET'])
+def test_stroke_endpoint():
+    """Prueba con caso de alto riesgo"""
+    test_data = {
+        'gender': 'Female',
+        'age': 67,
+        'hypertension': 1,
+        'heart_disease': 0,
+        'ever_married': 'Yes',
+        'work_type': 'Private',
+        'Residence_type': 'Urban',
+        'avg_glucose_level': 228.69,
+        'bmi': 36.6,
+        'smoking_status': 'formerly smoked'
+    }
+    
+    try:
+        # Simular procesamiento
+        if get_tabular_model('stroke'):
+            outcomes, _ = score_tabular_batch('stroke', [test_data], wants_html())
+            result = outcomes[0][0]
+            
+            return jsonify({
+                'test_case': 'Stroke - Alto riesgo',
+                'input_data': test_data,
+                'result': result
+            })
+        else:
+            return jsonify({'error': 'Modelo no cargado'}), 500
+            
+    except Exception as e:
+        count_error(e)
+        return jsonify({'error': str(e)}), 500
+
+@blueprint.route('/api/test/heart', methods=['GET'])
+def test_heart_endpoint():
+    """Prueba con caso de alto riesgo"""
+    test_data = {
+        'Age': 40,
+        'Sex': 'M',
+        'ChestPainType': 'ATA',
+        'RestingBP': 140,
+        'Cholesterol': 289,
+        'FastingBS': 0,
+        'RestingECG': 'Normal',
+        'MaxHR': 172,
+        'ExerciseAngina': 'N',
+        'Oldpeak': 0.0,
+        'ST_Slope': 'Up',
+        'HeartDisease': 0
+    }
+    
+    try:
+        if get_tabular_model('heart'):
+            outcomes, _ = score_tabular_batch('heart', [test_data], wants_html())
+            result = outcomes[0][0]
+            
+            return jsonify({
+                'test_case': 'Heart - Caso prueba',
+                'input_data': test_data,
+                'result': result
+            })
+        else:
+            return jsonify({'error': 'Modelo no cargado'}), 500
+            
+    except Exception as e:
+        count_error(e)
+        return jsonify({'error': str(e)}), 500
+
+def health():
+    """Estado de los modelos tabulares para /api/health"""
+    stroke_model = get_tabular_model('stroke')
+    heart_model = get_tabular_model('heart')
+    return {
+        'models': {
+            'stroke': stroke_model is not None,
+            'heart': heart_model is not None
+        },
+        'prediction_cache': tabular_cache.stats(),
+        'thresholds': {
+            'stroke': get_decision_threshold(stroke_model, 'stroke'),
+            'heart': get_decision_threshold(heart_model, 'heart')
+        },
+        'compiled': {
+            'stroke': type(stroke_model).__name__ == 'CompiledPipeline',
+            'heart': type(heart_model).__name__ == 'CompiledPipeline'
+        }
+    }
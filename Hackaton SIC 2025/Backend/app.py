@@ -1,5 +1,5 @@
 # app.py - VERSIÓN CORREGIDA (JSON serializable)
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import joblib
@@ -1203,9 +1203,15 @@ load_images_model()
 # ============================
 
 
-from openai import OpenAI
 import json
+import time
+import threading
 from datetime import datetime
+from collections import OrderedDict
+from llm_client import LLMClient, ChatBusyError, ChatDeadlineError, build_openai_client
+from chat_store import CHAT_CACHE_CONVERSATIONS, CHAT_MAX_MESSAGES, open_conversation_store
+from response_cache import RESPONSE_CACHE, ResponseCache
+from faq_engine import load_faq_index
 
 # Cargar configuración
 try:
@@ -1217,21 +1223,44 @@ except ImportError:
     OPENAI_MODEL = "gpt-3.5-turbo"
     OPENAI_BASE_URL = "https://api.openai.com/v1"
 
-# Inicializar cliente OpenAI si hay API Key
+# Inicializar cliente OpenAI si hay API Key. Las llamadas van por LLMClient: pool de
+# conexiones, plazo por mensaje, concurrencia limitada y reintentos
 openai_client = None
+llm_client = None
 if API_KEY:
     try:
-        openai_client = OpenAI(
-            api_key=API_KEY,
-            base_url=OPENAI_BASE_URL
-        )
-        print("✅ Cliente OpenAI inicializado")
+        openai_client = build_openai_client(API_KEY, OPENAI_BASE_URL)
+        llm_client = LLMClient(openai_client, OPENAI_MODEL)
+        print(f"✅ Cliente OpenAI inicializado ({OPENAI_BASE_URL}, plazo {llm_client.timeout:g}s, "
+              f"máx. {llm_client.max_concurrency} consultas simultáneas)")
     except Exception as e:
         print(f"❌ Error inicializando OpenAI: {e}")
         openai_client = None
+        llm_client = None
+
+# Historial de chat: SQLite (WAL, compartido entre workers) con LRU en memoria delante
+# (LIFESCAN_CHAT_STORE=memory|sqlite|tiered)
+chat_store = open_conversation_store()
+print(f"💾 Historial de chat: {chat_store.kind} ({chat_store.counts()['conversations']} conversaciones)")
+
+# Caché de respuestas del LLM para preguntas frecuentes en el primer mensaje de una conversación
+# (LIFESCAN_CHAT_RESPONSE_CACHE=0 la desactiva). Las respuestas del modo demo no se guardan
+response_cache = ResponseCache() if RESPONSE_CACHE and llm_client else None
+if response_cache:
+    print(f"🗂️ Caché de respuestas del chat: {response_cache.max_entries} preguntas, "
+          f"{response_cache.ttl or 0:g}s de validez")
+
+# Modo demo / sin conexión: respuestas del corpus local de preguntas frecuentes (BM25),
+# también cuando el LLM falla o no responde a tiempo
+faq_index = load_faq_index()
+if faq_index:
+    print(f"📚 FAQ local: {len(faq_index.entries)} preguntas frecuentes, "
+          f"{len(faq_index.postings)} términos (índice en {faq_index.build_ms:.1f} ms)")
 
-# Sistema de historial de chat (en memoria, para producción usar DB)
-chat_histories = {}
+# Tiempo hasta el primer byte de la respuesta y tiempo total, por conversación y modo
+# ('stream' = SSE, 'completo' = JSON con la respuesta entera). Solo las conversaciones más recientes
+chat_latency = OrderedDict()
+chat_latency_lock = threading.Lock()
 
 # Prompt de sistema para el asistente médico (MODIFICADO)
 MEDICAL_SYSTEM_PROMPT = """Eres Aila Assistant, un asistente médico IA especializado en salud preventiva. 
@@ -1292,62 +1321,131 @@ Los dolores de cabeza pueden tener muchas causas...
 
 Ahora responde la siguiente consulta:"""
 
+def build_chat_messages(user_message, conversation_id=None):
+    """Mensajes para el LLM: prompt de sistema, historial reciente y consulta actual"""
+    messages = [
+        {"role": "system", "content": MEDICAL_SYSTEM_PROMPT}
+    ]
+    
+    # Agregar historial previo si existe
+    if conversation_id:
+        messages.extend(chat_store.messages(conversation_id, limit=5))  # Últimos 5 mensajes
+    
+    # Agregar mensaje actual del usuario
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+def save_chat_turn(conversation_id, user_message, ai_response):
+    """Guardar la consulta y la respuesta en el historial de la conversación"""
+    if not conversation_id:
+        return
+    
+    # El almacén conserva los últimos CHAT_MAX_MESSAGES mensajes (20)
+    chat_store.append(conversation_id, [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": ai_response}
+    ])
+
+def cached_chat_response(user_message, conversation_id):
+    """Respuesta guardada para una pregunta frecuente, solo en el primer mensaje de la conversación"""
+    if response_cache is None:
+        return None
+    if conversation_id and chat_store.message_count(conversation_id) > 0:
+        # Con mensajes previos la respuesta depende del contexto: siempre se consulta al LLM
+        response_cache.bypass()
+        return None
+    return response_cache.get(user_message)
+
+def cache_chat_response(messages, user_message, ai_response):
+    """Guardar la respuesta del LLM si la consulta no llevaba historial (solo prompt de sistema y pregunta)"""
+    if response_cache is not None and len(messages) == 2:
+        response_cache.put(user_message, ai_response)
+
+def record_chat_latency(conversation_id, mode, first_byte_seconds, total_seconds):
+    """Registrar el tiempo hasta el primer byte y el total de una respuesta"""
+    with chat_latency_lock:
+        stats = chat_latency.setdefault(conversation_id, {}).setdefault(
+            mode, {'messages': 0, 'ttfb_ms': 0.0, 'total_ms': 0.0, 'last_ttfb_ms': 0.0}
+        )
+        chat_latency.move_to_end(conversation_id)
+        while len(chat_latency) > CHAT_CACHE_CONVERSATIONS:
+            chat_latency.popitem(last=False)
+        stats['messages'] += 1
+        stats['ttfb_ms'] += first_byte_seconds * 1000
+        stats['total_ms'] += total_seconds * 1000
+        stats['last_ttfb_ms'] = round(first_byte_seconds * 1000, 1)
+
+def chat_latency_summary(conversation_id=None):
+    """Promedios por modo de una conversación (o de todas si no se indica)"""
+    summary = {}
+    with chat_latency_lock:
+        if conversation_id is not None:
+            conversations = [chat_latency.get(conversation_id, {})]
+        else:
+            conversations = list(chat_latency.values())
+        for modes in conversations:
+            for mode, stats in modes.items():
+                total = summary.setdefault(mode, {'messages': 0, 'ttfb_ms': 0.0, 'total_ms': 0.0})
+                total['messages'] += stats['messages']
+                total['ttfb_ms'] += stats['ttfb_ms']
+                total['total_ms'] += stats['total_ms']
+                if conversation_id is not None:
+                    total['last_ttfb_ms'] = stats['last_ttfb_ms']
+    
+    return {
+        mode: {
+            'messages': total['messages'],
+            'avg_ttfb_ms': round(total['ttfb_ms'] / total['messages'], 1),
+            'avg_total_ms': round(total['total_ms'] / total['messages'], 1),
+            **({'last_ttfb_ms': total['last_ttfb_ms']} if 'last_ttfb_ms' in total else {})
+        }
+        for mode, total in summary.items()
+    }
+
 def get_chat_response(user_message, user_id="default", conversation_id=None):
     """Obtener respuesta de OpenAI para consulta médica"""
     
     # Si no hay API Key o cliente, usar respuestas predefinidas
-    if not openai_client:
+    if not llm_client:
         return get_fallback_response(user_message)
     
     try:
         # Construir historial de conversación
-        messages = [
-            {"role": "system", "content": MEDICAL_SYSTEM_PROMPT}
-        ]
-        
-        # Agregar historial previo si existe
-        if conversation_id and conversation_id in chat_histories:
-            for msg in chat_histories[conversation_id][-5:]:  # Últimos 5 mensajes
-                messages.append(msg)
-        
-        # Agregar mensaje actual del usuario
-        messages.append({"role": "user", "content": user_message})
+        messages = build_chat_messages(user_message, conversation_id)
         
         print(f"🤖 Enviando consulta a OpenAI: {user_message[:50]}...")
         
-        # Llamar a OpenAI API
-        response = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=messages,
+        # Llamar a OpenAI API (como máximo LIFESCAN_LLM_TIMEOUT segundos, reintentos incluidos)
+        ai_response = llm_client.complete(
+            messages,
             temperature=0.7,
             max_tokens=500,
             top_p=0.9
         )
         
-        # Obtener respuesta
-        ai_response = response.choices[0].message.content
-        
-        # Guardar en historial
-        if conversation_id:
-            if conversation_id not in chat_histories:
-                chat_histories[conversation_id] = []
-            
-            chat_histories[conversation_id].append({"role": "user", "content": user_message})
-            chat_histories[conversation_id].append({"role": "assistant", "content": ai_response})
-            
-            # Limitar historial a 20 mensajes
-            if len(chat_histories[conversation_id]) > 20:
-                chat_histories[conversation_id] = chat_histories[conversation_id][-20:]
+        # Guardar en historial (y en la caché si era el primer mensaje)
+        save_chat_turn(conversation_id, user_message, ai_response)
+        cache_chat_response(messages, user_message, ai_response)
         
         print(f"✅ Respuesta recibida: {ai_response[:50]}...")
         return ai_response
         
+    except (ChatBusyError, ChatDeadlineError) as e:
+        print(f"⏱️ {e}: respuesta en modo demo")
+        return get_fallback_response(user_message)
     except Exception as e:
         print(f"❌ Error con OpenAI API: {e}")
         return get_fallback_response(user_message)
 
 def get_fallback_response(user_message):
-    """Respuestas predefinidas cuando OpenAI no está disponible (MODIFICADO)"""
+    """
+    Respuesta cuando OpenAI no está disponible: la pregunta frecuente más relevante del FAQ
+    local o, si ninguna coincide, una de las respuestas generales predefinidas (MODIFICADO)
+    """
+    if faq_index is not None:
+        answer = faq_index.answer(user_message)
+        if answer is not None:
+            return answer
     
     fallback_responses = [
         "🩺 Información General\n\nEntiendo tu consulta sobre salud. Para brindarte la mejor orientación:\n\n📋 Detalles importantes:\n• ¿Podrías darme más detalles sobre tu situación?\n• ¿Qué síntomas específicos estás experimentando?\n• ¿Desde cuándo tienes estos síntomas?\n\n💡 Recuerda: Esta información es educativa. Para diagnóstico y tratamiento, consulta con un profesional médico.\n\n🏥 Tu salud es nuestra prioridad.",
@@ -1363,11 +1461,12 @@ def get_fallback_response(user_message):
 def generate_conversation_html(conversation_id=None):
     """Generar HTML para mostrar historial de conversación"""
     
-    if not conversation_id or conversation_id not in chat_histories:
+    messages = chat_store.messages(conversation_id, limit=10) if conversation_id else []  # Últimos 10 mensajes
+    if not messages:
         return ""
     
     html_parts = []
-    for msg in chat_histories[conversation_id][-10:]:  # Últimos 10 mensajes
+    for msg in messages:
         if msg["role"] == "user":
             html_parts.append(f"""
                 <div class="msg user">
@@ -1388,9 +1487,85 @@ def generate_conversation_html(conversation_id=None):
     
     return "".join(html_parts)
 
+def sse_event(event, data):
+    """Evento server-sent events con datos JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_chat_events(user_message, conversation_id, started, cached_response=None):
+    """
+    Eventos SSE de la respuesta: 'delta' con cada fragmento a medida que llega del LLM y
+    'done' al final. El historial se guarda solo cuando el stream termina completo.
+    Con `cached_response` (pregunta frecuente) se envía la respuesta guardada sin llamar al LLM
+    """
+    parts = []
+    first_byte = None
+    from_llm = llm_client is not None and cached_response is None
+    chunks = None
+    
+    try:
+        if from_llm:
+            print(f"🤖 Enviando consulta a OpenAI (stream): {user_message[:50]}...")
+            messages = build_chat_messages(user_message, conversation_id)
+            chunks = llm_client.stream(
+                messages,
+                temperature=0.7,
+                max_tokens=500,
+                top_p=0.9
+            )
+            for chunk in chunks:
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                parts.append(chunk)
+                yield sse_event('delta', {'delta': chunk})
+    except Exception as e:
+        print(f"❌ Error con OpenAI API (stream): {e}")
+        if parts:
+            # Respuesta incompleta: se avisa al cliente y no se guarda en el historial
+            yield sse_event('error', {'error': str(e)})
+            return
+        from_llm = False
+    finally:
+        if chunks is not None:
+            chunks.close()  # Cliente desconectado: corta también el stream del LLM
+    
+    if from_llm:
+        save_chat_turn(conversation_id, user_message, "".join(parts))
+        cache_chat_response(messages, user_message, "".join(parts))
+    elif cached_response is not None:
+        save_chat_turn(conversation_id, user_message, cached_response)
+        first_byte = time.perf_counter() - started
+        yield sse_event('delta', {'delta': cached_response})
+    else:
+        # Sin LLM (o falló antes del primer fragmento): respuesta del modo demo en un solo evento
+        fallback = get_fallback_response(user_message)
+        first_byte = time.perf_counter() - started
+        yield sse_event('delta', {'delta': fallback})
+    
+    total = time.perf_counter() - started
+    first_byte = total if first_byte is None else first_byte
+    cached = cached_response is not None
+    record_chat_latency(conversation_id, 'cache' if cached else 'stream', first_byte, total)
+    print(f"📥 Stream completado ({'Caché' if cached else 'OpenAI' if from_llm else 'Demo'}): "
+          f"primer byte {first_byte * 1000:.0f} ms, total {total * 1000:.0f} ms")
+    
+    yield sse_event('done', {
+        'success': True,
+        'conversation_id': conversation_id,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M"),
+        'is_openai': from_llm or cached,
+        'cached': cached,
+        'message_count': chat_store.message_count(conversation_id),
+        'ttfb_ms': round(first_byte * 1000, 1),
+        'total_ms': round(total * 1000, 1)
+    })
+
 @app.route('/api/chat/send', methods=['POST', 'OPTIONS'])
 def chat_send():
-    """Endpoint para enviar mensaje al chat"""
+    """
+    Endpoint para enviar mensaje al chat. Con {"stream": true} (o Accept: text/event-stream)
+    la respuesta llega por SSE a medida que el LLM la genera
+    """
+    started = time.perf_counter()
     try:
         print("\n" + "=" * 40)
         print("💬 CHAT - Nuevo mensaje")
@@ -1412,8 +1587,26 @@ def chat_send():
         
         print(f"📤 Usuario: {user_message}")
         
-        # Obtener respuesta de IA
-        ai_response = get_chat_response(user_message, conversation_id=conversation_id)
+        # Pregunta frecuente en el primer mensaje: respuesta guardada, sin llamar al LLM
+        cached_response = cached_chat_response(user_message, conversation_id)
+        
+        # Modo streaming: los fragmentos se envían apenas llegan del LLM
+        if data.get('stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+            return Response(
+                stream_with_context(stream_chat_events(user_message, conversation_id, started, cached_response)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
+        # Obtener respuesta de IA (o de la caché)
+        if cached_response is not None:
+            save_chat_turn(conversation_id, user_message, cached_response)
+            ai_response = cached_response
+        else:
+            ai_response = get_chat_response(user_message, conversation_id=conversation_id)
+        # Sin streaming el primer byte sale con la respuesta completa
+        elapsed = time.perf_counter() - started
+        record_chat_latency(conversation_id, 'cache' if cached_response is not None else 'completo', elapsed, elapsed)
         
         # Guardar timestamp
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
@@ -1424,10 +1617,11 @@ def chat_send():
             'conversation_id': conversation_id,
             'timestamp': timestamp,
             'is_openai': openai_client is not None,
-            'message_count': len(chat_histories.get(conversation_id, [])) if conversation_id in chat_histories else 0
+            'cached': cached_response is not None,
+            'message_count': chat_store.message_count(conversation_id)
         }
         
-        print(f"📥 Respuesta generada ({'OpenAI' if openai_client else 'Demo'})")
+        print(f"📥 Respuesta generada ({'Caché' if cached_response is not None else 'OpenAI' if openai_client else 'Demo'})")
         print("=" * 40)
         
         return jsonify(response_data)
@@ -1443,20 +1637,15 @@ def chat_history():
     """Obtener historial de chat"""
     conversation_id = request.args.get('conversation_id', 'default')
     
-    if conversation_id in chat_histories:
-        return jsonify({
-            'success': True,
-            'conversation_id': conversation_id,
-            'messages': chat_histories[conversation_id][-20:],  # Últimos 20 mensajes
-            'total_messages': len(chat_histories[conversation_id])
-        })
-    else:
-        return jsonify({
-            'success': True,
-            'conversation_id': conversation_id,
-            'messages': [],
-            'total_messages': 0
-        })
+    # Últimos 20 mensajes (lista vacía si la conversación no existe)
+    messages = chat_store.messages(conversation_id, limit=CHAT_MAX_MESSAGES)
+    return jsonify({
+        'success': True,
+        'conversation_id': conversation_id,
+        'messages': messages,
+        'total_messages': len(messages),
+        'latency': chat_latency_summary(conversation_id)
+    })
 
 @app.route('/api/chat/new', methods=['POST'])
 def new_chat():
@@ -1469,7 +1658,7 @@ def new_chat():
         new_id = f"{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         # Inicializar historial vacío
-        chat_histories[new_id] = []
+        chat_store.create(new_id)
         
         return jsonify({
             'success': True,
@@ -1484,12 +1673,19 @@ def new_chat():
 @app.route('/api/chat/status', methods=['GET'])
 def chat_status():
     """Verificar estado del chat"""
+    # Totales mantenidos por el almacén (de todos los workers con SQLite), sin recorrer los historiales
+    counts = chat_store.counts()
     return jsonify({
         'status': 'online',
         'openai_available': openai_client is not None,
         'model': OPENAI_MODEL if openai_client else 'demo',
-        'active_conversations': len(chat_histories),
-        'total_messages': sum(len(msgs) for msgs in chat_histories.values())
+        'llm': llm_client.status() if llm_client else None,
+        'active_conversations': counts['conversations'],
+        'total_messages': counts['messages'],
+        'store': chat_store.status(),
+        'response_cache': response_cache.status() if response_cache else None,
+        'faq': faq_index.status() if faq_index else None,
+        'latency': chat_latency_summary()
     })
 
 # ============================
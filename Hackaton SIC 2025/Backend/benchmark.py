@@ -0,0 +1,193 @@
+# benchmark.py - Mediciones de rendimiento del backend del chat
+# Uso: python benchmark.py [nombre ...]   (sin argumentos ejecuta todos)
+import os
+import sys
+import time
+import json
+
+# Preguntas reales y la entrada del corpus que debe responderlas (None = respuesta general): comprueba
+# los umbrales FAQ_MIN_SCORE / FAQ_MIN_COVERAGE de faq_engine.py y sirve de carga para medir la latencia
+FAQ_QUERIES = [
+    ("¿Qué es la hipertensión?", 'hipertension'),
+    ("cómo bajar la presión", 'hipertension'),
+    ("tengo la presion alta que hago", 'hipertension'),
+    ("tengo la presion baja", 'hipotension'),
+    ("como me tomo la presion en casa", 'presion_medicion'),
+    ("¿Qué es la diabetes?", 'diabetes'),
+    ("qué es la diabetes", 'diabetes'),
+    ("diferencia entre diabetes tipo 1 y tipo 2", 'diabetes'),
+    ("cuales son los sintomas de la diabetes", 'diabetes_sintomas'),
+    ("tengo el azucar alta", 'diabetes'),
+    ("valores normales de glucosa", 'glucosa_valores'),
+    ("¿cómo prevenir la diabetes?", 'diabetes_prevencion'),
+    ("que es el colesterol", 'colesterol'),
+    ("¿qué alimentos ayudan a bajar el colesterol y los triglicéridos?", 'colesterol'),
+    ("¿Qué es un infarto?", 'infarto_sintomas'),
+    ("cuales son los sintomas de un infarto", 'infarto_sintomas'),
+    ("como cuidar mi corazon", 'corazon_prevencion'),
+    ("quiero saber mi riesgo de infarto", 'corazon_prevencion'),
+    ("¿Es normal sentir palpitaciones después del café?", 'palpitaciones'),
+    ("como reconozco un derrame cerebral", 'acv_sintomas'),
+    ("como prevenir un acv", 'acv_prevencion'),
+    ("mi lunar cambio de color", 'cancer_piel'),
+    ("que es el melanoma", 'cancer_piel'),
+    ("que es el carcinoma basocelular", 'carcinoma_basocelular'),
+    ("que protector solar uso", 'proteccion_solar'),
+    ("tengo eczema en los brazos", 'dermatitis'),
+    ("me pica la piel", 'dermatitis'),
+    ("la psoriasis es contagiosa", 'psoriasis'),
+    ("me duele mucho la cabeza", 'dolor_cabeza'),
+    ("tengo fiebre", 'fiebre'),
+    ("diferencia entre gripe y resfriado", 'gripe_resfriado'),
+    ("tengo tos hace semanas", 'tos'),
+    ("que hacer en una crisis de asma", 'asma'),
+    ("como controlar la ansiedad", 'ansiedad'),
+    ("me siento triste todo el tiempo", 'depresion'),
+    ("no puedo dormir", 'sueno'),
+    ("como comer sano", 'alimentacion'),
+    ("cuanta sal puedo comer al dia", 'sal'),
+    ("cuanto ejercicio hacer a la semana", 'ejercicio'),
+    ("cual es mi peso ideal", 'peso_imc'),
+    ("como bajar de peso rapido", 'peso_imc'),
+    ("cuanta agua debo tomar", 'hidratacion'),
+    ("quiero dejar de fumar", 'tabaco'),
+    ("cuanto alcohol es seguro", 'alcohol'),
+    ("que es la anemia", 'anemia'),
+    ("tengo acidez", 'gastritis'),
+    ("me duele la espalda baja", 'dolor_espalda'),
+    ("que vacunas necesito", 'vacunas'),
+    ("me duele el pecho", 'dolor_pecho'),
+    ("me mareo seguido", 'mareo'),
+    ("dolor de pecho al caminar", 'dolor_pecho'),
+    ("dolor de pecho al hacer deporte", 'dolor_pecho'),
+    ("mareo al caminar", 'mareo'),
+    ("que tan confiable es lifescan", 'lifescan'),
+    ("receta de pastel de chocolate", None),
+    ("quien gano el partido de futbol", None),
+    ("precio del dolar hoy", None),
+    ("como arreglar mi carro", None),
+    ("recomiendame una pelicula", None),
+    ("tengo dolor de muelas", None),
+    ("como se llama el presidente", None),
+    ("horario de la farmacia", None),
+    ("cuanto cuesta una consulta", None),
+    ("que hora es", None),
+    ("hola", None)
+]
+
+# Caché de respuestas: (pregunta guardada, pregunta nueva, ¿reutiliza la respuesta con similitud 0
+# (por defecto)?, ¿y con la similitud activada?). Una negación o un calificativo de más o de menos
+# nunca reutiliza la respuesta
+RESPONSE_CACHE_CASES = [
+    ("¿Qué es la hipertensión?", "hipertension que es", True, True),
+    ("¿Cuál es el tratamiento de la presión arterial alta?", "y en general cual es el tratamiento de la presion arterial alta", False, True),
+    ("¿Cuál es el tratamiento de la presión arterial alta?", "¿Cuál es el tratamiento de la presión arterial?", False, False),
+    ("¿Cuál es el tratamiento de la presión arterial alta?", "tratamiento presion arterial alta no", False, False),
+    ("¿Cuál es el tratamiento de la presión arterial alta?", "tratamiento presion arterial alta en niños", False, False),
+    ("¿Cuál es el tratamiento de la presión arterial alta?", "tratamiento presion arterial alta en el embarazo", False, False),
+    ("sintomas de diabetes tipo 2", "diabetes tipo 2 sin sintomas", False, False),
+    ("sintomas de diabetes tipo 2", "sintomas de diabetes", False, False),
+    ("sintomas de diabetes tipo 2", "sintomas de diabetes tipo 1", False, False),
+    ("colesterol alto", "colesterol bajo", False, False),
+    ("puedo tomar ibuprofeno", "nunca puedo tomar ibuprofeno", False, False)
+]
+
+def timeit(func, repeat=200, warmup=10):
+    """Tiempo medio por llamada en microsegundos"""
+    for _ in range(warmup):
+        func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+# ============================
+# FAQ LOCAL: construcción del índice BM25 y latencia de consulta
+# ============================
+
+def bench_faq(repeat=2000):
+    from faq_engine import FAQ_CORPUS_PATH, FAQIndex
+
+    def load_corpus():
+        with open(FAQ_CORPUS_PATH, encoding='utf-8') as f:
+            return json.load(f)
+
+    corpus = load_corpus()
+    questions = [question for question, _ in FAQ_QUERIES]
+
+    # Cada pregunta de la tabla debe llevar a su entrada (o a la respuesta general)
+    index = FAQIndex(corpus)
+    answers = {entry['answer']: entry['id'] for entry in corpus}
+    misses = [(question, expected, answers.get(index.answer(question)))
+              for question, expected in FAQ_QUERIES if answers.get(index.answer(question)) != expected]
+    print(f"\n🎯 FAQ local: {len(FAQ_QUERIES) - len(misses)}/{len(FAQ_QUERIES)} preguntas con la entrada esperada")
+    for question, expected, got in misses:
+        relevance, coverage, topic, entry = (index.search(question, limit=1) or [(0.0, 0.0, False, {'id': None})])[0]
+        print(f"  ❌ {question!r}: esperada {expected}, respondida {got} "
+              f"(mejor {entry['id']}: relevancia {relevance:.2f}, cobertura {coverage:.2f}, tema {topic})")
+
+    # Corpus real y uno 20 veces más grande (entradas repetidas con otro id) para ver cómo escala
+    corpora = {
+        'corpus': corpus,
+        'corpus x20': [dict(entry, id=f"{entry['id']}_{copy}") for copy in range(20) for entry in corpus]
+    }
+    load_us = timeit(load_corpus, 50, 5)
+    print(f"📚 FAQ local (BM25)  -  lectura de {os.path.basename(FAQ_CORPUS_PATH)}: {load_us / 1000:.2f} ms")
+
+    for name, entries in corpora.items():
+        build_ms = timeit(lambda: FAQIndex(entries), 10 if len(entries) < 100 else 3, 1) / 1000
+        index = FAQIndex(entries)
+        print(f"  {name:12} {len(entries):5} entradas, {len(index.postings):5} términos: índice en {build_ms:8.2f} ms")
+
+        samples = []
+        for _ in range(repeat // len(questions)):
+            for query in questions:
+                start = time.perf_counter()
+                index.answer(query)
+                samples.append((time.perf_counter() - start) * 1e6)
+        answered = sum(index.answer(query) is not None for query in questions)
+        print(f"  {'':12} consulta: media {sum(samples) / len(samples):7.1f} µs, p50 {percentile(samples, 0.5):7.1f} µs, "
+              f"p99 {percentile(samples, 0.99):7.1f} µs  ({answered}/{len(questions)} con respuesta del FAQ)")
+
+# ============================
+# CACHÉ DE RESPUESTAS: qué preguntas reutilizan una respuesta guardada
+# ============================
+
+def bench_response_cache(repeat=2000):
+    from response_cache import ResponseCache
+
+    print("\n🗂️ Caché de respuestas")
+    for similarity, column in ((0, 0), (0.8, 1)):
+        errors = []
+        for cached, asked, *expected in RESPONSE_CACHE_CASES:
+            cache = ResponseCache(similarity=similarity)
+            cache.put(cached, 'respuesta')
+            if (cache.get(asked) is not None) != expected[column]:
+                errors.append((cached, asked, expected[column]))
+        print(f"  similitud {similarity}: {len(RESPONSE_CACHE_CASES) - len(errors)}/{len(RESPONSE_CACHE_CASES)} casos correctos")
+        for cached, asked, hit in errors:
+            print(f"  ❌ {asked!r} tras guardar {cached!r}: {'debía' if hit else 'no debía'} reutilizar la respuesta")
+
+    cache = ResponseCache(similarity=0.8)
+    for cached, *_ in RESPONSE_CACHE_CASES:
+        cache.put(cached, 'respuesta')
+    questions = [asked for _, asked, *_ in RESPONSE_CACHE_CASES]
+    lookup_us = timeit(lambda: [cache.get(question) for question in questions], repeat // len(questions), 10) / len(questions)
+    print(f"  consulta (con similitud): {lookup_us:.1f} µs")
+
+BENCHMARKS = {
+    'faq': bench_faq,
+    'cache': bench_response_cache
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Benchmark desconocido: {name} (disponibles: {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
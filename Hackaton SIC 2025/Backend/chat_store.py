@@ -0,0 +1,386 @@
+# chat_store.py - Historial de conversaciones del chat: LRU en memoria (con TTL) y SQLite (WAL)
+# compartido entre workers
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# 'tiered' = SQLite + LRU en memoria delante, 'sqlite' = solo SQLite, 'memory' = solo memoria
+# (no se comparte entre workers y se pierde al reiniciar)
+CHAT_STORE = os.environ.get('LIFESCAN_CHAT_STORE', 'tiered')
+CHAT_DB_PATH = os.environ.get('LIFESCAN_CHAT_DB',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat_history.db'))
+# Mensajes guardados por conversación (los más recientes)
+CHAT_MAX_MESSAGES = int(os.environ.get('LIFESCAN_CHAT_MAX_MESSAGES', 20))
+# Nivel en memoria: conversaciones, presupuesto aproximado y segundos sin uso antes de caducar
+CHAT_CACHE_CONVERSATIONS = int(os.environ.get('LIFESCAN_CHAT_CACHE_CONVERSATIONS', 1000))
+CHAT_CACHE_MAX_MB = float(os.environ.get('LIFESCAN_CHAT_CACHE_MAX_MB', 16))
+CHAT_CACHE_TTL = float(os.environ.get('LIFESCAN_CHAT_CACHE_TTL', 3600))
+# Días sin actividad antes de borrar una conversación de SQLite (0 = nunca)
+CHAT_RETENTION_DAYS = float(os.environ.get('LIFESCAN_CHAT_RETENTION_DAYS', 30))
+
+def message_size(message):
+    """Tamaño aproximado de un mensaje en memoria (bytes)"""
+    return len(message['content']) + len(message['role']) + 64
+
+# ============================
+# NIVEL EN MEMORIA (LRU + TTL)
+# ============================
+
+class MemoryConversationStore:
+    """
+    Conversaciones en memoria con límite de conversaciones, presupuesto de bytes y caducidad
+    por inactividad; al superar un límite se expulsa la conversación usada hace más tiempo.
+    Los totales se mantienen en cada cambio. Seguro entre hilos
+    """
+
+    kind = 'memory'
+
+    def __init__(self, max_conversations=CHAT_CACHE_CONVERSATIONS, max_bytes=int(CHAT_CACHE_MAX_MB * 1024 * 1024),
+                 ttl=CHAT_CACHE_TTL, max_messages=CHAT_MAX_MESSAGES):
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.max_messages = max_messages
+        self._entries = OrderedDict()  # id -> [mensajes, bytes, último uso, versión]
+        self._bytes = 0
+        self._messages = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _entry(self, conversation_id):
+        """Entrada vigente (marcada como recién usada) o None. Con el lock tomado"""
+        entry = self._entries.get(conversation_id)
+        if entry is not None and self.ttl is not None and time.time() - entry[2] > self.ttl:
+            self._remove(conversation_id)
+            self.expirations += 1
+            entry = None
+        if entry is not None:
+            entry[2] = time.time()
+            self._entries.move_to_end(conversation_id)
+        return entry
+
+    def _remove(self, conversation_id):
+        messages, size, _, _ = self._entries.pop(conversation_id)
+        self._bytes -= size
+        self._messages -= len(messages)
+
+    def _evict(self):
+        while len(self._entries) > self.max_conversations or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _store(self, conversation_id, messages, version):
+        if conversation_id in self._entries:
+            self._remove(conversation_id)
+        messages = messages[-self.max_messages:]
+        size = sum(message_size(message) for message in messages)
+        self._entries[conversation_id] = [messages, size, time.time(), version]
+        self._bytes += size
+        self._messages += len(messages)
+        self._evict()
+
+    # --- Como caché delante de SQLite (con la versión de la conversación) ---
+
+    def cached(self, conversation_id, version):
+        """Mensajes guardados si están en la versión indicada, si no None (cuenta acierto/fallo)"""
+        with self._lock:
+            entry = self._entry(conversation_id)
+            if entry is None or entry[3] != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, conversation_id, messages, version=0):
+        with self._lock:
+            self._store(conversation_id, list(messages), version)
+
+    def discard(self, conversation_id):
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+
+    # --- Interfaz del almacén ---
+
+    def create(self, conversation_id):
+        with self._lock:
+            if self._entry(conversation_id) is None:
+                self._store(conversation_id, [], 0)
+
+    def exists(self, conversation_id):
+        with self._lock:
+            return self._entry(conversation_id) is not None
+
+    def messages(self, conversation_id, limit=None):
+        """Últimos `limit` mensajes (copia), lista vacía si la conversación no existe"""
+        with self._lock:
+            entry = self._entry(conversation_id)
+            if entry is None:
+                return []
+            return entry[0][-limit:] if limit else list(entry[0])
+
+    def message_count(self, conversation_id):
+        with self._lock:
+            entry = self._entry(conversation_id)
+            return len(entry[0]) if entry is not None else 0
+
+    def append(self, conversation_id, new_messages):
+        """Agregar mensajes (crea la conversación si no existe) y conservar los más recientes"""
+        with self._lock:
+            entry = self._entry(conversation_id)
+            messages = (entry[0] if entry is not None else []) + list(new_messages)
+            self._store(conversation_id, messages, (entry[3] if entry is not None else 0) + 1)
+
+    def counts(self):
+        return {'conversations': len(self._entries), 'messages': self._messages}
+
+    def stats(self):
+        """Métricas del nivel en memoria"""
+        lookups = self.hits + self.misses
+        return {
+            'conversations': len(self._entries),
+            'max_conversations': self.max_conversations,
+            'messages': self._messages,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def status(self):
+        return {'backend': self.kind, **self.counts(), 'memory': self.stats()}
+
+# ============================
+# NIVEL DURABLE (SQLITE WAL)
+# ============================
+
+# Los totales los mantienen los triggers: consultarlos no recorre las conversaciones
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS conversations_by_updated ON conversations (updated);
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages (conversation_id, seq);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO counters VALUES ('conversations', 0), ('messages', 0);
+
+CREATE TRIGGER IF NOT EXISTS conversation_added AFTER INSERT ON conversations BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'conversations';
+END;
+CREATE TRIGGER IF NOT EXISTS conversation_removed AFTER DELETE ON conversations BEGIN
+    DELETE FROM messages WHERE conversation_id = OLD.id;
+    UPDATE counters SET value = value - 1 WHERE name = 'conversations';
+END;
+CREATE TRIGGER IF NOT EXISTS message_added AFTER INSERT ON messages BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'messages';
+    UPDATE conversations SET message_count = message_count + 1 WHERE id = NEW.conversation_id;
+END;
+CREATE TRIGGER IF NOT EXISTS message_removed AFTER DELETE ON messages BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'messages';
+    UPDATE conversations SET message_count = message_count - 1 WHERE id = OLD.conversation_id;
+END;
+"""
+
+# Segundos entre limpiezas de conversaciones antiguas (en cada proceso)
+PRUNE_INTERVAL = 600
+
+class SQLiteConversationStore:
+    """
+    Conversaciones en SQLite en modo WAL: todos los workers leen y escriben la misma base
+    (lectores concurrentes, un escritor a la vez). Una conexión por hilo y proceso
+    """
+
+    kind = 'sqlite'
+
+    def __init__(self, path=CHAT_DB_PATH, max_messages=CHAT_MAX_MESSAGES, retention_days=CHAT_RETENTION_DAYS):
+        self.path = path
+        self.max_messages = max_messages
+        self.retention = retention_days * 86400 if retention_days and retention_days > 0 else None
+        self._local = threading.local()
+        self._last_prune = 0.0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self):
+        """Conexión del hilo actual (nueva después de fork(): no se comparten entre procesos)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _write(self, statements):
+        """Ejecutar statements(connection) en una transacción de escritura"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(connection)
+            connection.execute("COMMIT")
+            return result
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def create(self, conversation_id):
+        now = time.time()
+        self._write(lambda db: db.execute(
+            "INSERT OR IGNORE INTO conversations (id, created, updated) VALUES (?, ?, ?)",
+            (conversation_id, now, now)
+        ))
+        self._prune()
+
+    def version(self, conversation_id):
+        """Versión de la conversación (aumenta con cada cambio) o None si no existe"""
+        row = self._connection().execute(
+            "SELECT version FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def exists(self, conversation_id):
+        return self.version(conversation_id) is not None
+
+    def messages(self, conversation_id, limit=None):
+        """Últimos `limit` mensajes en orden, lista vacía si la conversación no existe"""
+        rows = self._connection().execute(
+            "SELECT role, content FROM (SELECT seq, role, content FROM messages WHERE conversation_id = ? "
+            "ORDER BY seq DESC LIMIT ?) ORDER BY seq",
+            (conversation_id, limit or self.max_messages)
+        ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def message_count(self, conversation_id):
+        row = self._connection().execute(
+            "SELECT message_count FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def append(self, conversation_id, new_messages):
+        """Agregar mensajes y borrar los que excedan el máximo; devuelve la nueva versión"""
+        now = time.time()
+
+        def statements(db):
+            db.execute(
+                "INSERT INTO conversations (id, created, updated, version) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (id) DO UPDATE SET updated = excluded.updated, version = version + 1",
+                (conversation_id, now, now)
+            )
+            db.executemany(
+                "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
+                [(conversation_id, message['role'], message['content']) for message in new_messages]
+            )
+            db.execute(
+                "DELETE FROM messages WHERE conversation_id = ? AND seq <= (SELECT seq FROM messages "
+                "WHERE conversation_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                (conversation_id, conversation_id, self.max_messages)
+            )
+            return db.execute("SELECT version FROM conversations WHERE id = ?", (conversation_id,)).fetchone()[0]
+
+        version = self._write(statements)
+        self._prune()
+        return version
+
+    def _prune(self):
+        """Borrar las conversaciones sin actividad más allá de la retención (como mucho cada PRUNE_INTERVAL)"""
+        if self.retention is None or time.time() - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = time.time()
+        removed = self._write(lambda db: db.execute(
+            "DELETE FROM conversations WHERE updated < ?", (time.time() - self.retention,)
+        ).rowcount)
+        if removed:
+            print(f"🧹 Chat: {removed} conversaciones antiguas borradas")
+
+    def counts(self):
+        """Totales de todos los workers (mantenidos por triggers)"""
+        return dict(self._connection().execute("SELECT name, value FROM counters").fetchall())
+
+    def status(self):
+        return {'backend': self.kind, **self.counts(), 'path': self.path}
+
+# ============================
+# SQLITE CON CACHÉ EN MEMORIA
+# ============================
+
+class TieredConversationStore:
+    """
+    SQLite es la fuente de verdad; la conversación completa se guarda además en el LRU en memoria
+    junto con su versión. Cada lectura solo consulta la versión en SQLite (búsqueda por clave
+    primaria): si otro worker cambió la conversación, se vuelve a cargar
+    """
+
+    kind = 'tiered'
+
+    def __init__(self, durable, cache):
+        self.durable = durable
+        self.cache = cache
+
+    def create(self, conversation_id):
+        self.durable.create(conversation_id)
+
+    def exists(self, conversation_id):
+        return self.durable.exists(conversation_id)
+
+    def messages(self, conversation_id, limit=None):
+        version = self.durable.version(conversation_id)
+        if version is None:
+            self.cache.discard(conversation_id)
+            return []
+        messages = self.cache.cached(conversation_id, version)
+        if messages is None:
+            messages = self.durable.messages(conversation_id)
+            self.cache.put(conversation_id, messages, version)
+        return messages[-limit:] if limit else list(messages)
+
+    def message_count(self, conversation_id):
+        return self.durable.message_count(conversation_id)
+
+    def append(self, conversation_id, new_messages):
+        version = self.durable.append(conversation_id, new_messages)
+        # Si la copia en memoria era la versión anterior basta con agregarle los mensajes
+        cached = self.cache.cached(conversation_id, version - 1)
+        if cached is not None:
+            self.cache.put(conversation_id, cached + list(new_messages), version)
+        else:
+            self.cache.discard(conversation_id)
+        return version
+
+    def counts(self):
+        return self.durable.counts()
+
+    def status(self):
+        return {'backend': self.kind, **self.counts(), 'path': self.durable.path, 'memory': self.cache.stats()}
+
+def open_conversation_store(kind=CHAT_STORE, path=CHAT_DB_PATH):
+    """Almacén configurado; si SQLite no se puede abrir se usa solo memoria"""
+    if kind not in ('memory', 'sqlite', 'tiered'):
+        print(f"⚠️ LIFESCAN_CHAT_STORE desconocido '{kind}': se usa 'tiered'")
+        kind = 'tiered'
+    if kind != 'memory':
+        try:
+            durable = SQLiteConversationStore(path)
+            return durable if kind == 'sqlite' else TieredConversationStore(durable, MemoryConversationStore())
+        except sqlite3.Error as e:
+            print(f"⚠️ No se pudo abrir el historial en {path} ({e}): se usa solo memoria")
+    return MemoryConversationStore()
@@ -24,10 +24,11 @@ def load_api_key():
         print(f"❌ Error cargando API Key: {e}")
         return None
 
-# Configuración global
-API_KEY = load_api_key()
-OPENAI_MODEL = "gpt-3.5-turbo"
-OPENAI_BASE_URL = "https://api.openai.com/v1"
+# Configuración global (las variables de entorno tienen prioridad: con OPENAI_BASE_URL
+# el chat se puede probar contra un servidor local compatible, ver llm_stub.py)
+API_KEY = os.environ.get('OPENAI_API_KEY') or load_api_key()
+OPENAI_MODEL = os.environ.get('OPENAI_MODEL', "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL', "https://api.openai.com/v1")
 
 # Verificar API Key
 if not API_KEY:
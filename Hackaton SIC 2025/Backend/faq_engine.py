@@ -0,0 +1,196 @@
+# faq_engine.py - Respuestas del chat sin LLM (modo demo / sin conexión): búsqueda BM25 sobre un
+# corpus local de preguntas frecuentes de salud (faq_corpus.json)
+import os
+import json
+import heapq
+import math
+import time
+import threading
+from response_cache import STOPWORDS, normalize_question
+
+FAQ_CORPUS_PATH = os.environ.get('LIFESCAN_FAQ_CORPUS',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'faq_corpus.json'))
+# Relevancia mínima de la mejor entrada (puntaje BM25 dividido por el máximo que puede sumar la
+# pregunta, 0-1) y fracción mínima de la pregunta (ponderada por IDF) que debe aparecer en ella;
+# además la entrada debe compartir un término de sus palabras clave con la pregunta (o tener una
+# pregunta idéntica). Si no, se usa una respuesta general. Calibrados con FAQ_QUERIES de benchmark.py
+FAQ_MIN_SCORE = float(os.environ.get('LIFESCAN_FAQ_MIN_SCORE', 0.25))
+FAQ_MIN_COVERAGE = float(os.environ.get('LIFESCAN_FAQ_MIN_COVERAGE', 0.3))
+
+# Además de las palabras vacías de la caché de respuestas: verbos y adverbios muy comunes en las
+# consultas que no indican el tema ("tengo", "qué hago", "me siento muy...")
+FAQ_STOPWORDS = STOPWORDS | frozenset("""
+tengo tiene tienes hago hace hacer debo deberia mucho mucha muy siento sentir estoy esta cuando hay pasa
+""".split())
+
+# Parámetros BM25 y peso de cada campo de la entrada (las palabras clave y las preguntas
+# describen mejor el tema que el texto de la respuesta)
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_WEIGHTS = (('keywords', 3), ('questions', 2), ('answer', 1))
+# Entradas de urgencias: si la consulta contiene una de sus palabras clave van primero aunque otra
+# entrada sume más ("dolor de pecho al hacer deporte" no es una pregunta sobre ejercicio), salvo que
+# otra entrada tenga una palabra clave más específica que la incluya ("prevenir infarto")
+EMERGENCY_ENTRIES = ('dolor_pecho', 'infarto_sintomas', 'acv_sintomas')
+
+# ============================
+# TÉRMINOS
+# ============================
+
+def stem(word):
+    """Raíz aproximada: sin plural ni vocal final ("síntomas" y "síntoma" -> "sintom")"""
+    for suffix in ('aciones', 'acion', 'es', 's'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if word[-1] in 'aeo' and len(word) > 3:
+        word = word[:-1]
+    return word
+
+def tokenize(text):
+    """Raíces de las palabras del texto sin tildes ni palabras vacías"""
+    return [stem(word) for word in normalize_question(text).split() if word not in FAQ_STOPWORDS]
+
+def question_terms(text):
+    """Raíces de la pregunta sin repetir ni orden: "¿Qué es la diabetes?" y "diabetes, qué es" coinciden"""
+    return frozenset(tokenize(text))
+
+# ============================
+# ÍNDICE BM25
+# ============================
+
+class FAQIndex:
+    """
+    Índice invertido término -> [(entrada, peso)] con los pesos BM25 calculados al construirlo:
+    una consulta solo suma los pesos de sus términos. Una consulta con los mismos términos que una
+    de las preguntas de una entrada va directo a esa entrada, y una que contiene una palabra clave de
+    una entrada de urgencias (EMERGENCY_ENTRIES) la pone primero. Seguro entre hilos (el índice no cambia)
+    """
+
+    def __init__(self, entries, k1=BM25_K1, b=BM25_B):
+        start = time.perf_counter()
+        self.entries = entries
+        self.k1 = k1
+        # Términos de cada pregunta del corpus -> entrada (si dos entradas comparten pregunta, la primera)
+        # y términos de las palabras clave de cada entrada (el tema: "hora" aparece en la respuesta
+        # sobre el sueño, pero "¿qué hora es?" no trata de dormir)
+        self.questions = {}
+        for position, entry in enumerate(entries):
+            for question in entry.get('questions', ()):
+                self.questions.setdefault(question_terms(question), position)
+        self.topics = [question_terms(' '.join(entry.get('keywords', ()))) for entry in entries]
+        # Palabras clave (sus términos) de cada entrada, indexadas por uno de sus términos
+        self.keywords = {}
+        for position, entry in enumerate(entries):
+            for keyword in entry.get('keywords', ()):
+                terms = question_terms(keyword)
+                if terms:
+                    self.keywords.setdefault(min(terms), []).append((position, terms))
+        self.emergency = frozenset(position for position, entry in enumerate(entries)
+                                   if entry.get('id') in EMERGENCY_ENTRIES)
+        frequencies = []
+        for entry in entries:
+            counts = {}
+            for field, weight in FIELD_WEIGHTS:
+                values = entry.get(field, '')
+                text = ' '.join(values) if isinstance(values, list) else values
+                for term in tokenize(text):
+                    counts[term] = counts.get(term, 0) + weight
+            frequencies.append(counts)
+
+        total = len(entries)
+        lengths = [sum(counts.values()) for counts in frequencies]
+        average_length = sum(lengths) / total if total else 1.0
+        document_frequency = {}
+        for counts in frequencies:
+            for term in counts:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        self.idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+        # Un término que no aparece en el corpus cuenta en contra de la cobertura como uno
+        # que aparece en una sola entrada
+        self.unknown_idf = math.log(1 + (total - 0.5) / 1.5)
+        self.postings = {}
+        for position, (counts, length) in enumerate(zip(frequencies, lengths)):
+            norm = k1 * (1 - b + b * length / average_length)
+            for term, tf in counts.items():
+                weight = self.idf[term] * tf * (k1 + 1) / (tf + norm)
+                self.postings.setdefault(term, []).append((position, weight))
+
+        self.build_ms = (time.perf_counter() - start) * 1000
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.answered = 0
+
+    def search(self, query, limit=3):
+        """
+        [(relevancia, cobertura, tema, entrada)] de las entradas con algún término de la consulta, de
+        mejor a peor (tema: comparte una palabra clave o una pregunta idéntica). La relevancia es el puntaje BM25 dividido por el máximo que pueden sumar los términos
+        de la consulta (idf * (k1 + 1) cada uno): no depende de lo común que sea el tema, así que
+        "¿Qué es la diabetes?" (un solo término frecuente) se compara con el mismo umbral que una
+        pregunta larga. Una pregunta del corpus con los mismos términos tiene relevancia 1. Las
+        entradas de urgencias con una palabra clave en la consulta van antes que el resto
+        """
+        terms = question_terms(query)
+        if not terms:
+            return []
+        scores = {}
+        matched = {}
+        query_idf = 0.0
+        for term in terms:
+            idf = self.idf.get(term, self.unknown_idf)
+            query_idf += idf
+            for position, weight in self.postings.get(term, ()):
+                scores[position] = scores.get(position, 0.0) + weight
+                matched[position] = matched.get(position, 0.0) + idf
+
+        max_score = query_idf * (self.k1 + 1)
+        exact = self.questions.get(terms)
+        if exact is not None:
+            scores[exact] = max_score
+        urgent = self._urgent(terms)
+        if urgent:
+            best = heapq.nlargest(limit, scores, key=lambda position: (position in urgent, scores[position]))
+        else:
+            best = heapq.nlargest(limit, scores, key=scores.get)
+        return [(scores[position] / max_score, matched[position] / query_idf,
+                 position == exact or not terms.isdisjoint(self.topics[position]), self.entries[position])
+                for position in best]
+
+    def _urgent(self, terms):
+        """Entradas de urgencias con una palabra clave en la consulta que ninguna otra entrada precisa"""
+        found = [(position, keyword) for term in terms for position, keyword in self.keywords.get(term, ())
+                 if keyword <= terms]
+        return {position for position, keyword in found if position in self.emergency
+                and not any(other != position and keyword < more for other, more in found)}
+
+    def answer(self, query):
+        """Respuesta de la entrada más relevante, o None si ninguna coincide lo suficiente"""
+        results = self.search(query, limit=1)
+        found = bool(results) and results[0][0] >= FAQ_MIN_SCORE and results[0][1] >= FAQ_MIN_COVERAGE \
+            and results[0][2]
+        with self._lock:
+            self.queries += 1
+            self.answered += found
+        return results[0][3]['answer'] if found else None
+
+    def status(self):
+        """Tamaño del índice y consultas respondidas (para /api/chat/status)"""
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'terms': len(self.postings),
+                'build_ms': round(self.build_ms, 2),
+                'queries': self.queries,
+                'answered': self.answered,
+                'unmatched': self.queries - self.answered
+            }
+
+def load_faq_index(path=FAQ_CORPUS_PATH):
+    """Índice del corpus de preguntas frecuentes, o None si no se puede leer (se usan respuestas generales)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return FAQIndex(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ FAQ local no disponible ({path}): {e}")
+        return None
@@ -0,0 +1,247 @@
+# llm_client.py - Cliente del LLM para el chat: conexiones reutilizadas, plazo por mensaje,
+# concurrencia limitada y reintentos con espera exponencial
+import os
+import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# ============================
+# CONFIGURACIÓN
+# ============================
+
+# Plazo total por mensaje en segundos (incluye reintentos): después se responde con el modo demo
+LLM_TIMEOUT = float(os.environ.get('LIFESCAN_LLM_TIMEOUT', 20))
+LLM_CONNECT_TIMEOUT = float(os.environ.get('LIFESCAN_LLM_CONNECT_TIMEOUT', 3))
+# Llamadas simultáneas al LLM (hilos y conexiones del pool). El resto de los hilos del
+# servidor nunca queda esperando al LLM: siguen libres para /api/predict/*
+LLM_MAX_CONCURRENCY = int(os.environ.get('LIFESCAN_LLM_MAX_CONCURRENCY', 4))
+# Segundos que un mensaje espera un hueco libre antes de responder con el modo demo
+LLM_QUEUE_TIMEOUT = float(os.environ.get('LIFESCAN_LLM_QUEUE_TIMEOUT', 1))
+LLM_RETRIES = int(os.environ.get('LIFESCAN_LLM_RETRIES', 2))
+# Espera base entre reintentos (se duplica en cada intento, con jitter)
+LLM_BACKOFF = float(os.environ.get('LIFESCAN_LLM_BACKOFF', 0.5))
+# Streaming: el primer fragmento llega dentro de LLM_TIMEOUT; después, segundos máximos
+# entre fragmentos y para la respuesta completa
+LLM_STREAM_IDLE_TIMEOUT = float(os.environ.get('LIFESCAN_LLM_STREAM_IDLE_TIMEOUT', 10))
+LLM_STREAM_TIMEOUT = float(os.environ.get('LIFESCAN_LLM_STREAM_TIMEOUT', 60))
+
+# Códigos HTTP que vale la pena reintentar
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class ChatBusyError(Exception):
+    """Todas las llamadas al LLM están ocupadas"""
+
+class ChatDeadlineError(Exception):
+    """El LLM no respondió dentro del plazo del mensaje"""
+
+# ============================
+# CLIENTE OPENAI
+# ============================
+
+def build_openai_client(api_key, base_url):
+    """
+    Cliente OpenAI con un pool de conexiones del tamaño de la concurrencia (keep-alive entre
+    mensajes) y sin los reintentos internos del SDK: los reintentos respetan el plazo en LLMClient
+    """
+    import httpx
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=0,
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        http_client=httpx.Client(limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY,
+                                                     max_keepalive_connections=LLM_MAX_CONCURRENCY))
+    )
+
+def is_retryable(error):
+    """Errores transitorios: conexión, timeout, 429 y 5xx"""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    try:
+        from openai import APIConnectionError
+    except ImportError:
+        return isinstance(error, (ConnectionError, TimeoutError))
+    return isinstance(error, (APIConnectionError, ConnectionError, TimeoutError))
+
+def retry_delay(error, attempt):
+    """Retry-After del servidor si lo envía; si no, espera exponencial con jitter"""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return LLM_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+# ============================
+# LLAMADAS CON PLAZO
+# ============================
+
+class LLMClient:
+    """
+    Ejecuta las llamadas al LLM en un pool propio de hilos. El hilo de la petición espera
+    como máximo el plazo del mensaje; si el pool está lleno o el plazo se agota se lanza
+    ChatBusyError / ChatDeadlineError y el chat responde en modo demo
+    """
+
+    def __init__(self, client, model, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 retries=LLM_RETRIES, queue_timeout=LLM_QUEUE_TIMEOUT):
+        self.client = client
+        self.model = model
+        self.timeout = timeout
+        self.retries = retries
+        self.queue_timeout = queue_timeout
+        self.max_concurrency = max_concurrency
+        # El hueco se libera cuando termina la llamada (no cuando la petición deja de esperarla)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix='llm')
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'completed': 0, 'retries': 0, 'timeouts': 0, 'rejected': 0, 'errors': 0,
+                       'cancelled': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _submit(self, function, *args):
+        """Ejecutar `function` en el pool si hay un hueco libre (ChatBusyError si no)"""
+        if not self._slots.acquire(timeout=min(self.queue_timeout, self.timeout)):
+            self._count('rejected')
+            raise ChatBusyError(f"{self.max_concurrency} consultas al LLM en curso")
+        self._count('calls')
+        try:
+            future = self._executor.submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _retry_delay(self, error, attempt, deadline):
+        """Segundos antes del siguiente intento, o None si no se reintenta"""
+        if not is_retryable(error) or attempt >= self.retries:
+            return None
+        delay = retry_delay(error, attempt)
+        return delay if time.monotonic() + delay < deadline else None
+
+    def complete(self, messages, **params):
+        """Texto de la respuesta del LLM para `messages` (parámetros extra: temperature, max_tokens...)"""
+        deadline = time.monotonic() + self.timeout
+        future = self._submit(self._call_with_retries, messages, params, deadline)
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self._count('timeouts')
+            raise ChatDeadlineError(f"Sin respuesta del LLM en {self.timeout:g}s") from None
+
+    def _call_with_retries(self, messages, params, deadline):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ChatDeadlineError(f"Sin respuesta del LLM en {self.timeout:g}s")
+            try:
+                # El timeout de cada intento es lo que queda del plazo del mensaje
+                response = self.client.chat.completions.create(
+                    model=self.model, messages=messages, timeout=remaining, **params
+                )
+                self._count('completed')
+                return response.choices[0].message.content
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    self._count('errors')
+                    raise
+                attempt += 1
+                self._count('retries')
+                print(f"🔁 LLM: {type(e).__name__}, reintento {attempt}/{self.retries} en {delay:.1f}s")
+                time.sleep(delay)
+
+    def stream(self, messages, **params):
+        """
+        Generador con los fragmentos de texto de la respuesta a medida que llegan (stream=True).
+        El hilo del pool lee el stream del LLM y pasa los fragmentos por una cola; el hilo de la
+        petición espera cada uno con su plazo. Los reintentos solo ocurren antes del primer fragmento.
+        Si el cliente se desconecta (el generador se cierra) se corta también el stream del LLM
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+        self._submit(self._stream_with_retries, messages, params, deadline, chunks, cancelled)
+
+        received = False
+        try:
+            while True:
+                if received:
+                    limit = min(time.monotonic() + LLM_STREAM_IDLE_TIMEOUT, start + LLM_STREAM_TIMEOUT)
+                else:
+                    limit = deadline
+                try:
+                    kind, value = chunks.get(timeout=max(0.0, limit - time.monotonic()))
+                except queue.Empty:
+                    self._count('timeouts')
+                    raise ChatDeadlineError("El LLM dejó de enviar la respuesta" if received
+                                            else f"Sin respuesta del LLM en {self.timeout:g}s") from None
+                if kind == 'chunk':
+                    received = True
+                    yield value
+                elif kind == 'error':
+                    raise value
+                else:
+                    return
+        finally:
+            cancelled.set()
+
+    def _stream_with_retries(self, messages, params, deadline, chunks, cancelled):
+        attempt = 0
+        while not cancelled.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                chunks.put(('error', ChatDeadlineError(f"Sin respuesta del LLM en {self.timeout:g}s")))
+                return
+            emitted = False
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model, messages=messages, stream=True, timeout=remaining, **params
+                )
+                try:
+                    for event in response:
+                        if cancelled.is_set():
+                            break
+                        delta = event.choices[0].delta.content if event.choices else None
+                        if delta:
+                            emitted = True
+                            chunks.put(('chunk', delta))
+                finally:
+                    response.response.close()  # Libera la conexión aunque el stream se corte
+                self._count('cancelled' if cancelled.is_set() else 'completed')
+                chunks.put(('done', None))
+                return
+            except Exception as e:
+                # Con fragmentos ya enviados no se reintenta (el cliente vería texto repetido)
+                delay = None if emitted else self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    self._count('errors')
+                    chunks.put(('error', e))
+                    return
+                attempt += 1
+                self._count('retries')
+                print(f"🔁 LLM (stream): {type(e).__name__}, reintento {attempt}/{self.retries} en {delay:.1f}s")
+                time.sleep(delay)
+
+    def status(self):
+        """Configuración y contadores (para /api/chat/status)"""
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            'model': self.model,
+            'timeout_seconds': self.timeout,
+            'max_concurrency': self.max_concurrency,
+            'max_retries': self.retries,
+            **stats
+        }
@@ -0,0 +1,86 @@
+# llm_stub.py - Servidor local compatible con la API de OpenAI (chat.completions) para probar el chat
+#
+# Uso:
+#   python llm_stub.py --port 8001 --delay 2 --fail-rate 0.2 --token-delay 0.05
+#   OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python app.py
+#
+# --delay simula un LLM lento y --fail-rate respuestas 503/429: con ellos se prueban el plazo,
+# los reintentos y el límite de concurrencia sin gastar llamadas reales. Con "stream": true
+# la respuesta se envía palabra por palabra (SSE, como la API real) cada --token-delay segundos
+import json
+import time
+import random
+import argparse
+from flask import Flask, Response, request, jsonify
+
+app = Flask(__name__)
+settings = {'delay': 0.0, 'fail_rate': 0.0, 'fail_status': 503, 'token_delay': 0.05}
+
+def stream_chunks(content, model):
+    """Fragmentos chat.completion.chunk y el [DONE] final"""
+    chunk_id = f"chatcmpl-stub-{int(time.time() * 1000)}"
+    words = content.split(' ')
+    for index, word in enumerate(words):
+        time.sleep(settings['token_delay'])
+        chunk = {
+            'id': chunk_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'delta': {'content': word if index == 0 else ' ' + word},
+                'finish_reason': None
+            }]
+        }
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    final = {'id': chunk_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+             'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.get_json()
+    time.sleep(settings['delay'])
+
+    if random.random() < settings['fail_rate']:
+        return jsonify({'error': {'message': 'Fallo simulado', 'type': 'server_error'}}), settings['fail_status']
+
+    user_message = next((m['content'] for m in reversed(data['messages']) if m['role'] == 'user'), '')
+    content = f"🩺 Respuesta de prueba\n\nRecibí tu consulta: {user_message}"
+    if data.get('stream'):
+        return Response(stream_chunks(content, data.get('model', 'stub')), mimetype='text/event-stream')
+    return jsonify({
+        'id': f"chatcmpl-stub-{int(time.time() * 1000)}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': data.get('model', 'stub'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop'
+        }],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': len(content.split()), 'total_tokens': len(content.split())}
+    })
+
+@app.route('/v1/models', methods=['GET'])
+def models():
+    return jsonify({'object': 'list', 'data': [{'id': 'stub', 'object': 'model', 'owned_by': 'lifescan'}]})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LLM local compatible con OpenAI para pruebas del chat")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.0, help="segundos antes de cada respuesta")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fracción de respuestas con error")
+    parser.add_argument('--fail-status', type=int, default=503, help="código HTTP de los errores simulados")
+    parser.add_argument('--token-delay', type=float, default=0.05, help="segundos entre fragmentos con stream")
+    args = parser.parse_args(argv)
+
+    settings.update(delay=args.delay, fail_rate=args.fail_rate, fail_status=args.fail_status,
+                    token_delay=args.token_delay)
+    print(f"🧪 LLM de prueba en http://127.0.0.1:{args.port}/v1 (delay {args.delay}s, fallos {args.fail_rate:.0%})")
+    app.run(port=args.port, threaded=True)
+
+if __name__ == '__main__':
+    main()
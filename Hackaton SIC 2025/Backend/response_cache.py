@@ -0,0 +1,206 @@
+# response_cache.py - Caché de respuestas del chat para preguntas frecuentes ("¿Qué es la hipertensión?")
+# que llegan como primer mensaje de una conversación
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# '0' desactiva la caché
+RESPONSE_CACHE = os.environ.get('LIFESCAN_CHAT_RESPONSE_CACHE', '1') != '0'
+# Respuestas guardadas, presupuesto aproximado y segundos de validez desde que se generaron
+RESPONSE_CACHE_SIZE = int(os.environ.get('LIFESCAN_CHAT_RESPONSE_CACHE_SIZE', 500))
+RESPONSE_CACHE_MAX_MB = float(os.environ.get('LIFESCAN_CHAT_RESPONSE_CACHE_MAX_MB', 4))
+RESPONSE_CACHE_TTL = float(os.environ.get('LIFESCAN_CHAT_RESPONSE_CACHE_TTL', 86400))
+# Similitud mínima (Jaccard de trigramas de los términos) para reutilizar la respuesta de una
+# pregunta con algún término de relleno de más o de menos (PARAPHRASE_FILLER); 0 = solo preguntas
+# con los mismos términos (por defecto: una respuesta médica no se reutiliza para otra pregunta)
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get('LIFESCAN_CHAT_RESPONSE_CACHE_SIMILARITY', 0))
+
+# ============================
+# FIRMA DE LA PREGUNTA
+# ============================
+
+# Palabras que no cambian la respuesta de una pregunta frecuente. "no", "sin", "con", "tengo"...
+# sí la cambian y no se ignoran
+STOPWORDS = frozenset("""
+a al algo como cual cuales de del el ella ellos en es esta este esto la las lo los me mi mis o para
+por que se ser sobre son su sus te tu un una unas uno unos y
+hola buenas buenos dias tardes noches favor porfa porfavor gracias
+puedes podrias puede podria explica explicar explicame dime decir decirme saber quiero quisiera
+necesito informacion info significa significado acerca oye
+""".split())
+
+# Únicos términos que pueden sobrar o faltar entre dos preguntas para reutilizar la respuesta
+# (con similitud > 0). Nunca una negación ("no", "sin", "nunca") ni un calificativo ("alta", "baja",
+# "niños", "embarazo", "tipo 2"): cambian la pregunta aunque el resto sea igual
+PARAPHRASE_FILLER = frozenset("""
+exactamente realmente basicamente general generalmente normalmente principal principales
+breve brevemente resumen resumido corto rapido simple sencillo claro claramente detalle detalles
+ejemplo ejemplos bien ahora hoy actualmente verdad
+""".split())
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+def normalize_question(text):
+    """Minúsculas, sin tildes ni signos (¿?¡!.,) y con los espacios colapsados"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_WORD.findall(text))
+
+def question_key(text):
+    """
+    Términos de la pregunta sin palabras vacías, ordenados y sin repetir: "¿Qué es la hipertensión?"
+    y "hipertension que es" tienen la misma firma. None si no queda ningún término
+    """
+    terms = sorted({word for word in normalize_question(text).split() if word not in STOPWORDS})
+    return tuple(terms) or None
+
+def key_trigrams(key):
+    """Trigramas de caracteres de los términos (una palabra corta de más apenas cambia la similitud)"""
+    text = f" {' '.join(key)} "
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+# ============================
+# CACHÉ (LRU + TTL)
+# ============================
+
+class ResponseCache:
+    """
+    Respuestas del LLM por firma de la pregunta, con límite de entradas, presupuesto de bytes
+    y caducidad desde que se generaron; al superar un límite se expulsa la usada hace más tiempo.
+    Si no hay una firma igual se busca la más parecida entre las que comparten términos (índice invertido).
+    Es local de cada worker (se vacía al reiniciar). Seguro entre hilos
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, max_bytes=int(RESPONSE_CACHE_MAX_MB * 1024 * 1024),
+                 ttl=RESPONSE_CACHE_TTL, similarity=RESPONSE_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.similarity = similarity if similarity and similarity > 0 else None
+        self._entries = OrderedDict()  # firma -> [respuesta, pregunta, trigramas, bytes, creación, aciertos]
+        self._index = {}  # término -> {firmas}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _entry(self, key):
+        """Entrada vigente (marcada como recién usada) o None. Con el lock tomado"""
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl is not None and time.time() - entry[4] > self.ttl:
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        size = self._entries.pop(key)[3]
+        self._bytes -= size
+        for term in key:
+            keys = self._index[term]
+            keys.discard(key)
+            if not keys:
+                del self._index[term]
+
+    def _similar(self, key):
+        """Firma guardada más parecida a `key` por encima del umbral, o None. Con el lock tomado"""
+        # Solo se aceptan términos de relleno de más o de menos, nunca uno distinto: "colesterol
+        # alto/bajo" o "tipo 1/tipo 2" se parecen mucho y piden otra respuesta, y un "no", un "sin"
+        # o un "en niños" de más también
+        terms = set(key)
+        candidates = set()
+        for term in key:
+            candidates.update(self._index.get(term, ()))
+
+        grams = key_trigrams(key)
+        best, best_score = None, self.similarity
+        for candidate in candidates:
+            if not terms.symmetric_difference(candidate) <= PARAPHRASE_FILLER:
+                continue
+            other = self._entries[candidate][2]
+            shared = len(grams & other)
+            score = shared / (len(grams) + len(other) - shared)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def get(self, question):
+        """Respuesta guardada para la pregunta (o una muy parecida), si no None"""
+        key = question_key(question)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None and self.similarity is not None:
+                similar = self._similar(key)
+                entry = self._entry(similar) if similar is not None else None
+                if entry is not None:
+                    self.similar_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            entry[5] += 1
+            self.hits += 1
+            return entry[0]
+
+    def put(self, question, response):
+        """Guardar la respuesta generada para la pregunta"""
+        key = question_key(question)
+        if key is None or not response:
+            return
+        grams = key_trigrams(key)
+        size = len(response) + len(question) + 64 * (len(grams) + len(key)) + 256
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = [response, question, grams, size, time.time(), 0]
+            self._bytes += size
+            for term in key:
+                self._index.setdefault(term, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def bypass(self):
+        """Contar un mensaje que no pasó por la caché (la conversación ya tenía contexto)"""
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._bytes = 0
+
+    def status(self, top=10):
+        """Configuración, contadores y las preguntas con más aciertos (para /api/chat/status)"""
+        now = time.time()
+        with self._lock:
+            lookups = self.hits + self.misses
+            popular = sorted(self._entries.values(), key=lambda entry: entry[5], reverse=True)[:top]
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'similarity': self.similarity,
+                'hits': self.hits,
+                'similar_hits': self.similar_hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'top': [{'question': entry[1][:80], 'hits': entry[5], 'age_seconds': round(now - entry[4])}
+                        for entry in popular if entry[5]]
+            }
@@ -1855,15 +1855,17 @@ async function enviarMensajeAvanzado() {
     isTyping = true;
     
     try {
-        // Enviar a Flask/OpenAI
+        // Enviar a Flask/OpenAI (la respuesta llega por SSE a medida que se genera)
         const response = await fetch('http://127.0.0.1:5000/api/chat/send', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
             },
             body: JSON.stringify({
                 message: mensaje,
-                conversation_id: currentConversationId
+                conversation_id: currentConversationId,
+                stream: true
             })
         });
         
@@ -1871,19 +1873,36 @@ async function enviarMensajeAvanzado() {
             throw new Error(`Error HTTP ${response.status}`);
         }
         
-        const data = await response.json();
+        let textoRespuesta = '';
+        let contenidoBot = null;
+        let data = null;
+        
+        await leerEventosSSE(response, (evento, datos) => {
+            if (evento === 'delta') {
+                // Primer fragmento: se cambia el indicador de "escribiendo" por el mensaje
+                if (!contenidoBot) {
+                    removeTypingIndicator();
+                    contenidoBot = crearMensajeBot();
+                }
+                textoRespuesta += datos.delta;
+                contenidoBot.innerHTML = textoRespuesta.replace(/\n/g, '<br>');
+                const messagesContainer = document.getElementById('messages');
+                messagesContainer.scrollTop = messagesContainer.scrollHeight;
+            } else if (evento === 'done') {
+                data = datos;
+            } else if (evento === 'error') {
+                throw new Error(datos.error || 'Respuesta incompleta');
+            }
+        });
         
         // Remover indicador de "escribiendo"
         removeTypingIndicator();
         
-        if (data.success) {
-            // Mostrar respuesta formateada
-            mostrarMensajeBotFormateado(data.response);
-            
+        if (data && data.success) {
             // Actualizar historial en sidebar
             actualizarHistorialChat(mensaje, data.timestamp);
         } else {
-            throw new Error(data.error || 'Error en la respuesta');
+            throw new Error('Respuesta incompleta');
         }
         
     } catch (error) {
@@ -1932,23 +1951,58 @@ function mostrarMensajeUsuario(texto) {
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
 }
 
-function mostrarMensajeBotFormateado(texto) {
+// Leer una respuesta SSE (event: ... / data: {...}) y llamar a onEvento por cada evento
+async function leerEventosSSE(response, onEvento) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Los eventos terminan en una línea vacía
+        let separador;
+        while ((separador = buffer.indexOf('\n\n')) !== -1) {
+            const bloque = buffer.slice(0, separador);
+            buffer = buffer.slice(separador + 2);
+            
+            let evento = 'message';
+            let datos = '';
+            for (const linea of bloque.split('\n')) {
+                if (linea.startsWith('event: ')) evento = linea.slice(7);
+                else if (linea.startsWith('data: ')) datos += linea.slice(6);
+            }
+            if (datos) onEvento(evento, JSON.parse(datos));
+        }
+    }
+}
+
+// Crear un mensaje del bot vacío y devolver su contenido (para completarlo en streaming)
+function crearMensajeBot() {
     const messagesContainer = document.getElementById('messages');
     const mensajeDiv = document.createElement('div');
     mensajeDiv.className = 'msg bot';
     
-    // Formatear texto con saltos de línea
-    const textoFormateado = texto.replace(/\n/g, '<br>');
-    
     mensajeDiv.innerHTML = `
         <div class="msg-header">
             <strong>Asistente IA:</strong>
         </div>
-        <div class="msg-content">${textoFormateado}</div>
+        <div class="msg-content"></div>
         <div class="msg-time">${new Date().toLocaleTimeString([], {hour: '2-digit', minute:'2-digit'})}</div>
     `;
     messagesContainer.appendChild(mensajeDiv);
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    return mensajeDiv.querySelector('.msg-content');
+}
+
+function mostrarMensajeBotFormateado(texto) {
+    const messagesContainer = document.getElementById('messages');
+    
+    // Formatear texto con saltos de línea
+    crearMensajeBot().innerHTML = texto.replace(/\n/g, '<br>');
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
 }
 
 function mostrarMensajeBot(texto) {